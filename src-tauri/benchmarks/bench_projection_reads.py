@@ -0,0 +1,167 @@
+"""
+Benchmark: Core projection reads vs the ORM path.
+
+Builds a throwaway SQLite database with ~100k messages spread over a few
+hundred chats, then measures rows/sec for the hot read queries
+(`list_chats`, `get_chat_messages`, `get_all_provider_settings`) using both the
+ORM-object approach and the projected Core statements in `tauri_app.db`.
+
+Usage (from src-tauri/):
+    python benchmarks/bench_projection_reads.py [--messages 100000] [--chats 200] [--memory]
+
+`--memory` runs against an in-memory database (the engine incognito chats use)
+as a zero-I/O baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "python"))
+
+from sqlalchemy import create_engine, event, select  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from tauri_app.db import chats, providers  # noqa: E402
+from tauri_app.db.archive import create_archive_schema  # noqa: E402
+from tauri_app.db.models import Base, Chat, Message, ProviderSettings  # noqa: E402
+
+
+def _seed(sess: Session, n_messages: int, n_chats: int) -> List[str]:
+    """Create linear conversations (one active branch each) and a few providers."""
+    chat_ids = []
+    per_chat = max(1, n_messages // n_chats)
+    for c in range(n_chats):
+        chat_id = str(uuid.uuid4())
+        chat_ids.append(chat_id)
+        parent = None
+        rows = []
+        for i in range(per_chat):
+            msg_id = str(uuid.uuid4())
+            content = json.dumps([{"type": "text", "content": f"message {i} " * 20}])
+            rows.append(dict(
+                id=msg_id, chatId=chat_id, role="user" if i % 2 == 0 else "assistant",
+                content=content, createdAt=f"2024-01-01T00:{c % 60:02d}:{i % 60:02d}",
+                parent_message_id=parent, is_complete=True, sequence=1,
+            ))
+            parent = msg_id
+        sess.add(Chat(id=chat_id, title=f"Chat {c}", createdAt="2024-01-01", updatedAt="2024-01-01",
+                      active_leaf_message_id=parent))
+        sess.execute(Message.__table__.insert(), rows)
+    for name in ("openai", "anthropic", "groq", "ollama", "google", "lmstudio"):
+        sess.add(ProviderSettings(provider=name, api_key="sk-test", extra="{}", enabled=True))
+    sess.commit()
+    return chat_ids
+
+
+def _orm_list_chats(sess: Session) -> List[Dict[str, Any]]:
+    stmt = select(Chat).order_by(Chat.updatedAt.desc().nulls_last(), Chat.createdAt.desc().nulls_last())
+    return [
+        {"id": r.id, "title": r.title, "model": r.model, "createdAt": r.createdAt, "updatedAt": r.updatedAt}
+        for r in sess.scalars(stmt)
+    ]
+
+
+def _orm_get_chat_messages(sess: Session, chat_id: str) -> List[Dict[str, Any]]:
+    chat = sess.get(Chat, chat_id)
+    path = []
+    current_id = chat.active_leaf_message_id if chat else None
+    while current_id:
+        message = sess.get(Message, current_id)
+        if not message:
+            break
+        path.append(message)
+        current_id = message.parent_message_id
+    out = []
+    for r in reversed(path):
+        content = r.content
+        if content and content.strip().startswith('['):
+            content = json.loads(content)
+        out.append({
+            "id": r.id, "role": r.role, "content": content, "createdAt": r.createdAt,
+            "toolCalls": json.loads(r.toolCalls) if r.toolCalls else None,
+            "parentMessageId": r.parent_message_id, "isComplete": r.is_complete,
+            "sequence": r.sequence, "modelUsed": r.model_used,
+        })
+    return out
+
+
+def _orm_all_providers(sess: Session) -> Dict[str, Dict[str, Any]]:
+    return {
+        r.provider: {"provider": r.provider, "api_key": r.api_key, "base_url": r.base_url,
+                     "extra": r.extra, "enabled": r.enabled}
+        for r in sess.scalars(select(ProviderSettings))
+    }
+
+
+def _measure(make_session: Callable[[], Session], fn: Callable[[Session], int], repeat: int) -> float:
+    """Return rows/sec; a fresh session per call mirrors how commands use the DB."""
+    rows = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        sess = make_session()
+        try:
+            rows += fn(sess)
+        finally:
+            sess.close()
+    return rows / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--memory", action="store_true", help="use an in-memory database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.memory:
+            engine = create_engine("sqlite://", poolclass=StaticPool)
+            archive_path = ":memory:"
+        else:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+            archive_path = str(Path(tmp) / "archive.db")
+        # list_chats also reads archived chats, so attach the archive like the app does
+        event.listen(engine, "connect", lambda conn, _: conn.execute("ATTACH DATABASE ? AS archive", (archive_path,)))
+        Base.metadata.create_all(engine)
+        create_archive_schema(engine)
+        make_session = sessionmaker(bind=engine, expire_on_commit=False)
+
+        with make_session() as sess:
+            print(f"Seeding {args.messages} messages across {args.chats} chats...")
+            chat_ids = _seed(sess, args.messages, args.chats)
+
+        cases = {
+            "list_chats": (
+                lambda s: len(_orm_list_chats(s)),
+                lambda s: len(chats.list_chats(s)),
+            ),
+            "get_chat_messages": (
+                lambda s: sum(len(_orm_get_chat_messages(s, c)) for c in chat_ids),
+                lambda s: sum(len(chats.get_chat_messages(s, c)) for c in chat_ids),
+            ),
+            "get_all_provider_settings": (
+                lambda s: len(_orm_all_providers(s)),
+                lambda s: len(providers.get_all_provider_settings(s)),
+            ),
+        }
+
+        print(f"{'query':<28}{'orm rows/s':>14}{'core rows/s':>14}{'speedup':>10}")
+        for name, (orm_fn, core_fn) in cases.items():
+            repeat = args.repeat if name == "get_chat_messages" else args.repeat * 100
+            orm_rate = _measure(make_session, orm_fn, repeat)
+            core_rate = _measure(make_session, core_fn, repeat)
+            print(f"{name:<28}{orm_rate:>14,.0f}{core_rate:>14,.0f}{core_rate / orm_rate:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
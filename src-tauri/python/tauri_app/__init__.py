@@ -1,13 +1,27 @@
 from pathlib import Path
-from dotenv import load_dotenv
-from anyio.from_thread import start_blocking_portal
-from pydantic.alias_generators import to_camel
-from pytauri import (
-    builder_factory,
-    context_factory,
+from tauri_app.services.import_timing import (
+    install_import_timer,
+    uninstall_import_timer,
+    phase,
+    print_startup_report,
 )
-from tauri_app.db import init_database
-from .commands import commands, PYTAURI_GEN_TS
+
+# Per-package import timing when IMPORT_TIMING=1 (see services/import_timing.py)
+install_import_timer()
+
+with phase("import runtime"):
+    from dotenv import load_dotenv
+    from anyio.from_thread import start_blocking_portal
+    from pydantic.alias_generators import to_camel
+    from pytauri import (
+        builder_factory,
+        context_factory,
+    )
+with phase("import db"):
+    from tauri_app.db import init_database
+    from tauri_app.services.maintenance import start_maintenance_jobs
+with phase("import commands"):
+    from .commands import commands, PYTAURI_GEN_TS
 
 def main() -> int:
     with start_blocking_portal("asyncio") as portal:
@@ -27,12 +41,18 @@ def main() -> int:
                 )
             )
 
-        app = builder_factory().build(
-            context=context_factory(),
-            invoke_handler=commands.generate_handler(portal),
-        )
+        with phase("build app"):
+            app = builder_factory().build(
+                context=context_factory(),
+                invoke_handler=commands.generate_handler(portal),
+            )
         # Initialize database in the Tauri resource/app dir
-        init_database(app)
+        with phase("init database"):
+            init_database(app)
+        # Archival and other DB upkeep run in the background
+        start_maintenance_jobs(app.handle())
+        uninstall_import_timer()
+        print_startup_report()
 
         exit_code = app.run_return()
         return exit_code
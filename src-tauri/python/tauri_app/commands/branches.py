@@ -11,8 +11,9 @@ from pytauri.webview import WebviewWindow
 
 from .. import db
 from ..models.chat import ChatEvent, ChatMessage
-from ..services.agent_factory import create_agent_for_chat
-from .streaming import handle_content_stream, parse_model_id
+from ..services.agent_factory import begin_agent_request, create_agent_for_chat
+from ..services.token_counter import store_message_token_count
+from .streaming import handle_content_stream, load_continuation, parse_model_id
 from . import commands
 
 
@@ -46,6 +47,7 @@ class SwitchToSiblingRequest(BaseModel):
 
 class GetMessageSiblingsRequest(BaseModel):
     messageId: str
+    chatId: Optional[str] = None
 
 
 class MessageSiblingInfo(BaseModel):
@@ -54,18 +56,41 @@ class MessageSiblingInfo(BaseModel):
     isActive: bool
 
 
+class GetChatTreeRequest(BaseModel):
+    chatId: str
+
+
+class ChatTreeNode(BaseModel):
+    id: str
+    parentId: Optional[str] = None
+    sequence: int
+    role: str
+    preview: str
+    isComplete: bool
+    siblingIndex: int
+    siblingCount: int
+    isActive: bool
+
+
+class ChatTree(BaseModel):
+    chatId: str
+    activeLeafId: Optional[str] = None
+    nodes: List[ChatTreeNode]
+
+
 @commands.command()
+@db.chat_scoped(lambda body: body.chatId)
 async def continue_message(
     body: ContinueMessageRequest,
     webview_window: WebviewWindow,
     app_handle: AppHandle,
 ) -> None:
     """Continue incomplete assistant message from where it stopped."""
+    begin_agent_request()
     ch: Channel[ChatEvent] = body.channel.channel_on(webview_window.as_ref_webview())
-    
-    existing_blocks: List[Dict[str, Any]] = []
 
     with db.db_session(app_handle) as sess:
+        db.restore_chat(sess, body.chatId)
         if body.modelId:
             provider, model = parse_model_id(body.modelId)
             # Load existing config and merge model changes (preserve tools!)
@@ -73,53 +98,20 @@ async def continue_message(
             config["provider"] = provider
             config["model_id"] = model
             db.update_chat_agent_config(sess, chatId=body.chatId, config=config)
-        # Get the message path up to this message
-        messages = db.get_message_path(sess, body.messageId)
-        
-        # Convert to ChatMessage format (parse JSON array content if present)
-        chat_messages = []
-        for m in messages:
-            content = m.content
-            if isinstance(content, str) and content.strip().startswith('['):
-                try:
-                    content = json.loads(content)
-                except Exception:
-                    # Keep as-is if parsing fails (legacy/plain text)
-                    pass
-            chat_messages.append(
-                ChatMessage(
-                    id=m.id,
-                    role=m.role,
-                    content=content,
-                    createdAt=m.createdAt,
-                )
-            )
 
-        # Seed blocks for the assistant message being continued (trim trailing error)
-        target_msg = sess.get(db.Message, body.messageId)
-        if target_msg and isinstance(target_msg.content, str):
-            raw = target_msg.content.strip()
-            if raw.startswith('['):
-                try:
-                    existing_blocks = json.loads(raw)
-                except Exception:
-                    existing_blocks = [{"type": "text", "content": target_msg.content}]
-            else:
-                existing_blocks = [{"type": "text", "content": target_msg.content}]
-            # Remove trailing error blocks
-            while existing_blocks and isinstance(existing_blocks[-1], dict) and existing_blocks[-1].get("type") == "error":
-                existing_blocks.pop()
-    
+    # Message path up to this message, and its blocks (trailing error trimmed)
+    chat_messages, existing_blocks = load_continuation(app_handle, body.chatId, body.messageId)
+
     ch.send_model(ChatEvent(event="RunStarted", sessionId=body.chatId))
     # For parity with other streams, emit the assistant message ID being continued
     ch.send_model(ChatEvent(event="AssistantMessageId", content=body.messageId))
     # Seed existing content so the frontend doesn't clear it on first chunk
     if existing_blocks:
         ch.send_model(ChatEvent(event="SeedBlocks", blocks=existing_blocks))
-    
+
     try:
         agent = create_agent_for_chat(body.chatId, app_handle, channel=ch, assistant_msg_id=body.messageId)
-        
+
         # Continue streaming into the same message
         await handle_content_stream(
             app_handle,
@@ -128,7 +120,7 @@ async def continue_message(
             body.messageId,  # Same message ID - append content
             ch,
         )
-        
+
     except Exception as e:
         print(f"[continue_message] Error: {e}")
         # Persist error to the message so reload shows it
@@ -156,15 +148,18 @@ async def continue_message(
 
 
 @commands.command()
+@db.chat_scoped(lambda body: body.chatId)
 async def retry_message(
     body: RetryMessageRequest,
     webview_window: WebviewWindow,
     app_handle: AppHandle,
 ) -> None:
     """Create sibling message and retry generation."""
+    begin_agent_request()
     ch: Channel[ChatEvent] = body.channel.channel_on(webview_window.as_ref_webview())
-    
+
     with db.db_session(app_handle) as sess:
+        db.restore_chat(sess, body.chatId)
         if body.modelId:
             provider, model = parse_model_id(body.modelId)
             # Load existing config and merge model changes (preserve tools!)
@@ -177,13 +172,13 @@ async def retry_message(
         if not original_msg:
             ch.send_model(ChatEvent(event="RunError", content="Message not found"))
             return
-        
+
         # Get conversation up to the parent
         if original_msg.parent_message_id:
-            messages = db.get_message_path(sess, original_msg.parent_message_id)
+            messages = db.get_message_path(sess, original_msg.parent_message_id, body.chatId)
         else:
             messages = []
-        
+
         # Convert to ChatMessage format (parse JSON array content if present)
         chat_messages = []
         for m in messages:
@@ -202,7 +197,7 @@ async def retry_message(
                     createdAt=m.createdAt,
                 )
             )
-        
+
         # Create new sibling assistant message
         new_msg_id = db.create_branch_message(
             sess,
@@ -212,17 +207,17 @@ async def retry_message(
             chat_id=body.chatId,
             is_complete=False,
         )
-        
+
         # Update active leaf to the new message
         db.set_active_leaf(sess, body.chatId, new_msg_id)
-    
+
     ch.send_model(ChatEvent(event="RunStarted", sessionId=body.chatId))
     # Emit the assistant message ID so the frontend can track updates
     ch.send_model(ChatEvent(event="AssistantMessageId", content=new_msg_id))
-    
+
     try:
         agent = create_agent_for_chat(body.chatId, app_handle, channel=ch, assistant_msg_id=new_msg_id)
-        
+
         # Stream fresh response
         await handle_content_stream(
             app_handle,
@@ -231,7 +226,7 @@ async def retry_message(
             new_msg_id,
             ch,
         )
-        
+
     except Exception as e:
         print(f"[retry_message] Error: {e}")
         # Persist error to the new assistant message
@@ -259,15 +254,18 @@ async def retry_message(
 
 
 @commands.command()
+@db.chat_scoped(lambda body: body.chatId)
 async def edit_user_message(
     body: EditUserMessageRequest,
     webview_window: WebviewWindow,
     app_handle: AppHandle,
 ) -> None:
     """Edit user message by creating sibling with new content."""
+    begin_agent_request()
     ch: Channel[ChatEvent] = body.channel.channel_on(webview_window.as_ref_webview())
-    
+
     with db.db_session(app_handle) as sess:
+        db.restore_chat(sess, body.chatId)
         if body.modelId:
             provider, model = parse_model_id(body.modelId)
             # Load existing config and merge model changes (preserve tools!)
@@ -280,13 +278,13 @@ async def edit_user_message(
         if not original_msg:
             ch.send_model(ChatEvent(event="RunError", content="Message not found"))
             return
-        
+
         # Get conversation up to the parent (excluding the message being edited)
         if original_msg.parent_message_id:
-            messages = db.get_message_path(sess, original_msg.parent_message_id)
+            messages = db.get_message_path(sess, original_msg.parent_message_id, body.chatId)
         else:
             messages = []
-        
+
         # Create new sibling user message with edited content
         new_user_msg_id = db.create_branch_message(
             sess,
@@ -296,10 +294,10 @@ async def edit_user_message(
             chat_id=body.chatId,
             is_complete=True,
         )
-        
+
         # Update active leaf to the new user message
         db.set_active_leaf(sess, body.chatId, new_user_msg_id)
-        
+
         # Convert to ChatMessage format (including the new user message)
         chat_messages = []
         for m in messages:
@@ -326,7 +324,7 @@ async def edit_user_message(
                 createdAt=original_msg.createdAt,
             )
         )
-        
+
         # Create assistant response message
         assistant_msg_id = db.create_branch_message(
             sess,
@@ -336,17 +334,19 @@ async def edit_user_message(
             chat_id=body.chatId,
             is_complete=False,
         )
-        
+
         # Update active leaf to the assistant message
         db.set_active_leaf(sess, body.chatId, assistant_msg_id)
-    
+
+    store_message_token_count(app_handle, new_user_msg_id)
+
     ch.send_model(ChatEvent(event="RunStarted", sessionId=body.chatId))
     # Emit the assistant message ID for frontend tracking
     ch.send_model(ChatEvent(event="AssistantMessageId", content=assistant_msg_id))
-    
+
     try:
         agent = create_agent_for_chat(body.chatId, app_handle, channel=ch, assistant_msg_id=assistant_msg_id)
-        
+
         # Stream response to edited message
         await handle_content_stream(
             app_handle,
@@ -355,7 +355,7 @@ async def edit_user_message(
             assistant_msg_id,
             ch,
         )
-        
+
     except Exception as e:
         print(f"[edit_user_message] Error: {e}")
         # Persist error to the assistant message
@@ -388,7 +388,7 @@ async def switch_to_sibling(
     app_handle: AppHandle,
 ) -> None:
     """Switch active branch to different sibling."""
-    with db.db_session(app_handle) as sess:
+    with db.db_session(app_handle, db.is_incognito_chat(body.chatId)) as sess:
         # Get the leaf descendant of the sibling
         leaf_id = db.get_leaf_descendant(sess, body.siblingId, body.chatId)
 
@@ -401,27 +401,22 @@ async def get_message_siblings(
     body: GetMessageSiblingsRequest,
     app_handle: AppHandle,
 ) -> List[MessageSiblingInfo]:
-    """Get all sibling messages for navigation UI."""
-    with db.db_session(app_handle) as sess:
-        message = sess.get(db.Message, body.messageId)
-        if not message:
-            return []
-
-        # Get all siblings (messages with same parent in the same chat)
-        siblings = db.get_message_children(sess, message.parent_message_id, message.chatId)
-
-        # Get the chat to determine which is active
-        chat = sess.get(db.Chat, message.chatId)
-        active_path = []
-        if chat and chat.active_leaf_message_id:
-            active_path_msgs = db.get_message_path(sess, chat.active_leaf_message_id)
-            active_path = [m.id for m in active_path_msgs]
-
-        return [
-            MessageSiblingInfo(
-                id=sib.id,
-                sequence=sib.sequence,
-                isActive=sib.id in active_path,
-            )
-            for sib in siblings
-        ]
+    """Get all sibling messages for navigation UI.
+
+    Prefer `get_chat_tree` (or `get_chat` with includeSiblings) when rendering a
+    whole chat; this is for refreshing a single navigator.
+    """
+    with db.db_session(app_handle, db.is_incognito_chat(body.chatId)) as sess:
+        siblings = db.get_message_siblings(sess, body.messageId, body.chatId)
+    return [MessageSiblingInfo(**s) for s in siblings]
+
+
+@commands.command()
+async def get_chat_tree(
+    body: GetChatTreeRequest,
+    app_handle: AppHandle,
+) -> ChatTree:
+    """Get the whole branch tree skeleton of a chat in one query."""
+    with db.db_session(app_handle, db.is_incognito_chat(body.chatId)) as sess:
+        tree = db.get_chat_tree(sess, body.chatId)
+    return ChatTree(**tree)
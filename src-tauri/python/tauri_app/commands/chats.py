@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
 import uuid
 from typing import Any, Dict
@@ -11,18 +12,25 @@ from ..models.chat import (
     AllChatsData,
     ChatData,
     ChatId,
+    GetChatInput,
+    ArchiveChatsInput,
+    DeleteChatsInput,
     CreateChatInput,
     UpdateChatInput,
     ToggleChatToolsInput,
     UpdateChatModelInput,
+    UpdateChatHedgeInput,
+    PrewarmModelInput,
     ToolInfo,
     AvailableToolsResponse,
     ChatAgentConfigResponse,
 )
 
-from ..services.agent_factory import update_agent_tools, update_agent_model
+from ..services.agent_factory import update_agent_tools, update_agent_model, update_agent_hedge
 from ..services.tool_registry import get_tool_registry
 from ..services.title_generator import generate_title_for_chat
+from ..services.maintenance import archive_cold_chats, compact_branches
+from ..services.prewarm import prewarm_in_background, prewarm_model as prewarm_pooled_model
 from . import commands
 
 
@@ -32,17 +40,14 @@ async def get_all_chats(app_handle: AppHandle) -> AllChatsData:
     sess = db.session(app_handle)
     try:
         for r in db.list_chats(sess):
-            chat = ChatData(
-                id=r.id,
-                title=r.title,
-                model=r.model,
-                createdAt=r.createdAt,
-                updatedAt=r.updatedAt,
-                messages=[],  # do not load heavy messages list here
-            )
+            chat = ChatData(**r, messages=[])  # do not load heavy messages list here
             chats[chat.id or "unknown"] = chat
     finally:
         sess.close()
+    if db.has_incognito_chats():
+        with db.db_session(app_handle, incognito=True) as sess:
+            for r in db.list_chats(sess):
+                chats[r["id"]] = ChatData(**r, messages=[], incognito=True)
     return AllChatsData(chats=chats)
 
 
@@ -66,8 +71,11 @@ async def create_chat(body: CreateChatInput, app_handle: AppHandle) -> ChatData:
     else:
         # Use default config
         agent_config = db.get_default_agent_config()
-    
-    sess = db.session(app_handle)
+
+    if body.incognito:
+        db.register_incognito_chat(chatId)
+
+    sess = db.session(app_handle, incognito=body.incognito)
     try:
         db.create_chat(
             sess,
@@ -88,14 +96,17 @@ async def create_chat(body: CreateChatInput, app_handle: AppHandle) -> ChatData:
         createdAt=now,
         updatedAt=now,
         messages=[],
+        incognito=body.incognito,
     )
 
 
 @commands.command()
 async def update_chat(body: UpdateChatInput, app_handle: AppHandle) -> ChatData:
     now = datetime.utcnow().isoformat()
-    sess = db.session(app_handle)
+    incognito = db.is_incognito_chat(body.id)
+    sess = db.session(app_handle, incognito)
     try:
+        db.restore_chat(sess, body.id)
         db.update_chat(
             sess,
             id=body.id,
@@ -116,6 +127,7 @@ async def update_chat(body: UpdateChatInput, app_handle: AppHandle) -> ChatData:
             createdAt=chatRow.createdAt,
             updatedAt=chatRow.updatedAt,
             messages=[],
+            incognito=incognito,
         )
     finally:
         sess.close()
@@ -123,7 +135,7 @@ async def update_chat(body: UpdateChatInput, app_handle: AppHandle) -> ChatData:
 
 @commands.command()
 async def delete_chat(body: ChatId, app_handle: AppHandle) -> None:
-    sess = db.session(app_handle)
+    sess = db.session(app_handle, db.is_incognito_chat(body.id))
     try:
         db.delete_chat(sess, chatId=body.id)
     finally:
@@ -132,16 +144,71 @@ async def delete_chat(body: ChatId, app_handle: AppHandle) -> None:
 
 
 @commands.command()
-async def get_chat(body: ChatId, app_handle: AppHandle) -> Dict[str, Any]:
-    sess = db.session(app_handle)
+async def delete_chats(body: DeleteChatsInput, app_handle: AppHandle) -> Dict[str, Any]:
+    """
+    Delete many chats in a single transaction (e.g. clearing everything older than X).
+
+    Args:
+        body: Contains the chat IDs to delete
+        app_handle: Tauri app handle
+
+    Returns:
+        Dict with the number of deleted chats
+    """
+    incognito_ids = [i for i in body.ids if db.is_incognito_chat(i)]
+    with db.db_session(app_handle) as sess:
+        deleted = db.delete_chats(sess, [i for i in body.ids if i not in incognito_ids])
+    if incognito_ids:
+        with db.db_session(app_handle, incognito=True) as sess:
+            deleted += db.delete_chats(sess, incognito_ids)
+    return {"deleted": deleted}
+
+
+@commands.command()
+async def get_chat(body: GetChatInput, app_handle: AppHandle) -> Dict[str, Any]:
+    sess = db.session(app_handle, db.is_incognito_chat(body.id))
     try:
+        # Opening an archived chat moves it back into the hot DB
+        db.restore_chat(sess, body.id)
         msgs = db.get_chat_messages(sess, chatId=body.id)
+        if body.includeSiblings:
+            siblings = db.get_active_path_siblings(db.get_chat_tree(sess, body.id))
+            for m in msgs:
+                m["siblings"] = siblings.get(m["id"], [])
     finally:
         sess.close()
     return {"id": body.id, "messages": msgs}
 
 
 @commands.command()
+async def archive_chats(body: ArchiveChatsInput, app_handle: AppHandle) -> Dict[str, Any]:
+    """
+    Move cold chats into archive.db now instead of waiting for the daily job.
+
+    Args:
+        body: Optional olderThanDays override (defaults to the archive setting)
+        app_handle: Tauri app handle
+
+    Returns:
+        Dict with the number of archived chats
+    """
+    archived = await asyncio.to_thread(archive_cold_chats, app_handle, body.olderThanDays)
+    return {"archived": archived}
+
+
+@commands.command()
+async def compact_chats(app_handle: AppHandle) -> Dict[str, Any]:
+    """
+    Prune abandoned branches now instead of waiting for the daily job.
+
+    Returns:
+        Per-category counts and total messages deleted
+    """
+    return await asyncio.to_thread(compact_branches, app_handle, True)
+
+
+@commands.command()
+@db.chat_scoped(lambda body: body.chatId)
 async def toggle_chat_tools(body: ToggleChatToolsInput, app_handle: AppHandle) -> None:
     """
     Update active tools for a chat session.
@@ -155,6 +222,7 @@ async def toggle_chat_tools(body: ToggleChatToolsInput, app_handle: AppHandle) -
 
 
 @commands.command()
+@db.chat_scoped(lambda body: body.chatId)
 async def update_chat_model(body: UpdateChatModelInput, app_handle: AppHandle) -> None:
     """
     Switch the model/provider for a chat session.
@@ -164,9 +232,46 @@ async def update_chat_model(body: UpdateChatModelInput, app_handle: AppHandle) -
         app_handle: Tauri app handle
     """
     update_agent_model(body.chatId, body.provider, body.modelId, app_handle)
+    # Get the client connected (and a local model loaded) before the first send
+    prewarm_in_background(body.provider, body.modelId, app_handle)
     return None
 
 
+@commands.command()
+@db.chat_scoped(lambda body: body.chatId)
+async def set_chat_hedge_policy(body: UpdateChatHedgeInput, app_handle: AppHandle) -> None:
+    """
+    Set the fallback model raced against the chat's model when its first token is slow.
+    
+    Args:
+        body: Contains chatId, provider, modelId and afterMs (no provider clears the policy)
+        app_handle: Tauri app handle
+    """
+    hedge = None
+    if body.provider and body.modelId:
+        hedge = {"provider": body.provider, "model_id": body.modelId, "after_ms": body.afterMs}
+    update_agent_hedge(body.chatId, hedge, app_handle)
+    if hedge:
+        prewarm_in_background(body.provider, body.modelId, app_handle)
+    return None
+
+
+@commands.command()
+async def prewarm_model(body: PrewarmModelInput, app_handle: AppHandle) -> Dict[str, Any]:
+    """
+    Warm up a model before the first message: build its pooled client, open
+    the connection and, for Ollama / LM Studio, load the model.
+    
+    Args:
+        body: Contains provider and modelId
+        app_handle: Tauri app handle
+        
+    Returns:
+        Dict with warm, connected, loaded, elapsedMs (and error if warming failed)
+    """
+    return await prewarm_pooled_model(body.provider, body.modelId, app_handle)
+
+
 @commands.command()
 async def get_available_tools(app_handle: AppHandle) -> AvailableToolsResponse:
     """
@@ -203,8 +308,9 @@ async def get_chat_agent_config(body: ChatId, app_handle: AppHandle) -> ChatAgen
     Returns:
         Chat's agent configuration
     """
-    sess = db.session(app_handle)
+    sess = db.session(app_handle, db.is_incognito_chat(body.id))
     try:
+        db.restore_chat(sess, body.id)
         config = db.get_chat_agent_config(sess, body.id)
         if not config:
             # No config yet, return defaults
@@ -220,6 +326,7 @@ async def get_chat_agent_config(body: ChatId, app_handle: AppHandle) -> ChatAgen
 
 
 @commands.command()
+@db.chat_scoped(lambda body: body.id)
 async def generate_chat_title(body: ChatId, app_handle: AppHandle) -> Dict[str, Any]:
     """
     Generate and update title for a chat based on its first message.
@@ -231,7 +338,7 @@ async def generate_chat_title(body: ChatId, app_handle: AppHandle) -> Dict[str,
     Returns:
         Dict with the new title or None if generation failed
     """
-    title = generate_title_for_chat(body.id, app_handle)
+    title = await generate_title_for_chat(body.id, app_handle)
     if title:
         with db.db_session(app_handle) as sess:
             db.update_chat(sess, id=body.id, title=title)
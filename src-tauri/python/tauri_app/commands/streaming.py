@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
 import uuid
+from types import SimpleNamespace
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 import traceback
@@ -15,14 +17,30 @@ from agno.agent import Agent, RunEvent, Message
 
 from .. import db
 from ..models.chat import ChatEvent, ChatMessage
-from ..services.agent_factory import create_agent_for_chat
+from ..services.agent_factory import (
+    begin_agent_request,
+    create_agent_for_chat,
+    get_hedge_policy,
+    inject_conversation_summary,
+    record_first_token,
+)
+from ..services.hedging import FIRST_TOKEN_EVENTS, hedged_run
+from ..services.rate_limiter import Lease, Priority, estimate_tokens, get_rate_limiter, provider_limits
+from ..services.context_assembler import assemble_for_run
+from ..services.prompt_cache import CacheUsage, get_prompt_cache_stats, stable_json
+from ..services.conversation_summary import find_summary, summarize_in_background
+from ..services.token_counter import store_message_token_count
+from ..services.resume_policy import ResumableStreamError, ResumePolicy, get_resume_policy, is_transient_error
 from ..services.hook_manager import get_hook_manager
+from ..services.model_pool import get_model_pool
 from . import commands
 
 from rich import print
 
 # Global storage for active run IDs by message ID
 _active_runs: Dict[str, tuple] = {}  # message_id -> (run_id, agent)
+_resume_waits: Dict[str, asyncio.Event] = {}  # message_id -> set to cancel a pending auto-resume
+
 
 
 def parse_model_id(model_id: Optional[str]) -> tuple[str, str]:
@@ -35,7 +53,12 @@ def parse_model_id(model_id: Optional[str]) -> tuple[str, str]:
     return "", model_id
 
 
-def ensure_chat_initialized(app_handle: AppHandle, chat_id: Optional[str], model_id: Optional[str]) -> str:
+def ensure_chat_initialized(
+    app_handle: AppHandle,
+    chat_id: Optional[str],
+    model_id: Optional[str],
+    incognito: bool = False,
+) -> str:
     """
     Create chat and config if needed, and ensure model/provider are up to date.
 
@@ -43,7 +66,9 @@ def ensure_chat_initialized(app_handle: AppHandle, chat_id: Optional[str], model
     """
     if not chat_id:
         chat_id = str(uuid.uuid4())
-        with db.db_session(app_handle) as sess:
+        if incognito:
+            db.register_incognito_chat(chat_id)
+        with db.db_session(app_handle, incognito) as sess:
             now = datetime.utcnow().isoformat()
             db.create_chat(sess, id=chat_id, title="New Chat", model=model_id, createdAt=now, updatedAt=now)
             provider, model = parse_model_id(model_id)
@@ -58,7 +83,9 @@ def ensure_chat_initialized(app_handle: AppHandle, chat_id: Optional[str], model
 
     # Existing chat: ensure agent config exists and, if a model_id was provided,
     # update the provider/model to match the current selection.
-    with db.db_session(app_handle) as sess:
+    with db.db_session(app_handle, db.is_incognito_chat(chat_id)) as sess:
+        # Reopening an archived chat by writing to it brings it back first
+        db.restore_chat(sess, chat_id)
         config = db.get_chat_agent_config(sess, chat_id)
         if not config:
             provider, model = parse_model_id(model_id)
@@ -88,60 +115,34 @@ def ensure_chat_initialized(app_handle: AppHandle, chat_id: Optional[str], model
 def save_user_msg(app_handle: AppHandle, msg: ChatMessage, chat_id: str, parent_id: Optional[str] = None):
     """Save user message to db."""
     with db.db_session(app_handle) as sess:
-        # Get sequence number for siblings
-        sequence = db.get_next_sibling_sequence(sess, parent_id, chat_id)
-        
-        # Create the message
-        message = db.Message(
-            id=msg.id,
-            chatId=chat_id,
+        db.create_branch_message(
+            sess,
+            parent_id=parent_id,
             role=msg.role,
             content=msg.content,
-            createdAt=msg.createdAt or datetime.utcnow().isoformat(),
-            parent_message_id=parent_id,
+            chat_id=chat_id,
             is_complete=True,  # User messages are always complete
-            sequence=sequence,
+            message_id=msg.id,
+            created_at=msg.createdAt,
         )
-        sess.add(message)
-        sess.commit()
-        
+
         # Update active leaf to this message
         db.set_active_leaf(sess, chat_id, msg.id)
+    store_message_token_count(app_handle, msg.id)
 
 
 def init_assistant_msg(app_handle: AppHandle, chat_id: str, parent_id: str) -> str:
     """Create empty assistant message, return id."""
-    msg_id = str(uuid.uuid4())
     with db.db_session(app_handle) as sess:
-        sequence = db.get_next_sibling_sequence(sess, parent_id, chat_id)
-        # Determine model used from chat's agent config
-        model_used: Optional[str] = None
-        try:
-            config = db.get_chat_agent_config(sess, chat_id)
-            if config:
-                provider = config.get("provider") or ""
-                model_id = config.get("model_id") or ""
-                if provider and model_id:
-                    model_used = f"{provider}:{model_id}"
-                else:
-                    model_used = model_id or None
-        except Exception:
-            model_used = None
-        
-        message = db.Message(
-            id=msg_id,
-            chatId=chat_id,
+        msg_id = db.create_branch_message(
+            sess,
+            parent_id=parent_id,
             role="assistant",
             content="",
-            createdAt=datetime.utcnow().isoformat(),
-            parent_message_id=parent_id,
+            chat_id=chat_id,
             is_complete=False,
-            sequence=sequence,
-            model_used=model_used,
         )
-        sess.add(message)
-        sess.commit()
-        
+
         # Update active leaf to this message
         db.set_active_leaf(sess, chat_id, msg_id)
     return msg_id
@@ -157,11 +158,14 @@ def convert_to_agno_messages(chat_msg: ChatMessage) -> List[Message]:
     """
     Convert our ChatMessage format to Agno Message format.
     Handles structured content blocks with tool calls.
+
+    Output must be byte-identical for the same stored message on every turn,
+    or provider prompt caches miss: JSON is written with sorted keys.
     """
     if chat_msg.role == "user":
         content = chat_msg.content
         if isinstance(content, list):
-            content = json.dumps(content)
+            content = stable_json([block.model_dump(exclude_none=True) for block in content])
         return [Message(role="user", content=content)]
     
     if chat_msg.role == "assistant":
@@ -190,7 +194,7 @@ def convert_to_agno_messages(chat_msg: ChatMessage) -> List[Message]:
                             "type": "function",
                             "function": {
                                 "name": block.toolName,
-                                "arguments": json.dumps(block.toolArgs or {})
+                                "arguments": stable_json(block.toolArgs or {})
                             }
                         }]
                     ))
@@ -204,7 +208,7 @@ def convert_to_agno_messages(chat_msg: ChatMessage) -> List[Message]:
                             "type": "function",
                             "function": {
                                 "name": block.toolName,
-                                "arguments": json.dumps(block.toolArgs or {})
+                                "arguments": stable_json(block.toolArgs or {})
                             }
                         }]
                     ))
@@ -252,27 +256,243 @@ async def handle_content_stream(
     assistant_msg_id: str,
     ch: Channel[ChatEvent],
 ):
-    agno_messages = []
-    for msg in messages:
-        agno_messages.extend(convert_to_agno_messages(msg))
+    run_agents = [agent]
+    chat_id, provider = await asyncio.to_thread(_message_route, app_handle, assistant_msg_id)
+    limits = await asyncio.to_thread(provider_limits, app_handle, provider) if provider else None
+    policy = await asyncio.to_thread(get_resume_policy, app_handle)
+    attempt = 0
+    try:
+        while True:
+            tokens = estimate_tokens("".join(str(m.content) for m in messages))
+            try:
+                async with get_rate_limiter().slot(provider or "unknown", limits, Priority.INTERACTIVE, tokens) as lease:
+                    await _stream_agent_run(
+                        app_handle, agent, messages, assistant_msg_id, ch, run_agents, lease,
+                        resumable=bool(chat_id) and policy.allows(attempt),
+                    )
+                return
+            except ResumableStreamError as e:
+                attempt += 1
+                if not await _wait_to_resume(app_handle, assistant_msg_id, ch, policy, attempt, e.error):
+                    return
+            # Resume into the same message, exactly as continue_message would
+            messages, blocks = await asyncio.to_thread(load_continuation, app_handle, chat_id, assistant_msg_id)
+            ch.send_model(ChatEvent(event="SeedBlocks", blocks=blocks))
+            agent = create_agent_for_chat(chat_id, app_handle, channel=ch, assistant_msg_id=assistant_msg_id)
+            run_agents.append(agent)
+    finally:
+        # Hand any client the run created back to the pool for the next request
+        for run_agent in run_agents:
+            get_model_pool().release(run_agent.model)
+        # Count the reply once, now that its content is final for this run
+        try:
+            await asyncio.to_thread(store_message_token_count, app_handle, assistant_msg_id)
+        except Exception as e:
+            print(f"[stream] Warning: Failed to count tokens for {assistant_msg_id}: {e}")
+        if chat_id:
+            # Roll the chat's summary forward off the request path
+            summarize_in_background(app_handle, chat_id, assistant_msg_id)
+
+
+async def _wait_to_resume(
+    app_handle: AppHandle,
+    msg_id: str,
+    ch: Channel[ChatEvent],
+    policy: ResumePolicy,
+    attempt: int,
+    error: Any,
+) -> bool:
+    """Back off before a resume. Returns False if the user cancelled meanwhile."""
+    delay = policy.delay(attempt, error)
+    print(f"[stream] Transient error ({error}), resuming {msg_id} in {delay:.1f}s (attempt {attempt}/{policy.max_attempts})")
+    ch.send_model(ChatEvent(event="RunResuming", error=str(error), attempt=attempt, retryInMs=int(delay * 1000)))
+    cancelled = _resume_waits[msg_id] = asyncio.Event()
+    try:
+        await asyncio.wait_for(cancelled.wait(), delay)
+    except asyncio.TimeoutError:
+        return True
+    finally:
+        _resume_waits.pop(msg_id, None)
+    ch.send_model(ChatEvent(event="RunCancelled"))
+    return False
+
+
+def load_continuation(
+    app_handle: AppHandle, chat_id: Optional[str], message_id: str
+) -> tuple[List[ChatMessage], List[Dict[str, Any]]]:
+    """
+    Load what a continuation of an assistant message needs.
+    
+    Args:
+        app_handle: Tauri app handle
+        chat_id: Chat the message belongs to (None walks the path in SQL)
+        message_id: Assistant message being continued
+        
+    Returns:
+        (message path up to and including it, its saved blocks without trailing errors)
+    """
+    with db.db_session(app_handle) as sess:
+        chat_messages = []
+        for m in db.get_message_path(sess, message_id, chat_id):
+            content = m.content
+            if isinstance(content, str) and content.strip().startswith('['):
+                try:
+                    content = json.loads(content)
+                except Exception:
+                    # Keep as-is if parsing fails (legacy/plain text)
+                    pass
+            chat_messages.append(
+                ChatMessage(
+                    id=m.id,
+                    role=m.role,
+                    content=content,
+                    createdAt=m.createdAt,
+                )
+            )
+    blocks, _ = load_initial_content(app_handle, message_id)
+    return chat_messages, blocks
+
+
+def _message_route(app_handle: AppHandle, msg_id: str) -> tuple[Optional[str], Optional[str]]:
+    """Chat id and provider (from provider:model_id) of a message."""
+    with db.db_session(app_handle) as sess:
+        msg = sess.get(db.Message, msg_id)
+        if not msg:
+            return None, None
+        provider = msg.model_used.split(":", 1)[0] if msg.model_used and ":" in msg.model_used else None
+        return msg.chatId, provider
+
+
+def _switch_to_fallback_model(app_handle: AppHandle, msg_id: str, provider: str, model_id: str) -> bool:
+    """Record the hedge fallback as the message's model. Returns its parse_think_tags setting."""
+    with db.db_session(app_handle) as sess:
+        message = sess.get(db.Message, msg_id)
+        if message:
+            message.model_used = f"{provider}:{model_id}"
+            sess.commit()
+        record = db.get_model_record(sess, provider, model_id)
+        return bool(record and record.parse_think_tags)
+
+
+async def _transient_errors_as_events(stream: Any) -> Any:
+    """Turn a transient exception from the run into a RunError chunk, so the partial reply is flushed."""
+    try:
+        async for chunk in stream:
+            yield chunk
+    except Exception as e:
+        if not is_transient_error(e):
+            raise
+        yield SimpleNamespace(event=RunEvent.run_error, error=e, run_id=None)
+
+
+def _record_usage(app_handle: AppHandle, msg_id: str, provider: Optional[str], metrics: Any) -> Optional[Dict[str, int]]:
+    """Store a completed run's cached/uncached input tokens on its message. Returns the run's usage."""
+    usage = CacheUsage.from_metrics(metrics, provider)
+    if usage is None:
+        return None
+    get_prompt_cache_stats().record(provider or "unknown", usage)
+    try:
+        with db.db_session(app_handle) as sess:
+            db.add_message_usage(sess, msg_id, usage.as_dict())
+    except Exception as e:
+        print(f"[stream] Warning: Failed to record usage for {msg_id}: {e}")
+    return usage.as_dict()
+
 
+def _record_ttft(agent: Agent, started: float) -> None:
+    pool = get_model_pool()
+    ttft = time.perf_counter() - started
+    warm = pool.is_warm(agent.model)
+    if warm is not None:
+        pool.record_ttft(warm, ttft)
+    print(f"[stream] TTFT {ttft * 1000:.0f}ms ({'reused' if warm else 'new'} client)")
+    record_first_token()
+
+
+async def _stream_agent_run(
+    app_handle: AppHandle,
+    agent: Agent,
+    messages: List[ChatMessage],
+    assistant_msg_id: str,
+    ch: Channel[ChatEvent],
+    run_agents: List[Agent],
+    lease: Lease,
+    resumable: bool = False,
+):
     # Check if we should parse think tags for this model
     parse_think_tags = False
+    chat_id = None
+    provider = model_id = None
     try:
         with db.db_session(app_handle) as sess:
             msg = sess.get(db.Message, assistant_msg_id)
+            chat_id = msg.chatId if msg else None
             if msg and msg.model_used:
                 # Parse provider:model_id format
                 parts = msg.model_used.split(':', 1)
                 if len(parts) == 2:
                     provider, model_id = parts
-                    model_settings = db.get_model_settings(sess, provider, model_id)
+                    model_settings = db.get_model_record(sess, provider, model_id)
                     if model_settings:
                         parse_think_tags = model_settings.parse_think_tags
     except Exception as e:
         print(f"[stream] Warning: Failed to check parse_think_tags: {e}")
 
-    response_stream = agent.arun(input=agno_messages, stream=True, stream_events=True)
+    # Replace the longest already-summarized prefix of the path with its summary
+    summary = await asyncio.to_thread(find_summary, app_handle, chat_id, assistant_msg_id) if chat_id else None
+    if summary:
+        covered = set(summary.message_ids)
+        remaining = [m for m in messages if m.id not in covered]
+        if remaining:
+            messages = remaining
+            inject_conversation_summary(agent, summary.text)
+            ch.send_model(ChatEvent(event="ContextSummarized", context={
+                "summarizedMessages": len(summary.message_ids),
+                "coveredTokens": summary.covered_tokens,
+                "summaryTokens": summary.summary_tokens,
+            }))
+        else:
+            summary = None
+
+    # Fit the history into the model's context window
+    context = await asyncio.to_thread(assemble_for_run, app_handle, agent, messages, chat_id, provider, model_id)
+    if context.trimmed:
+        ch.send_model(ChatEvent(event="ContextTrimmed", context=context.summary()))
+    agno_messages = []
+    for msg in context.messages:
+        agno_messages.extend(convert_to_agno_messages(msg))
+
+    started = time.perf_counter()
+    hedge = get_hedge_policy(chat_id, app_handle) if chat_id else None
+    if hedge:
+        fallback_limits = await asyncio.to_thread(provider_limits, app_handle, hedge.provider)
+        agent, path, response_stream, fallback_lease = await hedged_run(
+            agent,
+            agno_messages,
+            hedge,
+            lambda: inject_conversation_summary(
+                create_agent_for_chat(
+                    chat_id,
+                    app_handle,
+                    channel=ch,
+                    assistant_msg_id=assistant_msg_id,
+                    model=(hedge.provider, hedge.model_id),
+                ),
+                summary.text if summary else None,
+            ),
+            # The fallback queues for its own provider's slot and holds it while it runs
+            lambda: get_rate_limiter().slot(hedge.provider, fallback_limits, Priority.INTERACTIVE, lease.tokens),
+        )
+        run_agents.append(agent)
+        if path == "fallback":
+            parse_think_tags = _switch_to_fallback_model(app_handle, assistant_msg_id, hedge.provider, hedge.model_id)
+            provider, model_id = hedge.provider, hedge.model_id
+            # Usage and rate-limit errors from here on belong to the fallback's provider
+            lease = fallback_lease
+    else:
+        response_stream = agent.arun(input=agno_messages, stream=True, stream_events=True)
+    if resumable:
+        response_stream = _transient_errors_as_events(response_stream)
 
     content_blocks, tool_counter = load_initial_content(app_handle, assistant_msg_id)
     current_text = ""
@@ -389,7 +609,13 @@ async def handle_content_stream(
     def save_final():
         return json.dumps(content_blocks)
     
+    got_first_token = False
+
     async for chunk in response_stream:
+        if not got_first_token and chunk.event in FIRST_TOKEN_EVENTS:
+            got_first_token = True
+            _record_ttft(agent, started)
+
         if not run_id and chunk.run_id:
             run_id = chunk.run_id
             _active_runs[assistant_msg_id] = (run_id, agent)
@@ -495,18 +721,28 @@ async def handle_content_stream(
             ch.send_model(ChatEvent(event="ReasoningCompleted"))
         
         elif chunk.event == RunEvent.run_completed:
+            metrics = getattr(chunk, "metrics", None)
+            lease.settle(getattr(metrics, "total_tokens", None))
+            usage = _record_usage(app_handle, assistant_msg_id, provider, metrics)
             flush_think_tag_buffer()
             flush_text()
             flush_reasoning()
             await asyncio.to_thread(save_msg_content, app_handle, assistant_msg_id, save_final())
             with db.db_session(app_handle) as sess:
                 db.mark_message_complete(sess, assistant_msg_id)
-            ch.send_model(ChatEvent(event="RunCompleted"))
+            ch.send_model(ChatEvent(event="RunCompleted", usage=usage))
         
         elif chunk.event == RunEvent.run_error:
+            error = getattr(chunk, "error", None) or chunk
+            lease.report_error(error)
             flush_think_tag_buffer()
             flush_text()
             flush_reasoning()
+            if resumable and is_transient_error(error):
+                # Keep the partial reply (no error block); the caller resumes from it
+                await asyncio.to_thread(save_msg_content, app_handle, assistant_msg_id, save_final())
+                _active_runs.pop(assistant_msg_id, None)
+                raise ResumableStreamError(error)
             content_blocks.append({
                 "type": "error",
                 "content": str(chunk.error.message if hasattr(chunk.error, 'message') else chunk),
@@ -532,6 +768,8 @@ class StreamChatRequest(BaseModel):
     messages: List[Dict[str, Any]]
     modelId: Optional[str] = None
     chatId: Optional[str] = None
+    # Only used when starting a new chat (no chatId)
+    incognito: bool = False
 
 
 def parse_think_tags_from_content(content: str) -> List[Dict[str, Any]]:
@@ -632,6 +870,7 @@ def reprocess_message_with_think_tags(app_handle: AppHandle, message_id: str) ->
 
 class CancelRunRequest(BaseModel):
     messageId: str
+    chatId: Optional[str] = None
 
 
 class RespondToToolApprovalInput(BaseModel):
@@ -662,6 +901,13 @@ async def cancel_run(body: CancelRunRequest, app_handle: AppHandle) -> dict:
     """Cancel an active streaming run. Returns {cancelled: bool}"""
     message_id = body.messageId
     
+    if message_id in _resume_waits:
+        # Between attempts of an auto-resume: stop it instead of cancelling a run
+        _resume_waits[message_id].set()
+        with db.db_session(app_handle, db.is_incognito_chat(body.chatId)) as sess:
+            db.mark_message_complete(sess, message_id)
+        return {"cancelled": True}
+    
     if message_id not in _active_runs:
         print(f"[cancel_run] No active run found for message {message_id}")
         return {"cancelled": False}
@@ -673,7 +919,7 @@ async def cancel_run(body: CancelRunRequest, app_handle: AppHandle) -> dict:
         agent.cancel_run(run_id)
         
         # Mark message as complete in database
-        with db.db_session(app_handle) as sess:
+        with db.db_session(app_handle, db.is_incognito_chat(body.chatId)) as sess:
             db.mark_message_complete(sess, message_id)
         
         # Clean up tracking
@@ -687,11 +933,13 @@ async def cancel_run(body: CancelRunRequest, app_handle: AppHandle) -> dict:
 
 
 @commands.command()
+@db.chat_scoped(lambda body: body.chatId)
 async def stream_chat(
     body: StreamChatRequest,
     webview_window: WebviewWindow,
     app_handle: AppHandle,
 ) -> None:
+    begin_agent_request()
     ch: Channel[ChatEvent] = body.channel.channel_on(webview_window.as_ref_webview())
     messages: List[ChatMessage] = [
         ChatMessage(
@@ -704,30 +952,32 @@ async def stream_chat(
         for m in body.messages
     ]
     
-    chat_id = ensure_chat_initialized(app_handle, body.chatId, body.modelId)
-    
+    chat_id = ensure_chat_initialized(app_handle, body.chatId, body.modelId, body.incognito)
+    # A new chat only has an id now
+    db.set_chat_scope(chat_id)
+
     # Get the current active leaf to use as parent
     with db.db_session(app_handle) as sess:
         chat = sess.get(db.Chat, chat_id)
         parent_id = chat.active_leaf_message_id if chat else None
-    
+
     if messages and messages[-1].role == "user":
         save_user_msg(app_handle, messages[-1], chat_id, parent_id)
         # Update parent_id to the newly saved user message
         parent_id = messages[-1].id
-    
+
     ch.send_model(ChatEvent(event="RunStarted", sessionId=chat_id))
-    
+
     assistant_msg_id = init_assistant_msg(app_handle, chat_id, parent_id)
-    
+
     ch.send_model(ChatEvent(event="AssistantMessageId", content=assistant_msg_id))
-    
+
     try:
         agent = create_agent_for_chat(chat_id, app_handle, channel=ch, assistant_msg_id=assistant_msg_id)
-        
+
         if not messages or messages[-1].role != "user":
             raise ValueError("No user message found in request")
-        
+
         await handle_content_stream(
             app_handle,
             agent,
@@ -735,11 +985,11 @@ async def stream_chat(
             assistant_msg_id,
             ch,
         )
-        
+
     except Exception as e:
         print(f"[stream] Error: {e}")
         print(traceback.format_exc())
-        
+
         error_block = {
             "type": "error",
             "content": str(e),
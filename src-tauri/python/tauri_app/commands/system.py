@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import asyncio
 import sys
+from typing import Optional
 
+from pydantic import BaseModel
 from pytauri import AppHandle
+from pytauri.ipc import Channel, JavaScriptChannelId
+from pytauri.webview import WebviewWindow
 
 from .. import db
 from ..types import _BaseModel
@@ -21,10 +26,18 @@ from ..models.chat import (
     SaveModelSettingsInput,
     ReasoningInfo,
     ThinkingTagPromptInfo,
+    BackupEvent,
+    ModelCatalogEvent,
 )
-from ..services.model_factory import (
-    get_available_models as get_models_from_factory,
-)
+from ..services.maintenance import snapshot_database
+from ..services.model_pool import get_model_pool
+from ..services.agent_factory import get_agent_template_cache
+from ..services.model_catalog import get_model_catalog
+from ..services.hedging import get_hedge_stats
+from ..services.prompt_cache import get_prompt_cache_stats
+from ..services.rate_limiter import get_rate_limiter
+from ..services.import_timing import get_startup_report as startup_timing_report
+from ..services.provider_registry import get_provider_registry
 from . import commands
 
 
@@ -51,20 +64,102 @@ async def get_available_models(app_handle: AppHandle) -> AvailableModelsResponse
     """
     Get list of available models based on configured providers.
     
+    Served from the persisted catalog; stale providers are refreshed in the
+    background and changes are pushed to `subscribe_model_catalog` channels.
+    
     Returns:
         List of available models with provider, modelId, displayName, and isDefault
     """
-    models_data = get_models_from_factory(app_handle)
-    models = [
-        ModelInfo(
-            provider=m["provider"],
-            modelId=m["modelId"],
-            displayName=m["displayName"],
-            isDefault=m["isDefault"],
-        )
-        for m in models_data
-    ]
-    return AvailableModelsResponse(models=models)
+    models_data = await get_model_catalog().get_models(app_handle)
+    return AvailableModelsResponse(models=[_to_model_info(m) for m in models_data])
+
+
+def _to_model_info(m: dict) -> ModelInfo:
+    return ModelInfo(
+        provider=m["provider"],
+        modelId=m["modelId"],
+        displayName=m["displayName"],
+        isDefault=m["isDefault"],
+    )
+
+
+class StreamAvailableModelsInput(BaseModel):
+    channel: JavaScriptChannelId[ModelCatalogEvent]
+
+
+@commands.command()
+async def stream_available_models(
+    body: StreamAvailableModelsInput,
+    webview_window: WebviewWindow,
+    app_handle: AppHandle,
+) -> None:
+    """
+    Refresh all providers' models concurrently, sending each provider's list
+    over the channel as soon as it arrives (and saving it to the catalog).
+    
+    The first model sent is marked as the default. A provider that fails
+    or misses its deadline sends a ProviderError event instead.
+    
+    Args:
+        body: Contains the catalog channel
+        webview_window: Window the channel belongs to
+        app_handle: Tauri app handle
+    """
+    ch: Channel[ModelCatalogEvent] = body.channel.channel_on(webview_window.as_ref_webview())
+    sent_default = False
+
+    def on_provider(provider: str, models: list, error: Optional[str]) -> None:
+        nonlocal sent_default
+        if error:
+            ch.send_model(ModelCatalogEvent(event="ProviderError", provider=provider, error=error))
+            return
+        if models and not sent_default:
+            models[0]["isDefault"] = sent_default = True
+        ch.send_model(ModelCatalogEvent(
+            event="ProviderModels",
+            provider=provider,
+            models=[_to_model_info(m) for m in models],
+        ))
+
+    await get_model_catalog().refresh(app_handle, on_provider=on_provider)
+    ch.send_model(ModelCatalogEvent(event="CatalogComplete"))
+
+
+class SubscribeModelCatalogInput(BaseModel):
+    channel: JavaScriptChannelId[ModelCatalogEvent]
+
+
+class UnsubscribeModelCatalogInput(_BaseModel):
+    subscriptionId: int
+
+
+@commands.command()
+async def subscribe_model_catalog(
+    body: SubscribeModelCatalogInput,
+    webview_window: WebviewWindow,
+) -> dict:
+    """
+    Receive a CatalogUpdated event whenever a provider's model list changes.
+    
+    Returns:
+        Dict with the subscriptionId to pass to unsubscribe_model_catalog
+    """
+    ch: Channel[ModelCatalogEvent] = body.channel.channel_on(webview_window.as_ref_webview())
+
+    def on_change(provider: str, models: list) -> None:
+        ch.send_model(ModelCatalogEvent(
+            event="CatalogUpdated",
+            provider=provider,
+            models=[_to_model_info(m) for m in models],
+        ))
+
+    return {"subscriptionId": get_model_catalog().subscribe(on_change)}
+
+
+@commands.command()
+async def unsubscribe_model_catalog(body: UnsubscribeModelCatalogInput) -> dict:
+    """Stop catalog notifications for a subscription. Returns {removed: bool}"""
+    return {"removed": get_model_catalog().unsubscribe(body.subscriptionId)}
 
 
 @commands.command()
@@ -117,6 +212,9 @@ async def save_provider_settings(body: SaveProviderConfigInput, app_handle: AppH
         )
     finally:
         sess.close()
+    # Pooled clients hold the old credentials and base URL
+    get_model_pool().invalidate(body.provider)
+    get_model_catalog().invalidate(app_handle, body.provider)
     
     return None
 
@@ -217,16 +315,12 @@ async def get_model_settings(app_handle: AppHandle) -> AllModelSettingsResponse:
         List of model settings with reasoning support flags
     """
     with db.db_session(app_handle) as sess:
-        models = db.get_all_model_settings(sess)
+        models = db.get_all_model_records(sess)
     
     result = []
     for model in models:
-        reasoning = db.get_reasoning_from_model(model)
-        
-        # Get thinkingTagPrompted from extra
-        from ..db.model_ops import _parse_extra
-        extra = _parse_extra(model.extra)
-        thinking_tag_prompted = extra.get("thinkingTagPrompted", {})
+        reasoning = model.reasoning
+        thinking_tag_prompted = model.extra.get("thinkingTagPrompted", {})
         
         result.append(
             ModelSettingsInfo(
@@ -275,6 +369,70 @@ async def save_model_settings(body: SaveModelSettingsInput, app_handle: AppHandl
     return None
 
 
+@commands.command()
+async def get_cache_stats(app_handle: AppHandle) -> dict:
+    """Hit/miss counters for the in-memory DB caches."""
+    return {
+        "settings": db.get_settings_cache().stats(),
+        "chatConfig": db.get_chat_config_cache().stats(),
+        "treeIndex": db.get_tree_index_cache().stats(),
+        "modelPool": get_model_pool().stats(),
+        "agentTemplates": get_agent_template_cache().stats(),
+        "modelCatalog": get_model_catalog().stats(),
+        "hedging": get_hedge_stats().stats(),
+        "rateLimits": get_rate_limiter().stats(),
+        "promptCache": get_prompt_cache_stats().stats(),
+    }
+
+
+@commands.command()
+async def get_startup_report() -> dict:
+    """
+    Startup timing: ms per startup phase, per provider SDK imported on first
+    use, and (with IMPORT_TIMING=1) the slowest packages by import time.
+    """
+    report = startup_timing_report()
+    report["loadedProviders"] = get_provider_registry().loaded()
+    return report
+
+
+class BackupDatabaseInput(BaseModel):
+    channel: JavaScriptChannelId[BackupEvent]
+
+
+@commands.command()
+async def backup_database(
+    body: BackupDatabaseInput,
+    webview_window: WebviewWindow,
+    app_handle: AppHandle,
+) -> dict:
+    """
+    Take an online backup now, streaming page progress over the channel.
+
+    Args:
+        body: Contains the progress channel
+        webview_window: Window the channel belongs to
+        app_handle: Tauri app handle
+
+    Returns:
+        Dict with the snapshot path (None on failure)
+    """
+    ch: Channel[BackupEvent] = body.channel.channel_on(webview_window.as_ref_webview())
+
+    def on_progress(database: str, remaining: int, total: int) -> None:
+        ch.send_model(BackupEvent(event="BackupProgress", database=database, remaining=remaining, total=total))
+
+    try:
+        snapshot = await asyncio.to_thread(snapshot_database, app_handle, True, on_progress)
+    except Exception as e:
+        print(f"[backup_database] Error: {e}")
+        ch.send_model(BackupEvent(event="BackupError", error=str(e)))
+        return {"path": None}
+
+    ch.send_model(BackupEvent(event="BackupCompleted", path=str(snapshot)))
+    return {"path": str(snapshot)}
+
+
 class RespondToThinkingTagPromptInput(_BaseModel):
     provider: str
     modelId: str
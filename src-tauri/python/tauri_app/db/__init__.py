@@ -8,6 +8,13 @@ from .core import (
     get_db_path,
     get_resource_dir,
     set_db_path,
+    get_archive_path,
+    chat_scope,
+    chat_scoped,
+    set_chat_scope,
+    register_incognito_chat,
+    is_incognito_chat,
+    has_incognito_chats,
 )
 
 # Models
@@ -18,8 +25,20 @@ from .models import (
     ProviderSettings,
     UserSettings,
     Model,
+    ConversationSummary,
 )
 
+# Settings cache
+from .cache import (
+    ProviderRecord,
+    ModelRecord,
+    get_settings_cache,
+    get_chat_config_cache,
+)
+
+# Branch-tree index for open chats
+from .tree_index import ChatTreeIndex, get_tree_index_cache
+
 # Chat operations
 from .chats import (
     list_chats,
@@ -27,23 +46,64 @@ from .chats import (
     create_chat,
     update_chat,
     delete_chat,
+    delete_chats,
     append_message,
     update_message_content,
     get_message_path,
     get_message_children,
+    get_message_siblings,
+    get_chat_tree,
+    get_active_path_siblings,
     get_next_sibling_sequence,
     set_active_leaf,
     create_branch_message,
     mark_message_complete,
+    set_message_token_count,
+    add_message_usage,
+    bulk_set_token_counts,
+    get_message_token_counts,
+    get_uncounted_messages,
+    get_path_token_count,
+    get_path_token_rows,
     get_leaf_descendant,
     get_chat_agent_config,
+    get_chat_agent_config_versioned,
+    get_chat_model_used,
     update_chat_agent_config,
     get_default_agent_config,
 )
 
+# Conversation summaries
+from .summaries import (
+    has_conversation_summaries,
+    get_conversation_summaries,
+    save_conversation_summary,
+)
+
+# Archive operations
+from .archive import (
+    archive_cold_chats,
+    restore_chat,
+    is_archived,
+    incremental_vacuum,
+)
+
+# Branch compaction
+from .compaction import compact_branches
+
+# Backups
+from .backup import (
+    backup_database,
+    list_backups,
+    last_backup_time,
+    rotate_backups,
+    get_backup_dir,
+)
+
 # Provider operations
 from .providers import (
     get_provider_settings,
+    get_provider_record,
     get_all_provider_settings,
     save_provider_settings,
 )
@@ -52,9 +112,13 @@ from .providers import (
 from .model_ops import (
     get_model_settings,
     get_all_model_settings,
+    get_model_record,
+    get_all_model_records,
     save_model_settings,
     upsert_model_settings,
     get_reasoning_from_model,
+    get_catalog_records,
+    bulk_upsert_model_metadata,
 )
 
 # User settings operations
@@ -78,6 +142,13 @@ __all__ = [
     "get_db_path",
     "get_resource_dir",
     "set_db_path",
+    "get_archive_path",
+    "chat_scope",
+    "chat_scoped",
+    "set_chat_scope",
+    "register_incognito_chat",
+    "is_incognito_chat",
+    "has_incognito_chats",
     # Models
     "Base",
     "Chat",
@@ -85,34 +156,78 @@ __all__ = [
     "ProviderSettings",
     "UserSettings",
     "Model",
+    "ConversationSummary",
+    # Settings cache
+    "ProviderRecord",
+    "ModelRecord",
+    "get_settings_cache",
+    "get_chat_config_cache",
+    # Tree index
+    "ChatTreeIndex",
+    "get_tree_index_cache",
     # Chats
     "list_chats",
     "get_chat_messages",
     "create_chat",
     "update_chat",
     "delete_chat",
+    "delete_chats",
     "append_message",
     "update_message_content",
     "get_message_path",
     "get_message_children",
+    "get_message_siblings",
+    "get_chat_tree",
+    "get_active_path_siblings",
     "get_next_sibling_sequence",
     "set_active_leaf",
     "create_branch_message",
     "mark_message_complete",
+    "set_message_token_count",
+    "add_message_usage",
+    "bulk_set_token_counts",
+    "get_message_token_counts",
+    "get_uncounted_messages",
+    "get_path_token_count",
+    "get_path_token_rows",
     "get_leaf_descendant",
     "get_chat_agent_config",
+    "get_chat_agent_config_versioned",
+    "get_chat_model_used",
     "update_chat_agent_config",
     "get_default_agent_config",
+    # Conversation summaries
+    "has_conversation_summaries",
+    "get_conversation_summaries",
+    "save_conversation_summary",
+    # Archive
+    "archive_cold_chats",
+    "restore_chat",
+    "is_archived",
+    "incremental_vacuum",
+    # Compaction
+    "compact_branches",
+    # Backups
+    "backup_database",
+    "list_backups",
+    "last_backup_time",
+    "rotate_backups",
+    "get_backup_dir",
     # Providers
     "get_provider_settings",
+    "get_provider_record",
     "get_all_provider_settings",
     "save_provider_settings",
     # Model Operations
     "get_model_settings",
     "get_all_model_settings",
+    "get_model_record",
+    "get_all_model_records",
     "save_model_settings",
     "upsert_model_settings",
     "get_reasoning_from_model",
+    "get_catalog_records",
+    "bulk_upsert_model_metadata",
     # Settings
     "get_user_setting",
     "set_user_setting",
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List
+
+import sqlalchemy
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .cache import get_chat_config_cache
+from .core import _get_engine
+from .models import Chat, Message
+from .tree_index import get_tree_index_cache
+
+# Cold chats are moved into `archive.db`, attached to every connection as the
+# `archive` schema. The archive tables mirror `chats`/`messages` exactly, so rows
+# move with a plain INSERT ... SELECT and reads can UNION across both.
+ARCHIVE_SCHEMA = "archive"
+
+_archive_metadata = sqlalchemy.MetaData()
+archived_chats = Chat.__table__.to_metadata(_archive_metadata, schema=ARCHIVE_SCHEMA)
+archived_messages = Message.__table__.to_metadata(_archive_metadata, schema=ARCHIVE_SCHEMA)
+
+_MOVES = (
+    # (source, destination) pairs in foreign-key order: chats before messages
+    (Chat.__table__, archived_chats),
+    (Message.__table__, archived_messages),
+)
+
+_TOUCH_STMT = (
+    sqlalchemy.update(Chat.__table__)
+    .where(Chat.__table__.c.id == sqlalchemy.bindparam("chat_id"))
+    .values(accessedAt=sqlalchemy.bindparam("now"))
+)
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+def chunks(ids: List[str]) -> Iterator[List[str]]:
+    for i in range(0, len(ids), _CHUNK):
+        yield ids[i:i + _CHUNK]
+
+
+def create_archive_schema(engine: Engine) -> None:
+    """Create the archive tables and add any columns added to the models since."""
+    _archive_metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table in (archived_chats, archived_messages):
+            existing = {
+                row[1] for row in conn.exec_driver_sql(f"PRAGMA {ARCHIVE_SCHEMA}.table_info({table.name})")
+            }
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(engine.dialect)
+                    print(f"[db] Adding {column.name} column to {ARCHIVE_SCHEMA}.{table.name}")
+                    conn.exec_driver_sql(
+                        f'ALTER TABLE {ARCHIVE_SCHEMA}.{table.name} ADD COLUMN "{column.name}" {col_type}'
+                    )
+
+
+def _move_chats(sess: Session, chat_ids: List[str], *, to_archive: bool) -> None:
+    """Copy chats and their messages across schemas, then delete the originals."""
+    for ids in chunks(chat_ids):
+        for hot, cold in _MOVES:
+            src, dst = (hot, cold) if to_archive else (cold, hot)
+            key = src.c.id if src.name == "chats" else src.c.chatId
+            cols = [c.name for c in hot.columns]
+            sess.execute(
+                insert(dst).from_select(cols, select(*(src.c[name] for name in cols)).where(key.in_(ids)))
+            )
+        # Messages of the source chats go with them via ON DELETE CASCADE
+        src_chats = Chat.__table__ if to_archive else archived_chats
+        sess.execute(delete(src_chats).where(src_chats.c.id.in_(ids)))
+
+
+def archive_cold_chats(sess: Session, *, older_than_days: int) -> List[str]:
+    """
+    Move chats untouched for `older_than_days` into the archive database.
+
+    A chat counts as touched when it was updated, restored from the archive or
+    written to (see `touch_chat`), or when its newest message is recent.
+
+    Returns:
+        IDs of the archived chats
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+    last_touched = func.coalesce(Chat.accessedAt, Chat.updatedAt, Chat.createdAt)
+    # Chats used before writes stamped accessedAt are kept alive by their messages
+    recent_message = select(Message.id).where(Message.chatId == Chat.id).where(Message.createdAt >= cutoff).exists()
+    chat_ids = list(sess.scalars(select(Chat.id).where(last_touched < cutoff).where(~recent_message)))
+    if chat_ids:
+        _move_chats(sess, chat_ids, to_archive=True)
+        sess.commit()
+        configs, trees = get_chat_config_cache(), get_tree_index_cache()
+        for chat_id in chat_ids:
+            configs.evict(chat_id)
+            trees.evict(chat_id)
+    return chat_ids
+
+
+def touch_chat(sess: Session, chat_id: str) -> None:
+    """Mark a chat as in use so archiving leaves it alone. Caller commits."""
+    sess.execute(_TOUCH_STMT, {"chat_id": chat_id, "now": datetime.utcnow().isoformat()})
+
+
+def is_archived(sess: Session, chat_id: str) -> bool:
+    return sess.scalar(select(archived_chats.c.id).where(archived_chats.c.id == chat_id)) is not None
+
+
+def restore_chat(sess: Session, chat_id: str) -> bool:
+    """Un-archive a chat on open. Returns True if it was in the archive."""
+    if not is_archived(sess, chat_id):
+        return False
+    _move_chats(sess, [chat_id], to_archive=False)
+    touch_chat(sess, chat_id)
+    sess.commit()
+    return True
+
+
+def delete_archived_chats(sess: Session, chat_ids: Iterable[str]) -> None:
+    """Delete chats from the archive; messages follow via ON DELETE CASCADE. Caller commits."""
+    for ids in chunks(list(chat_ids)):
+        sess.execute(delete(archived_chats).where(archived_chats.c.id.in_(ids)))
+
+
+def incremental_vacuum() -> None:
+    """
+    Return free pages from the hot DB to the filesystem after archiving.
+
+    Existing databases are switched to auto_vacuum=INCREMENTAL with a one-time
+    full VACUUM; after that only the freed pages are released.
+    """
+    engine = _get_engine()
+    if engine is None:
+        return
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        mode = conn.exec_driver_sql("PRAGMA main.auto_vacuum").scalar()
+        if mode != 2:
+            print("[db] Enabling incremental auto_vacuum (one-time VACUUM)")
+            conn.exec_driver_sql("PRAGMA main.auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM main")
+        else:
+            conn.exec_driver_sql("PRAGMA main.incremental_vacuum")
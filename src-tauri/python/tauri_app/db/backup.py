@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+from pytauri import App, AppHandle
+from pytauri.ffi.webview import WebviewWindow
+
+from .core import _ensure_engine, _get_engine, get_db_path
+
+# (schema, pages_remaining, pages_total) after each backup step
+BackupProgress = Callable[[str, int, int], None]
+
+# Each snapshot is a directory holding a copy of every schema on the connection
+_SCHEMAS = (("main", "app.db"), ("archive", "archive.db"))
+_STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+# Writers on other connections force the backup to restart. After this many
+# restarts the attempt is abandoned and retried after a backoff; copying in
+# one step instead would hold the read lock for the whole copy and stall them.
+_MAX_RESTARTS = 3
+_MAX_ATTEMPTS = 4
+_RETRY_BACKOFF_S = 2.0
+
+_backup_lock = threading.Lock()
+
+
+class _Restarted(Exception):
+    pass
+
+
+class BackupBusyError(RuntimeError):
+    """Writes kept restarting the backup; the next scheduled run tries again."""
+
+
+def get_backup_dir(app: Union[App, AppHandle, WebviewWindow]) -> Path:
+    return get_db_path(app).parent / "backups"
+
+
+def list_backups(app: Union[App, AppHandle, WebviewWindow]) -> List[Path]:
+    """Completed snapshots, newest first."""
+    backup_dir = get_backup_dir(app)
+    if not backup_dir.exists():
+        return []
+    snapshots = [p for p in backup_dir.iterdir() if p.is_dir() and not p.name.endswith(".partial")]
+    return sorted(snapshots, key=lambda p: p.name, reverse=True)
+
+
+def last_backup_time(app: Union[App, AppHandle, WebviewWindow]) -> Optional[datetime]:
+    for snapshot in list_backups(app):
+        try:
+            return datetime.strptime(snapshot.name, _STAMP_FORMAT)
+        except ValueError:
+            continue
+    return None
+
+
+def _copy_schema(
+    src: sqlite3.Connection,
+    dest_path: Path,
+    schema: str,
+    *,
+    pages: int,
+    sleep_s: float,
+    progress: Optional[BackupProgress],
+) -> None:
+    """
+    Copy one schema in `pages`-sized steps, pausing between steps for writers.
+
+    An attempt that keeps restarting under writes is abandoned and retried
+    after an exponential backoff, so the source is never locked for more than
+    one step. Raises BackupBusyError once every attempt has been abandoned.
+    """
+    dest = sqlite3.connect(str(dest_path))
+    try:
+        for attempt in range(_MAX_ATTEMPTS):
+            try:
+                _copy_schema_attempt(src, dest, schema, pages=pages, sleep_s=sleep_s, progress=progress)
+                return
+            except _Restarted:
+                if attempt + 1 == _MAX_ATTEMPTS:
+                    break
+                delay = _RETRY_BACKOFF_S * 2 ** attempt
+                print(f"[db] Backup of {schema} kept restarting under writes; retrying in {delay:.0f}s")
+                time.sleep(delay)
+    finally:
+        dest.close()
+    raise BackupBusyError(f"backup of {schema} restarted too often under concurrent writes")
+
+
+def _copy_schema_attempt(
+    src: sqlite3.Connection,
+    dest: sqlite3.Connection,
+    schema: str,
+    *,
+    pages: int,
+    sleep_s: float,
+    progress: Optional[BackupProgress],
+) -> None:
+    restarts = 0
+    last_remaining: Optional[int] = None
+
+    def on_step(_status: int, remaining: int, total: int) -> None:
+        nonlocal restarts, last_remaining
+        # A restart starts over from the full page count, so no progress means one happened
+        if last_remaining is not None and remaining >= last_remaining:
+            restarts += 1
+            if restarts > _MAX_RESTARTS:
+                raise _Restarted()
+        last_remaining = remaining
+        if progress:
+            progress(schema, remaining, total)
+        # The source is unlocked between steps; give streaming writes a turn
+        if remaining and sleep_s:
+            time.sleep(sleep_s)
+
+    src.backup(dest, pages=pages, progress=on_step, name=schema)
+
+
+def backup_database(
+    app: Union[App, AppHandle, WebviewWindow],
+    *,
+    keep: int = 7,
+    pages: int = 256,
+    sleep_s: float = 0.01,
+    progress: Optional[BackupProgress] = None,
+) -> Path:
+    """
+    Snapshot app.db and archive.db with SQLite's online backup API.
+
+    The copy runs in small page batches on a pooled connection, so it never
+    holds a lock long enough to stall writers. Snapshots are written to a
+    `.partial` directory and renamed when complete, so a crash never leaves a
+    torn backup behind.
+
+    Args:
+        app: Tauri app (or handle/window) used to locate the DB
+        keep: Number of snapshots to retain (older ones are deleted)
+        pages: Pages copied per step
+        sleep_s: Pause between steps
+        progress: Optional callback receiving (schema, remaining, total) pages
+
+    Returns:
+        Path of the new snapshot directory
+    """
+    with _backup_lock:
+        return _backup_locked(app, keep=keep, pages=pages, sleep_s=sleep_s, progress=progress)
+
+
+def _backup_locked(
+    app: Union[App, AppHandle, WebviewWindow],
+    *,
+    keep: int,
+    pages: int,
+    sleep_s: float,
+    progress: Optional[BackupProgress],
+) -> Path:
+    _ensure_engine(app)
+    engine = _get_engine()
+    backup_dir = get_backup_dir(app)
+    name = datetime.utcnow().strftime(_STAMP_FORMAT)
+    partial = backup_dir / f"{name}.partial"
+    partial.mkdir(parents=True, exist_ok=True)
+
+    raw = engine.raw_connection()
+    try:
+        for schema, filename in _SCHEMAS:
+            _copy_schema(
+                raw.driver_connection,
+                partial / filename,
+                schema,
+                pages=pages,
+                sleep_s=sleep_s,
+                progress=progress,
+            )
+    except Exception:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    finally:
+        raw.close()
+
+    snapshot = backup_dir / name
+    if snapshot.exists():
+        shutil.rmtree(snapshot)
+    partial.rename(snapshot)
+    rotate_backups(app, keep=keep)
+    return snapshot
+
+
+def rotate_backups(app: Union[App, AppHandle, WebviewWindow], *, keep: int) -> List[Path]:
+    """Delete all but the newest `keep` snapshots (and stale partials). Returns removed paths."""
+    removed = list_backups(app)[max(keep, 1):]
+    backup_dir = get_backup_dir(app)
+    if backup_dir.exists():
+        removed += [p for p in backup_dir.glob("*.partial") if p.is_dir()]
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import copy
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Model, ProviderSettings, UserSettings
+
+
+def _parse_json_object(raw: Optional[str]) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    try:
+        parsed = json.loads(raw)
+        return parsed if isinstance(parsed, dict) else {}
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+@dataclass(frozen=True)
+class ProviderRecord:
+    """Parsed provider settings row."""
+    provider: str
+    api_key: Optional[str]
+    base_url: Optional[str]
+    extra_raw: Optional[str]
+    enabled: bool
+    # Shared by every reader of the cache: only exposed as a copy (see `extra`)
+    _extra: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        """Parsed extra JSON (a copy callers may mutate)."""
+        return copy.deepcopy(self._extra)
+
+    @classmethod
+    def from_row(cls, row: Any) -> "ProviderRecord":
+        return cls(
+            provider=row.provider,
+            api_key=row.api_key,
+            base_url=row.base_url,
+            extra_raw=row.extra,
+            enabled=row.enabled,
+            _extra=_parse_json_object(row.extra),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Shape returned by the db provider functions (extra stays a raw JSON string)."""
+        return {
+            "provider": self.provider,
+            "api_key": self.api_key,
+            "base_url": self.base_url,
+            "extra": self.extra_raw,
+            "enabled": self.enabled,
+        }
+
+
+@dataclass(frozen=True)
+class ModelRecord:
+    """Parsed model settings row."""
+    provider: str
+    model_id: str
+    parse_think_tags: bool
+    # Shared by every reader of the cache: only exposed as a copy (see `extra`)
+    _extra: Dict[str, Any] = field(default_factory=dict, repr=False)
+    display_name: Optional[str] = None
+    fetched_at: Optional[str] = None
+    catalog_position: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row: Any) -> "ModelRecord":
+        return cls(
+            provider=row.provider,
+            model_id=row.model_id,
+            parse_think_tags=row.parse_think_tags,
+            _extra=_parse_json_object(row.extra),
+            display_name=row.display_name,
+            fetched_at=row.fetched_at,
+            catalog_position=row.catalog_position,
+        )
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        """Parsed extra JSON (a copy callers may mutate)."""
+        return copy.deepcopy(self._extra)
+
+    @property
+    def reasoning(self) -> Dict[str, Any]:
+        """Reasoning settings (a copy callers may mutate)."""
+        return copy.deepcopy(self._extra.get("reasoning", {"supports": False, "isUserOverride": False}))
+
+
+class SettingsCache:
+    """
+    Write-through cache of provider, model and user settings.
+
+    Each table is loaded in full on first read; the `save_*` functions push
+    their committed rows back in, so reads never go to SQLite again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._providers: Optional[Dict[str, ProviderRecord]] = None
+        self._models: Optional[Dict[Tuple[str, str], ModelRecord]] = None
+        self._user: Optional[Dict[str, str]] = None
+        self._parsed_user: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, loaded: bool) -> None:
+        if loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    # Loaders
+
+    def _load_providers(self, sess: Session) -> Dict[str, ProviderRecord]:
+        if self._providers is None:
+            rows = sess.execute(select(ProviderSettings.__table__)).all()
+            self._providers = {r.provider: ProviderRecord.from_row(r) for r in rows}
+        return self._providers
+
+    def _load_models(self, sess: Session) -> Dict[Tuple[str, str], ModelRecord]:
+        if self._models is None:
+            rows = sess.execute(select(Model.__table__)).all()
+            self._models = {(r.provider, r.model_id): ModelRecord.from_row(r) for r in rows}
+        return self._models
+
+    def _load_user(self, sess: Session) -> Dict[str, str]:
+        if self._user is None:
+            rows = sess.execute(select(UserSettings.__table__)).all()
+            self._user = {r.key: r.value for r in rows}
+        return self._user
+
+    # Reads
+
+    def providers(self, sess: Session) -> Dict[str, ProviderRecord]:
+        with self._lock:
+            self._count(self._providers is not None)
+            return dict(self._load_providers(sess))
+
+    def provider(self, sess: Session, provider: str) -> Optional[ProviderRecord]:
+        with self._lock:
+            self._count(self._providers is not None)
+            return self._load_providers(sess).get(provider)
+
+    def models(self, sess: Session, provider: Optional[str] = None) -> List[ModelRecord]:
+        with self._lock:
+            self._count(self._models is not None)
+            records = self._load_models(sess).values()
+            return [m for m in records if provider is None or m.provider == provider]
+
+    def model(self, sess: Session, provider: str, model_id: str) -> Optional[ModelRecord]:
+        with self._lock:
+            self._count(self._models is not None)
+            return self._load_models(sess).get((provider, model_id))
+
+    def user_setting(self, sess: Session, key: str) -> Optional[str]:
+        with self._lock:
+            self._count(self._user is not None)
+            return self._load_user(sess).get(key)
+
+    def parsed_user_setting(self, sess: Session, key: str, parse: Callable[[Optional[str]], Any]) -> Any:
+        """Parse a user setting once; returns a deep copy so callers can mutate freely."""
+        with self._lock:
+            if key not in self._parsed_user:
+                self._count(False)
+                self._parsed_user[key] = parse(self._load_user(sess).get(key))
+            else:
+                self._count(True)
+            return copy.deepcopy(self._parsed_user[key])
+
+    # Write-through
+
+    def put_provider(self, row: ProviderSettings) -> None:
+        with self._lock:
+            if self._providers is not None:
+                self._providers[row.provider] = ProviderRecord.from_row(row)
+
+    def put_model(self, row: Model) -> None:
+        with self._lock:
+            if self._models is not None:
+                self._models[(row.provider, row.model_id)] = ModelRecord.from_row(row)
+
+    def put_user_setting(self, key: str, value: str) -> None:
+        with self._lock:
+            if self._user is not None:
+                self._user[key] = value
+            self._parsed_user.pop(key, None)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._providers = None
+            self._models = None
+            self._user = None
+            self._parsed_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class ChatConfigCache:
+    """
+    Parsed `chats.agent_config` per chat, tagged with a version.
+
+    Versions come from one process-wide counter and change on every write, so
+    `(chat_id, version)` is a safe key for anything derived from a config.
+
+    A miss is filled in two steps: `reserve` takes a version before the DB
+    read and `fill` stores the result only if nothing newer was written or
+    dropped meanwhile, so a slow reader cannot cache a config older than a
+    concurrent write. Entries beyond `max_entries` are dropped least recently
+    used first.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._versions = itertools.count(1)
+        # Fills reserved below this version may have read a since-dropped config
+        self._floor = 0
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chat_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(chat_id)
+            return entry
+
+    def put(self, chat_id: str, config: Dict[str, Any]) -> int:
+        """Store a written config and return its new version."""
+        with self._lock:
+            version = next(self._versions)
+            self._store(chat_id, version, config)
+            return version
+
+    def reserve(self) -> int:
+        """Version for a config about to be read from the DB (see `fill`)."""
+        with self._lock:
+            return next(self._versions)
+
+    def fill(self, chat_id: str, version: int, config: Dict[str, Any]) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Cache a config read after `reserve` returned `version`.
+
+        Returns:
+            The entry now cached for the chat: the filled one, or a newer one
+            written meanwhile. None if the read may be stale and was not cached.
+        """
+        with self._lock:
+            current = self._entries.get(chat_id)
+            if current is not None and current[0] > version:
+                return current
+            if version < self._floor:
+                return None
+            return self._store(chat_id, version, config)
+
+    def _store(self, chat_id: str, version: int, config: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        entry = (version, copy.deepcopy(config))
+        self._entries[chat_id] = entry
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.max_entries:
+            self._drop(self._entries.popitem(last=False)[1])
+        return entry
+
+    def _drop(self, entry: Tuple[int, Dict[str, Any]]) -> None:
+        self._floor = max(self._floor, entry[0])
+
+    def evict(self, chat_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(chat_id, None)
+            if entry is not None:
+                self._drop(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._floor = next(self._versions)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+# Global singletons
+_settings_cache: Optional[SettingsCache] = None
+_chat_config_cache: Optional[ChatConfigCache] = None
+
+
+def get_settings_cache() -> SettingsCache:
+    """Get the global settings cache instance."""
+    global _settings_cache
+    if _settings_cache is None:
+        _settings_cache = SettingsCache()
+    return _settings_cache
+
+
+def get_chat_config_cache() -> ChatConfigCache:
+    """Get the global per-chat agent config cache instance."""
+    global _chat_config_cache
+    if _chat_config_cache is None:
+        _chat_config_cache = ChatConfigCache()
+    return _chat_config_cache
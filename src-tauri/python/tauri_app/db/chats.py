@@ -1,61 +1,166 @@
 from __future__ import annotations
 
+import copy
 import json
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import sqlalchemy
-from sqlalchemy import select
+from sqlalchemy import bindparam, case, delete, func, literal, select
 from sqlalchemy.orm import Session
 
+from .archive import archived_chats, chunks, delete_archived_chats, touch_chat
+from .cache import get_chat_config_cache
+from .core import forget_incognito_chats
 from .models import Chat, Message
+from .tree_index import get_tree_index_cache
+
+
+_chats = Chat.__table__
+_messages = Message.__table__
+
+# Column projections for read-only IPC responses. Statements are built once at
+# import so SQLAlchemy's compiled cache is hit on every call, and rows go
+# straight into dicts without the ORM identity map or attribute instrumentation.
+_CHAT_COLUMNS = (_chats.c.id, _chats.c.title, _chats.c.model, _chats.c.createdAt, _chats.c.updatedAt)
+_MESSAGE_COLUMNS = (
+    _messages.c.id,
+    _messages.c.role,
+    _messages.c.content,
+    _messages.c.createdAt,
+    _messages.c.toolCalls,
+    _messages.c.parent_message_id,
+    _messages.c.is_complete,
+    _messages.c.sequence,
+    _messages.c.model_used,
+)
+
+
+def _build_path_cte():
+    """Recursive CTE walking from :leaf_id up to the root, tagging each row with its depth."""
+    parent = _messages.alias("parent")
+    path = (
+        select(_messages.c.id, _messages.c.parent_message_id, literal(0).label("depth"))
+        .where(_messages.c.id == bindparam("leaf_id"))
+        .cte("path", recursive=True)
+    )
+    return path.union_all(
+        select(parent.c.id, parent.c.parent_message_id, path.c.depth + 1)
+        .join(path, parent.c.id == path.c.parent_message_id)
+    )
 
 
-def list_chats(sess: Session) -> List[Chat]:
-    stmt = select(Chat).order_by(Chat.updatedAt.desc().nulls_last(), Chat.createdAt.desc().nulls_last())
-    return list(sess.scalars(stmt))
+_path = _build_path_cte()
+
+# Listing reads through to the archive so cold chats stay visible in the sidebar
+_all_chats = sqlalchemy.union_all(
+    select(*_CHAT_COLUMNS),
+    select(*(archived_chats.c[c.name] for c in _CHAT_COLUMNS)),
+).subquery("all_chats")
+_LIST_CHATS_STMT = select(_all_chats).order_by(
+    _all_chats.c.updatedAt.desc().nulls_last(), _all_chats.c.createdAt.desc().nulls_last()
+)
+_AGENT_CONFIG_STMT = select(_chats.c.agent_config).where(_chats.c.id == bindparam("chat_id"))
+_ACTIVE_LEAF_STMT = select(_chats.c.active_leaf_message_id).where(_chats.c.id == bindparam("chat_id"))
+_PATH_ROWS_STMT = select(*_MESSAGE_COLUMNS).join(_path, _path.c.id == _messages.c.id).order_by(_path.c.depth.desc())
+_PATH_TOKEN_ROWS_STMT = (
+    select(_messages.c.id, _messages.c.role, _messages.c.content, _messages.c.is_complete, _messages.c.token_count)
+    .join(_path, _path.c.id == _messages.c.id)
+    .order_by(_path.c.depth.desc())
+)
+_PATH_MESSAGES_STMT = select(Message).join(_path, _path.c.id == Message.id).order_by(_path.c.depth.desc())
+_ALL_ROWS_STMT = (
+    select(*_MESSAGE_COLUMNS)
+    .where(_messages.c.chatId == bindparam("chat_id"))
+    .order_by(_messages.c.createdAt.asc().nulls_last())
+)
+
+_PREVIEW_CHARS = 80
+
+
+def _build_preview():
+    """First text block of structured content (or the plain text), truncated in SQL."""
+    blocks = func.json_each(_messages.c.content).table_valued("value").alias("blocks")
+    first_text = (
+        select(func.substr(func.json_extract(blocks.c.value, "$.content"), 1, _PREVIEW_CHARS))
+        .where(func.json_extract(blocks.c.value, "$.type") == "text")
+        .limit(1)
+        .scalar_subquery()
+    )
+    is_blocks = (func.json_valid(_messages.c.content) == 1) & _messages.c.content.like("[%")
+    return case((is_blocks, first_text), else_=func.substr(_messages.c.content, 1, _PREVIEW_CHARS))
+
+
+# Tree skeleton: served by ix_messages_chat_parent_seq, no full message bodies
+_TREE_STMT = (
+    select(
+        _messages.c.id,
+        _messages.c.parent_message_id,
+        _messages.c.sequence,
+        _messages.c.role,
+        _build_preview().label("preview"),
+        _messages.c.is_complete,
+    )
+    .where(_messages.c.chatId == bindparam("chat_id"))
+    .order_by(_messages.c.parent_message_id, _messages.c.sequence)
+)
+_MESSAGE_PARENT_STMT = select(_messages.c.chatId, _messages.c.parent_message_id).where(
+    _messages.c.id == bindparam("message_id")
+)
+_SIBLINGS_STMT = (
+    select(_messages.c.id, _messages.c.sequence)
+    .where(_messages.c.chatId == bindparam("chat_id"))
+    .where(_messages.c.parent_message_id.is_(bindparam("parent_id")))
+    .order_by(_messages.c.sequence)
+)
+_PATH_IDS_STMT = select(_path.c.id)
+_SET_LAST_LEAF_STMT = (
+    sqlalchemy.update(_messages)
+    .where(_messages.c.id == bindparam("message_id"))
+    .values(last_leaf_id=bindparam("last_leaf_id"))
+)
+
+
+def _parse_content(content: Optional[str]) -> Any:
+    """Parse content if it's a JSON array (structured content blocks)."""
+    if content and content.strip().startswith('['):
+        try:
+            return json.loads(content)
+        except Exception:
+            # If parsing fails, keep as string (legacy format)
+            pass
+    return content
+
+
+def _message_row_to_dict(row: Any) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "role": row["role"],
+        "content": _parse_content(row["content"]),
+        "createdAt": row["createdAt"],
+        "toolCalls": json.loads(row["toolCalls"]) if row["toolCalls"] else None,
+        "parentMessageId": row["parent_message_id"],
+        "isComplete": row["is_complete"],
+        "sequence": row["sequence"],
+        "modelUsed": row["model_used"],
+    }
+
+
+def list_chats(sess: Session) -> List[Dict[str, Any]]:
+    """List chat summaries (no messages), most recently updated first."""
+    return [dict(r) for r in sess.execute(_LIST_CHATS_STMT).mappings()]
 
 
 def get_chat_messages(sess: Session, chatId: str) -> List[Dict[str, Any]]:
     """Get messages for the active branch of a chat."""
-    # Get the chat to find active leaf
-    chat = sess.get(Chat, chatId)
-    if not chat or not chat.active_leaf_message_id:
-        # Fallback: return all messages in creation order (for old chats)
-        stmt = select(Message).where(Message.chatId == chatId).order_by(Message.createdAt.asc().nulls_last())
-        rows = list(sess.scalars(stmt))
+    leaf_id = sess.execute(_ACTIVE_LEAF_STMT, {"chat_id": chatId}).scalar()
+    if leaf_id:
+        rows = sess.execute(_PATH_ROWS_STMT, {"leaf_id": leaf_id}).mappings()
     else:
-        # Use the active branch path
-        rows = get_message_path(sess, chat.active_leaf_message_id)
-    
-    messages: List[Dict[str, Any]] = []
-    for r in rows:
-        toolCalls = json.loads(r.toolCalls) if r.toolCalls else None
-        
-        # Parse content if it's a JSON array (structured content blocks)
-        content = r.content
-        if content and content.strip().startswith('['):
-            try:
-                content = json.loads(content)
-            except Exception:
-                # If parsing fails, keep as string (legacy format)
-                pass
-        
-        messages.append(
-            {
-                "id": r.id,
-                "role": r.role,
-                "content": content,
-                "createdAt": r.createdAt,
-                "toolCalls": toolCalls,
-                "parentMessageId": r.parent_message_id,
-                "isComplete": r.is_complete,
-                "sequence": r.sequence,
-                "modelUsed": r.model_used,
-            }
-        )
-    return messages
+        # Fallback: return all messages in creation order (for old chats)
+        rows = sess.execute(_ALL_ROWS_STMT, {"chat_id": chatId}).mappings()
+    return [_message_row_to_dict(r) for r in rows]
 
 
 def create_chat(
@@ -99,10 +204,31 @@ def update_chat(
 
 
 def delete_chat(sess: Session, *, chatId: str) -> None:
-    chat = sess.get(Chat, chatId)
-    if chat:
-        sess.delete(chat)
-        sess.commit()
+    delete_chats(sess, [chatId])
+
+
+def delete_chats(sess: Session, chat_ids: List[str]) -> int:
+    """
+    Delete chats in one transaction, hot or archived.
+
+    Messages are removed by SQLite's ON DELETE CASCADE, so no message rows are
+    loaded regardless of how many there are.
+
+    Returns:
+        Number of chats deleted from the hot DB
+    """
+    deleted = 0
+    for ids in chunks(chat_ids):
+        deleted += sess.execute(delete(Chat).where(Chat.id.in_(ids))).rowcount
+    delete_archived_chats(sess, chat_ids)
+    sess.commit()
+    cache = get_chat_config_cache()
+    trees = get_tree_index_cache()
+    for chat_id in chat_ids:
+        cache.evict(chat_id)
+        trees.evict(chat_id)
+    forget_incognito_chats(chat_ids)
+    return deleted
 
 
 def append_message(
@@ -126,7 +252,9 @@ def append_message(
             toolCalls=json.dumps(toolCalls) if toolCalls is not None else None,
         )
     )
+    touch_chat(sess, chatId)
     sess.commit()
+    get_tree_index_cache().on_insert(chatId, id, None, 1)
 
 
 def update_message_content(
@@ -146,20 +274,20 @@ def update_message_content(
     sess.commit()
 
 
-def get_message_path(sess: Session, leaf_id: str) -> List[Message]:
-    """Walk up from leaf to root, return ordered list (root first)."""
-    path = []
-    current_id = leaf_id
-    
-    while current_id:
-        message = sess.get(Message, current_id)
-        if not message:
-            break
-        path.append(message)
-        current_id = message.parent_message_id
-    
-    # Reverse to get root-to-leaf order
-    return list(reversed(path))
+def get_message_path(sess: Session, leaf_id: str, chat_id: Optional[str] = None) -> List[Message]:
+    """
+    Messages from the root down to `leaf_id`.
+
+    With `chat_id` the path comes from the chat's in-memory tree index and the
+    rows are fetched by primary key; otherwise one recursive query walks it.
+    """
+    if not chat_id:
+        return list(sess.scalars(_PATH_MESSAGES_STMT, {"leaf_id": leaf_id}))
+    ids = _tree_index(sess, chat_id, leaf_id).path(leaf_id)
+    by_id: Dict[str, Message] = {}
+    for batch in chunks(ids):
+        by_id.update({m.id: m for m in sess.scalars(select(Message).where(Message.id.in_(batch)))})
+    return [by_id[i] for i in ids if i in by_id]
 
 
 def get_message_children(sess: Session, parent_id: Optional[str], chat_id: str) -> List[Message]:
@@ -173,6 +301,89 @@ def get_message_children(sess: Session, parent_id: Optional[str], chat_id: str)
     return list(sess.scalars(stmt))
 
 
+def get_chat_tree(sess: Session, chat_id: str) -> Dict[str, Any]:
+    """
+    Whole branch tree of a chat as a flat node list, in one query.
+
+    Each node carries its sibling index/count and whether it lies on the
+    active path, so the branch navigator needs no per-message calls.
+
+    Returns:
+        {"chatId", "activeLeafId", "nodes": [{id, parentId, sequence, role,
+        preview, isComplete, siblingIndex, siblingCount, isActive}]}
+    """
+    leaf_id = sess.execute(_ACTIVE_LEAF_STMT, {"chat_id": chat_id}).scalar()
+    rows = sess.execute(_TREE_STMT, {"chat_id": chat_id}).all()
+
+    # Rows arrive grouped by parent in sequence order, so position = sibling index
+    sibling_count: Dict[Optional[str], int] = {}
+    sibling_index: Dict[str, int] = {}
+    parents: Dict[str, Optional[str]] = {}
+    for r in rows:
+        sibling_index[r.id] = sibling_count.get(r.parent_message_id, 0)
+        sibling_count[r.parent_message_id] = sibling_index[r.id] + 1
+        parents[r.id] = r.parent_message_id
+
+    active = set()
+    current = leaf_id
+    while current in parents and current not in active:
+        active.add(current)
+        current = parents[current]
+
+    nodes = []
+    for r in rows:
+        nodes.append({
+            "id": r.id,
+            "parentId": r.parent_message_id,
+            "sequence": r.sequence,
+            "role": r.role,
+            "preview": r.preview or "",
+            "isComplete": r.is_complete,
+            "siblingIndex": sibling_index[r.id],
+            "siblingCount": sibling_count[r.parent_message_id],
+            "isActive": r.id in active,
+        })
+    return {"chatId": chat_id, "activeLeafId": leaf_id, "nodes": nodes}
+
+
+def get_active_path_siblings(tree: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Sibling lists ({id, sequence, isActive}) for each message on the active path.
+
+    Args:
+        tree: Result of `get_chat_tree`
+    """
+    by_parent: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for node in tree["nodes"]:
+        by_parent.setdefault(node["parentId"], []).append(
+            {"id": node["id"], "sequence": node["sequence"], "isActive": node["isActive"]}
+        )
+    return {
+        node["id"]: by_parent[node["parentId"]]
+        for node in tree["nodes"]
+        if node["isActive"]
+    }
+
+
+def get_message_siblings(sess: Session, message_id: str, chat_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Siblings of a message ({id, sequence, isActive}), ordered by sequence.
+
+    With `chat_id` the answer comes from the chat's in-memory tree index.
+    """
+    if chat_id:
+        index = _tree_index(sess, chat_id, message_id)
+        return [{"id": i, "sequence": seq, "isActive": active} for i, seq, active in index.siblings(message_id)]
+
+    msg = sess.execute(_MESSAGE_PARENT_STMT, {"message_id": message_id}).first()
+    if not msg:
+        return []
+    siblings = sess.execute(_SIBLINGS_STMT, {"chat_id": msg.chatId, "parent_id": msg.parent_message_id}).all()
+    leaf_id = sess.execute(_ACTIVE_LEAF_STMT, {"chat_id": msg.chatId}).scalar()
+    active = set(sess.scalars(_PATH_IDS_STMT, {"leaf_id": leaf_id})) if leaf_id else set()
+    return [{"id": s.id, "sequence": s.sequence, "isActive": s.id in active} for s in siblings]
+
+
 def get_next_sibling_sequence(sess: Session, parent_id: Optional[str], chat_id: str) -> int:
     """Get next sequence number for siblings with same parent in the same chat."""
     stmt = (
@@ -185,11 +396,37 @@ def get_next_sibling_sequence(sess: Session, parent_id: Optional[str], chat_id:
 
 
 def set_active_leaf(sess: Session, chat_id: str, leaf_id: str) -> None:
-    """Update active_leaf_message_id for a chat."""
+    """Update active_leaf_message_id for a chat and remember the leaf along its path."""
     chat = sess.get(Chat, chat_id)
     if chat:
         chat.active_leaf_message_id = leaf_id
+        # Branch points on the new path remember the leaf below them (rows already
+        # pointing at it are skipped; only-children are never switched to)
+        stale = [
+            {"message_id": message_id, "last_leaf_id": leaf_id}
+            for message_id, remembered in _tree_index(sess, chat_id, leaf_id).branch_points(leaf_id)
+            if remembered != leaf_id
+        ]
+        if stale:
+            sess.execute(_SET_LAST_LEAF_STMT, stale)
         sess.commit()
+        get_tree_index_cache().on_active_leaf(chat_id, leaf_id)
+
+
+def _seed_branch_point(sess: Session, chat_id: str, parent_id: Optional[str]) -> None:
+    """
+    Before a message gains its first sibling, reset its remembered leaf.
+
+    Only-children are not kept up to date by set_active_leaf, so the existing
+    child gets the active leaf if the active path runs through it, else none.
+    """
+    index = _tree_index(sess, chat_id, parent_id) if parent_id else get_tree_index_cache().get(sess, chat_id)
+    siblings = index.children(parent_id)
+    if len(siblings) != 1:
+        return
+    only_child = siblings[0]
+    leaf_id = index.active_leaf if only_child in index.active_ids() else None
+    sess.execute(_SET_LAST_LEAF_STMT, {"message_id": only_child, "last_leaf_id": leaf_id})
 
 
 def create_branch_message(
@@ -200,25 +437,16 @@ def create_branch_message(
     content: str,
     chat_id: str,
     is_complete: bool = False,
+    message_id: Optional[str] = None,
+    created_at: Optional[str] = None,
 ) -> str:
-    """Create a new message in the tree and return its ID."""
-    message_id = str(uuid.uuid4())
+    """Create a new message in the tree and return its ID (generated unless given)."""
+    message_id = message_id or str(uuid.uuid4())
     sequence = get_next_sibling_sequence(sess, parent_id, chat_id)
+    _seed_branch_point(sess, chat_id, parent_id)
 
     # Determine model used for assistant messages from chat agent config
-    model_used: Optional[str] = None
-    if role == "assistant":
-        try:
-            config = get_chat_agent_config(sess, chat_id)
-            if config:
-                provider = config.get("provider") or ""
-                model_id = config.get("model_id") or ""
-                if provider and model_id:
-                    model_used = f"{provider}:{model_id}"
-                else:
-                    model_used = model_id or None
-        except Exception:
-            model_used = None
+    model_used = get_chat_model_used(sess, chat_id) if role == "assistant" else None
 
     message = Message(
         id=message_id,
@@ -228,12 +456,14 @@ def create_branch_message(
         parent_message_id=parent_id,
         is_complete=is_complete,
         sequence=sequence,
-        createdAt=datetime.utcnow().isoformat(),
+        createdAt=created_at or datetime.utcnow().isoformat(),
         model_used=model_used,
     )
     sess.add(message)
+    touch_chat(sess, chat_id)
     sess.commit()
-    
+    get_tree_index_cache().on_insert(chat_id, message_id, parent_id, sequence)
+
     return message_id
 
 
@@ -242,23 +472,117 @@ def mark_message_complete(sess: Session, message_id: str) -> None:
     message = sess.get(Message, message_id)
     if message:
         message.is_complete = True
+        touch_chat(sess, message.chatId)
         sess.commit()
 
 
+def set_message_token_count(sess: Session, message_id: str, token_count: int) -> None:
+    """Store a message's token count."""
+    sess.execute(
+        _messages.update().where(_messages.c.id == message_id).values(token_count=token_count)
+    )
+    sess.commit()
+
+
+def add_message_usage(sess: Session, message_id: str, usage: Dict[str, int]) -> Dict[str, int]:
+    """
+    Add one run's token usage to a message (a resumed or continued reply has several runs).
+
+    Args:
+        sess: Database session
+        message_id: Assistant message the run wrote to
+        usage: Token counts by name (see services.prompt_cache.CacheUsage.as_dict)
+
+    Returns:
+        The message's usage totals, including its number of runs
+    """
+    raw = sess.execute(select(_messages.c.usage).where(_messages.c.id == message_id)).scalar()
+    totals: Dict[str, int] = json.loads(raw) if raw else {}
+    for key, value in usage.items():
+        totals[key] = totals.get(key, 0) + value
+    totals["runs"] = totals.get("runs", 0) + 1
+    sess.execute(_messages.update().where(_messages.c.id == message_id).values(usage=json.dumps(totals)))
+    sess.commit()
+    return totals
+
+
+def bulk_set_token_counts(sess: Session, counts: Dict[str, int]) -> None:
+    """Store many token counts in one executemany."""
+    if not counts:
+        return
+    sess.execute(
+        _messages.update().where(_messages.c.id == bindparam("msg_id")).values(token_count=bindparam("count")),
+        [{"msg_id": msg_id, "count": count} for msg_id, count in counts.items()],
+    )
+    sess.commit()
+
+
+def get_message_token_counts(sess: Session, message_ids: List[str]) -> Dict[str, int]:
+    """Cached token counts for the given messages (uncounted ones are left out)."""
+    counts: Dict[str, int] = {}
+    for batch in chunks(message_ids):
+        rows = sess.execute(
+            select(_messages.c.id, _messages.c.token_count)
+            .where(_messages.c.id.in_(batch))
+            .where(_messages.c.token_count.is_not(None))
+        )
+        counts.update({row.id: row.token_count for row in rows})
+    return counts
+
+
+def get_uncounted_messages(sess: Session, limit: int = 500) -> List[Tuple[str, str, str, Optional[str]]]:
+    """Complete messages without a token count, as (id, role, content, model_used)."""
+    rows = sess.execute(
+        select(_messages.c.id, _messages.c.role, _messages.c.content, _messages.c.model_used)
+        .where(_messages.c.token_count.is_(None))
+        .where(_messages.c.is_complete.is_(True))
+        .limit(limit)
+    )
+    return [tuple(row) for row in rows]
+
+
+def get_path_token_count(sess: Session, leaf_id: str) -> Tuple[int, int]:
+    """
+    Sum of cached token counts from the root down to `leaf_id`.
+
+    Returns:
+        (token total over counted messages, number of messages not yet counted)
+    """
+    row = sess.execute(
+        select(
+            func.coalesce(func.sum(_messages.c.token_count), 0),
+            func.count().filter(_messages.c.token_count.is_(None)),
+        ).join(_path, _path.c.id == _messages.c.id),
+        {"leaf_id": leaf_id},
+    ).one()
+    return int(row[0]), int(row[1])
+
+
+def get_path_token_rows(sess: Session, leaf_id: str) -> List[Any]:
+    """(id, role, content, is_complete, token_count) rows from the root down to `leaf_id`."""
+    return list(sess.execute(_PATH_TOKEN_ROWS_STMT, {"leaf_id": leaf_id}))
+
+
 def get_leaf_descendant(sess: Session, message_id: str, chat_id: str) -> str:
     """Get the leaf descendant of a message (for branch switching).
 
-    If message has children, follow the first child down to a leaf.
-    Otherwise, return the message itself.
+    Returns the leaf last active below the message. For branches never
+    visited, follow the first child down to a leaf; a message without children
+    is its own leaf. Served from the chat's in-memory tree index.
     """
-    current_id = message_id
+    return _tree_index(sess, chat_id, message_id).leaf_descendant(message_id)
 
-    while True:
-        children = get_message_children(sess, current_id, chat_id)
-        if not children:
-            return current_id
-        # Follow first child
-        current_id = children[0].id
+
+def _tree_index(sess: Session, chat_id: str, message_id: str):
+    """Tree index for a chat, reloaded if `message_id` was added to the chat behind its back."""
+    trees = get_tree_index_cache()
+    index = trees.get(sess, chat_id)
+    if message_id not in index:
+        row = sess.execute(_MESSAGE_PARENT_STMT, {"message_id": message_id}).first()
+        if row is not None and row.chatId == chat_id:
+            trees.evict(chat_id)
+            index = trees.get(sess, chat_id)
+    return index
 
 
 def get_chat_agent_config(sess: Session, chatId: str) -> Optional[Dict[str, Any]]:
@@ -266,16 +590,53 @@ def get_chat_agent_config(sess: Session, chatId: str) -> Optional[Dict[str, Any]
     Get agent configuration for a chat.
     
     Returns:
-        Agent config dict or None if not set
+        Agent config dict (a private copy, safe to mutate) or None if not set
     """
-    chat: Optional[Chat] = sess.get(Chat, chatId)
-    if not chat or not chat.agent_config:
-        return None
+    config, _ = get_chat_agent_config_versioned(sess, chatId)
+    return config
+
+
+def get_chat_agent_config_versioned(sess: Session, chatId: str) -> Tuple[Optional[Dict[str, Any]], int]:
+    """
+    Get agent configuration for a chat together with its cache version.
+    
+    Configs are served from the in-memory cache after the first read, so the
+    streaming path doesn't touch SQLite. The version changes on every
+    `update_chat_agent_config`, making `(chatId, version)` a stable cache key.
     
+    Returns:
+        (config or None, version) - version is 0 when no config is set
+    """
+    cache = get_chat_config_cache()
+    entry = cache.get(chatId)
+    if entry is None:
+        version = cache.reserve()
+        raw = sess.execute(_AGENT_CONFIG_STMT, {"chat_id": chatId}).scalar()
+        if not raw:
+            return None, 0
+        try:
+            config = json.loads(raw)
+        except Exception:
+            return None, 0
+        # A write racing this read wins; a possibly stale read is served but not cached
+        entry = cache.fill(chatId, version, config) or (version, config)
+    version, config = entry
+    return copy.deepcopy(config), version
+
+
+def get_chat_model_used(sess: Session, chatId: str) -> Optional[str]:
+    """Get the 'provider:model_id' label of a chat's current model (for messages.model_used)."""
     try:
-        return json.loads(chat.agent_config)
+        config = get_chat_agent_config(sess, chatId)
     except Exception:
         return None
+    if not config:
+        return None
+    provider = config.get("provider") or ""
+    model_id = config.get("model_id") or ""
+    if provider and model_id:
+        return f"{provider}:{model_id}"
+    return model_id or None
 
 
 def update_chat_agent_config(
@@ -298,6 +659,8 @@ def update_chat_agent_config(
     
     chat.agent_config = json.dumps(config)
     sess.commit()
+    # Write-through; bumps the version so config-derived caches rebuild
+    get_chat_config_cache().put(chatId, config)
 
 
 def get_default_agent_config() -> Dict[str, Any]:
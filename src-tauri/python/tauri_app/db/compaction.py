@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import and_, delete, exists, func, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from .models import Chat, Message
+from .tree_index import get_tree_index_cache
+
+# Placeholders are inserted with empty content before a stream starts
+_EMPTY_CONTENT = ("", "[]")
+
+
+def _active_path_ids():
+    """Recursive CTE of every message on some chat's active path (leaf up to root)."""
+    parent = aliased(Message)
+    active = (
+        select(Message.id, Message.parent_message_id)
+        .join(Chat, Chat.active_leaf_message_id == Message.id)
+        .cte("active", recursive=True)
+    )
+    return active.union_all(
+        select(parent.id, parent.parent_message_id).join(active, parent.id == active.c.parent_message_id)
+    )
+
+
+def _placeholder_roots(active, cutoff: str):
+    """Empty, never-completed assistant rows older than the grace period."""
+    return select(Message.id).where(
+        Message.role == "assistant",
+        Message.is_complete.is_(False),
+        or_(Message.content.is_(None), Message.content.in_(_EMPTY_CONTENT)),
+        Message.createdAt < cutoff,
+        Message.id.not_in(select(active.c.id)),
+    )
+
+
+def _excess_sibling_roots(active, keep: int, cutoff: str):
+    """Siblings beyond the newest `keep` per fork, off the active path and old enough."""
+    # Chats without an active leaf (legacy linear chats) show every message
+    legacy_chats = select(Chat.id).where(Chat.active_leaf_message_id.is_(None))
+    ranked = select(
+        Message.id,
+        Message.createdAt,
+        func.row_number()
+        .over(
+            partition_by=(Message.chatId, Message.parent_message_id),
+            order_by=(Message.sequence.desc(), Message.createdAt.desc()),
+        )
+        .label("rank"),
+    ).where(Message.chatId.not_in(legacy_chats)).subquery("ranked")
+    return select(ranked.c.id).where(
+        ranked.c.rank > keep,
+        ranked.c.createdAt < cutoff,
+        ranked.c.id.not_in(select(active.c.id)),
+    )
+
+
+def _orphan_roots():
+    """Messages whose parent no longer exists in the same chat."""
+    parent = aliased(Message)
+    return select(Message.id).where(
+        Message.parent_message_id.is_not(None),
+        ~exists().where(and_(parent.id == Message.parent_message_id, parent.chatId == Message.chatId)),
+    )
+
+
+def _subtree_ids(roots):
+    """Recursive CTE of `roots` and all their descendants."""
+    child = aliased(Message)
+    doomed = select(Message.id).where(Message.id.in_(roots)).cte("doomed", recursive=True)
+    return doomed.union_all(select(child.id).join(doomed, child.parent_message_id == doomed.c.id))
+
+
+def compact_branches(
+    sess: Session,
+    *,
+    placeholder_grace_minutes: int = 60,
+    keep_siblings: int = 5,
+    sibling_min_age_days: int = 7,
+) -> Dict[str, int]:
+    """
+    Delete dead branch rows: stale empty placeholders, surplus sibling branches
+    and orphans, each together with its subtree.
+
+    Messages on a chat's active path are never deleted.
+
+    Args:
+        sess: Database session
+        placeholder_grace_minutes: Age before an empty incomplete row counts as dead
+        keep_siblings: Newest siblings kept per fork
+        sibling_min_age_days: Only prune siblings at least this old
+
+    Returns:
+        Dict with root counts per category and the total rows deleted
+    """
+    now = datetime.utcnow()
+    placeholder_cutoff = (now - timedelta(minutes=placeholder_grace_minutes)).isoformat()
+    sibling_cutoff = (now - timedelta(days=sibling_min_age_days)).isoformat()
+
+    active = _active_path_ids()
+    categories = {
+        "placeholders": _placeholder_roots(active, placeholder_cutoff),
+        "siblings": _excess_sibling_roots(active, max(keep_siblings, 1), sibling_cutoff),
+        "orphans": _orphan_roots(),
+    }
+
+    stats = {
+        name: sess.scalar(select(func.count()).select_from(roots.subquery()))
+        for name, roots in categories.items()
+    }
+    if not any(stats.values()):
+        stats["deleted"] = 0
+        return stats
+
+    roots = categories["placeholders"].union(categories["siblings"], categories["orphans"])
+    doomed = _subtree_ids(roots)
+    condition = and_(Message.id.in_(select(doomed.c.id)), Message.id.not_in(select(active.c.id)))
+    # sqlite3 reports rowcount -1 for statements starting with WITH, so count first
+    stats["deleted"] = sess.scalar(select(func.count()).where(condition))
+    sess.execute(delete(Message).where(condition).execution_options(synchronize_session=False))
+    sess.commit()
+    get_tree_index_cache().clear()
+    return stats
@@ -1,27 +1,52 @@
 from __future__ import annotations
 
+import functools
+import threading
+import uuid
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Awaitable, Callable, Iterable, Optional, Set, TypeVar, Union
 from contextlib import contextmanager
 
 from pytauri import App, AppHandle, Manager
 from pytauri.ffi.webview import WebviewWindow
 from pytauri.path import PathResolver
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool
 
-from .models import Base
+from .cache import get_chat_config_cache, get_settings_cache
+from .models import Base, Model, ProviderSettings, UserSettings
+from .tree_index import get_tree_index_cache
 
 
 _engine = None
 _Session = None
 _db_path_override: Optional[Path] = None
 
+# Incognito chats live in a private in-memory database: same schema and db API,
+# but nothing is written to disk and everything is gone when the app exits.
+_incognito_engine = None
+_IncognitoSession = None
+# Holds the shared in-memory databases open while no session is using them
+_incognito_keeper = None
+# Shared-cache SQLite reports table locks as errors instead of waiting on them,
+# so incognito sessions take turns: each holds this from creation to close()
+_incognito_lock = threading.RLock()
+_incognito_chat_ids: Set[str] = set()
+_current_chat: ContextVar[Optional[str]] = ContextVar("current_chat", default=None)
+
+# Settings are global, so incognito sessions still read and write them on disk
+_SHARED_TABLES = (ProviderSettings.__table__, Model.__table__, UserSettings.__table__)
+
 
 def set_db_path(path: Path) -> None:
     global _db_path_override
     path.parent.mkdir(parents=True, exist_ok=True)
     _db_path_override = path
+    get_settings_cache().invalidate()
+    get_chat_config_cache().clear()
+    get_tree_index_cache().clear()
 
 
 def get_db_path(app: Union[App, AppHandle, WebviewWindow]) -> Path:
@@ -34,6 +59,19 @@ def get_resource_dir(manager: Union[App, AppHandle, WebviewWindow]) -> Path:
     return path_resolver.resource_dir()
 
 
+def get_archive_path(app: Union[App, AppHandle, WebviewWindow]) -> Path:
+    """Cold chats live next to the main DB in archive.db (attached as `archive`)."""
+    return get_db_path(app).parent / "archive.db"
+
+
+def _configure_connection(archive_path: Path):
+    def on_connect(dbapi_conn, _record):
+        # SQLite ships with FK enforcement off; ON DELETE CASCADE needs it on
+        dbapi_conn.execute("PRAGMA foreign_keys = ON")
+        dbapi_conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+    return on_connect
+
+
 def _ensure_engine(app: Union[App, AppHandle, WebviewWindow]):
     global _engine, _Session
     if _engine is None:
@@ -43,10 +81,129 @@ def _ensure_engine(app: Union[App, AppHandle, WebviewWindow]):
             f"sqlite:///{db_path}",
             connect_args={"check_same_thread": False},
         )
+        event.listen(_engine, "connect", _configure_connection(get_archive_path(app)))
         Base.metadata.create_all(_engine)
+        from .archive import create_archive_schema
+        create_archive_schema(_engine)
         _Session = sessionmaker(bind=_engine, expire_on_commit=False)
 
 
+def _configure_incognito_connection(archive_name: str):
+    def on_connect(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA foreign_keys = ON")
+        # A session nested in another on the same thread must not trip over its table locks
+        dbapi_conn.execute("PRAGMA read_uncommitted = ON")
+        # Empty archive schema so queries that UNION in archived chats still work
+        dbapi_conn.execute(f"ATTACH DATABASE 'file:{archive_name}?mode=memory&cache=shared' AS archive")
+    return on_connect
+
+
+class _IncognitoSessionClass(Session):
+    """Session on the in-memory DB that holds the incognito lock until it is closed."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        _incognito_lock.acquire()
+        self._holds_incognito_lock = True
+        try:
+            super().__init__(*args, **kwargs)
+        except BaseException:
+            self._release_incognito_lock()
+            raise
+
+    def _release_incognito_lock(self) -> None:
+        if self.__dict__.pop("_holds_incognito_lock", False):
+            _incognito_lock.release()
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._release_incognito_lock()
+
+
+def _ensure_incognito_engine(app: Union[App, AppHandle, WebviewWindow]):
+    global _incognito_engine, _IncognitoSession, _incognito_keeper
+    _ensure_engine(app)
+    if _incognito_engine is None:
+        # Named shared-cache databases: every session gets its own connection
+        # (so one session's rollback can't discard another's writes), and the
+        # keeper connection keeps the data alive between sessions
+        name = f"incognito-{uuid.uuid4().hex}"
+        engine = create_engine(
+            f"sqlite:///file:{name}?mode=memory&cache=shared&uri=true",
+            connect_args={"check_same_thread": False},
+            poolclass=QueuePool,
+        )
+        event.listen(engine, "connect", _configure_incognito_connection(f"{name}-archive"))
+        _incognito_keeper = engine.raw_connection()
+        Base.metadata.create_all(engine)
+        from .archive import create_archive_schema
+        create_archive_schema(engine)
+        _IncognitoSession = sessionmaker(
+            bind=engine,
+            binds={table: _engine for table in _SHARED_TABLES},
+            expire_on_commit=False,
+            class_=_IncognitoSessionClass,
+        )
+        _incognito_engine = engine
+
+
+def register_incognito_chat(chat_id: str) -> None:
+    """Mark a chat as incognito; its rows will only ever be written in memory."""
+    _incognito_chat_ids.add(chat_id)
+
+
+def forget_incognito_chats(chat_ids: Iterable[str]) -> None:
+    _incognito_chat_ids.difference_update(chat_ids)
+
+
+def is_incognito_chat(chat_id: Optional[str]) -> bool:
+    return chat_id is not None and chat_id in _incognito_chat_ids
+
+
+def has_incognito_chats() -> bool:
+    return bool(_incognito_chat_ids)
+
+
+@contextmanager
+def chat_scope(chat_id: Optional[str]):
+    """
+    Route sessions opened inside this block to the database holding `chat_id`.
+
+    Commands wrap their work in this so every db call (including those made by
+    services and worker threads) hits the in-memory DB for incognito chats.
+    """
+    token = _current_chat.set(chat_id)
+    try:
+        yield
+    finally:
+        _current_chat.reset(token)
+
+
+def set_chat_scope(chat_id: Optional[str]) -> None:
+    """Point the enclosing `chat_scope` at a chat created inside it (restored when it exits)."""
+    _current_chat.set(chat_id)
+
+
+_Command = TypeVar("_Command", bound=Callable[..., Awaitable[Any]])
+
+
+def chat_scoped(chat_id_of: Callable[[Any], Optional[str]]) -> Callable[[_Command], _Command]:
+    """
+    Decorator running an async command inside `chat_scope(chat_id_of(body))`.
+
+    Args:
+        chat_id_of: Picks the chat id out of the command's `body` argument
+    """
+    def decorate(command: _Command) -> _Command:
+        @functools.wraps(command)
+        async def wrapper(body: Any, *args: Any, **kwargs: Any) -> Any:
+            with chat_scope(chat_id_of(body)):
+                return await command(body, *args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorate
+
+
 def _get_engine():
     """Get the database engine (internal use for migrations)."""
     return _engine
@@ -60,16 +217,29 @@ def init_database(app: Union[App, AppHandle, WebviewWindow]) -> Path:
     return get_db_path(app)
 
 
-def session(app: Union[App, AppHandle, WebviewWindow]) -> Session:
+def session(app: Union[App, AppHandle, WebviewWindow], incognito: Optional[bool] = None) -> Session:
+    """
+    Open a session on the main DB, or the in-memory one for incognito chats.
+
+    Args:
+        app: Tauri app (or handle/window) used to locate the DB
+        incognito: Force a database; by default follows the current `chat_scope`
+    """
+    if incognito is None:
+        incognito = is_incognito_chat(_current_chat.get())
+    if incognito:
+        _ensure_incognito_engine(app)
+        assert _IncognitoSession is not None
+        return _IncognitoSession()
     _ensure_engine(app)
     assert _Session is not None
     return _Session()
 
 
 @contextmanager
-def db_session(app: Union[App, AppHandle, WebviewWindow]):
+def db_session(app: Union[App, AppHandle, WebviewWindow], incognito: Optional[bool] = None):
     """Context manager for database sessions - handles cleanup automatically."""
-    sess = session(app)
+    sess = session(app, incognito)
     try:
         yield sess
     finally:
@@ -97,6 +97,75 @@ def run_migrations(app: Union[App, AppHandle, WebviewWindow]) -> None:
     except Exception as e:
         print(f"[db] Migration warning for chats table: {e}")
 
+    # Migration: Add accessedAt to chats table (archive bookkeeping)
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                sqlalchemy.text("SELECT sql FROM sqlite_master WHERE type='table' AND name='chats'")
+            )
+            table_def = result.fetchone()
+
+            if table_def and 'accessedAt' not in table_def[0]:
+                print("[db] Running migration: Adding accessedAt column to chats table")
+                conn.execute(
+                    sqlalchemy.text("ALTER TABLE chats ADD COLUMN accessedAt TEXT")
+                )
+                conn.commit()
+                print("[db] Chats table accessedAt migration completed")
+    except Exception as e:
+        print(f"[db] Migration warning for chats table: {e}")
+
+    # Migration: Add last_leaf_id to messages and seed it at the branch points of every active path
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                sqlalchemy.text("SELECT sql FROM sqlite_master WHERE type='table' AND name='messages'")
+            )
+            table_def = result.fetchone()
+
+            if table_def and 'last_leaf_id' not in table_def[0]:
+                print("[db] Running migration: Adding last_leaf_id column to messages table")
+                conn.execute(
+                    sqlalchemy.text("ALTER TABLE messages ADD COLUMN last_leaf_id TEXT")
+                )
+                conn.execute(
+                    sqlalchemy.text("""
+                        WITH RECURSIVE path(id, parent, leaf) AS (
+                            SELECT m.id, m.parent_message_id, m.id
+                            FROM messages m JOIN chats c ON c.active_leaf_message_id = m.id
+                            UNION ALL
+                            SELECT m.id, m.parent_message_id, path.leaf
+                            FROM messages m JOIN path ON m.id = path.parent
+                        )
+                        UPDATE messages
+                        SET last_leaf_id = (SELECT leaf FROM path WHERE path.id = messages.id)
+                        WHERE id IN (SELECT id FROM path)
+                          AND EXISTS (
+                              SELECT 1 FROM messages s
+                              WHERE s.chatId = messages.chatId
+                                AND s.parent_message_id IS messages.parent_message_id
+                                AND s.id != messages.id
+                          )
+                    """)
+                )
+                conn.commit()
+                print("[db] Messages table last_leaf_id migration completed")
+    except Exception as e:
+        print(f"[db] Migration warning for messages table: {e}")
+
+    # Migration: Index messages by (chatId, parent_message_id, sequence) for tree reads
+    try:
+        with engine.connect() as conn:
+            conn.execute(
+                sqlalchemy.text(
+                    'CREATE INDEX IF NOT EXISTS ix_messages_chat_parent_seq '
+                    'ON messages ("chatId", parent_message_id, sequence)'
+                )
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"[db] Migration warning for messages index: {e}")
+
     # Migration: Add 'extra' column to provider_settings table
     try:
         with engine.connect() as conn:
@@ -191,6 +260,55 @@ def run_migrations(app: Union[App, AppHandle, WebviewWindow]) -> None:
                     print("[db] models table created successfully")
     except Exception as e:
         print(f"[db] Migration warning for models table: {e}")
+
+    # Migration: Add model catalog columns (discovered name, fetch time, listing order)
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                sqlalchemy.text("SELECT sql FROM sqlite_master WHERE type='table' AND name='models'")
+            )
+            table_def = result.fetchone()
+
+            if table_def and 'fetched_at' not in table_def[0]:
+                print("[db] Running migration: Adding catalog columns to models table")
+                for column in ("display_name TEXT", "fetched_at TEXT", "catalog_position INTEGER"):
+                    conn.execute(sqlalchemy.text(f"ALTER TABLE models ADD COLUMN {column}"))
+                conn.commit()
+                print("[db] Models table catalog migration completed")
+    except Exception as e:
+        print(f"[db] Migration warning for models catalog columns: {e}")
+
+    # Migration: Add cached token_count to messages (filled by the token count backfill job)
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                sqlalchemy.text("SELECT sql FROM sqlite_master WHERE type='table' AND name='messages'")
+            )
+            table_def = result.fetchone()
+
+            if table_def and 'token_count' not in table_def[0]:
+                print("[db] Running migration: Adding token_count column to messages table")
+                conn.execute(sqlalchemy.text("ALTER TABLE messages ADD COLUMN token_count INTEGER"))
+                conn.commit()
+                print("[db] Messages table token_count migration completed")
+    except Exception as e:
+        print(f"[db] Migration warning for messages token_count: {e}")
+
+    # Migration: Add provider-reported usage (cached vs uncached input tokens) to messages
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                sqlalchemy.text("SELECT sql FROM sqlite_master WHERE type='table' AND name='messages'")
+            )
+            table_def = result.fetchone()
+
+            if table_def and 'usage' not in table_def[0]:
+                print("[db] Running migration: Adding usage column to messages table")
+                conn.execute(sqlalchemy.text("ALTER TABLE messages ADD COLUMN usage TEXT"))
+                conn.commit()
+                print("[db] Messages table usage migration completed")
+    except Exception as e:
+        print(f"[db] Migration warning for messages usage: {e}")
     
     # Backfill: Set active_leaf_message_id to last message in each chat
     try:
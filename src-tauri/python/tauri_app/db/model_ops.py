@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import json
 
-from sqlalchemy import select
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
+from .cache import ModelRecord, get_settings_cache
 from .models import Model
 
 
@@ -23,6 +25,16 @@ def get_all_model_settings(sess: Session, provider: Optional[str] = None) -> Lis
     return list(sess.scalars(stmt))
 
 
+def get_model_record(sess: Session, provider: str, model_id: str) -> Optional[ModelRecord]:
+    """Get cached, parsed settings for a model (extra and reasoning already decoded)."""
+    return get_settings_cache().model(sess, provider, model_id)
+
+
+def get_all_model_records(sess: Session, provider: Optional[str] = None) -> List[ModelRecord]:
+    """Get cached settings for all models, optionally filtered by provider."""
+    return get_settings_cache().models(sess, provider)
+
+
 def _parse_extra(extra_raw: Optional[str]) -> dict:
     """Parse extra JSON string to dict."""
     if not extra_raw:
@@ -103,6 +115,7 @@ def save_model_settings(
         sess.add(model)
     
     sess.commit()
+    get_settings_cache().put_model(model)
 
 
 def upsert_model_settings(
@@ -118,11 +131,10 @@ def upsert_model_settings(
     Upsert model settings - only update if it's NOT a user override.
     This allows auto-detected data to be updated without clobbering user preferences.
     """
-    model = sess.get(Model, {"provider": provider, "model_id": model_id})
+    record = get_model_record(sess, provider, model_id)
     
-    if model:
-        current_reasoning = _get_reasoning_from_extra(model.extra)
-        if current_reasoning.get("isUserOverride", False):
+    if record:
+        if record.reasoning.get("isUserOverride", False):
             # Don't touch user overrides
             return
     
@@ -135,3 +147,113 @@ def upsert_model_settings(
         extra=extra,
     )
 
+
+
+def get_catalog_records(sess: Session, provider: Optional[str] = None) -> List[ModelRecord]:
+    """Discovered models (rows with a fetch time), in each provider's listing order."""
+    records = [r for r in get_all_model_records(sess, provider) if r.fetched_at]
+    return sorted(records, key=lambda r: (r.provider, r.catalog_position or 0))
+
+
+# Auto-detected capability keys in `extra`; reasoning respects isUserOverride
+_CAPABILITY_KEYS = (("supports_reasoning", "reasoning"), ("context_window", "contextWindow"), ("supports_tools", "supportsTools"))
+
+
+def _capabilities(info: Dict[str, Any]) -> Optional[str]:
+    extra: Dict[str, Any] = {}
+    for source, key in _CAPABILITY_KEYS:
+        value = info.get(source)
+        if value is None:
+            continue
+        extra[key] = {"supports": bool(value), "isUserOverride": False} if key == "reasoning" else value
+    return json.dumps(extra) if extra else None
+
+
+def _merged_extra(excluded):
+    """
+    `extra` after an upsert: capabilities patched in, except reasoning when
+    the user has overridden it.
+    """
+    current = func.coalesce(func.nullif(Model.__table__.c.extra, ""), "{}")
+    incoming = func.coalesce(excluded.extra, "{}")
+    overridden = func.json_extract(current, "$.reasoning.isUserOverride")
+    patch = case((overridden == 1, func.json_remove(incoming, "$.reasoning")), else_=incoming)
+    return func.nullif(func.json_patch(current, patch), "{}")
+
+
+def bulk_upsert_model_metadata(
+    sess: Session,
+    listings: Dict[str, List[Dict[str, Any]]],
+    *,
+    fetched_at: str,
+) -> List[str]:
+    """
+    Write discovered catalogs and capability metadata for many providers in
+    one transaction.
+    
+    Each listed model is upserted with one INSERT ... ON CONFLICT DO UPDATE:
+    display name, listing position and `fetched_at` are replaced, and its
+    capabilities (reasoning, context window, tool support) are merged into
+    `extra` in SQL. Reasoning flagged `isUserOverride` is left untouched, as
+    are `parse_think_tags` and any other settings. Models a provider no
+    longer lists drop out of the catalog but keep their settings.
+    
+    Args:
+        listings: provider -> listing dicts with 'id', 'name' and optional
+            'supports_reasoning', 'context_window', 'supports_tools'
+        fetched_at: ISO timestamp of the fetch
+    
+    Returns:
+        Providers whose catalog contents or order changed
+    """
+    cache = get_settings_cache()
+    changed = []
+    rows: List[Dict[str, Any]] = []
+    for provider, models in listings.items():
+        before = [(r.model_id, r.display_name) for r in get_catalog_records(sess, provider)]
+        after = [(info["id"], info.get("name") or info["id"]) for info in models]
+        if before != after:
+            changed.append(provider)
+        rows.extend(
+            {
+                "provider": provider,
+                "model_id": model_id,
+                "parse_think_tags": False,
+                "extra": _capabilities(info),
+                "display_name": name,
+                "fetched_at": fetched_at,
+                "catalog_position": position,
+            }
+            for position, ((model_id, name), info) in enumerate(zip(after, models))
+        )
+
+    if rows:
+        insert = sqlite_insert(Model)
+        excluded = insert.excluded
+        stmt = insert.on_conflict_do_update(
+            index_elements=[Model.provider, Model.model_id],
+            set_={
+                "display_name": excluded.display_name,
+                "fetched_at": excluded.fetched_at,
+                "catalog_position": excluded.catalog_position,
+                "extra": _merged_extra(excluded),
+            },
+        )
+        sess.execute(stmt, rows)
+    for provider, models in listings.items():
+        sess.execute(
+            update(Model)
+            .where(
+                Model.provider == provider,
+                Model.fetched_at.is_not(None),
+                Model.model_id.not_in([info["id"] for info in models]),
+            )
+            .values(fetched_at=None, catalog_position=None)
+        )
+    sess.commit()
+
+    # Push the merged rows back into the settings cache
+    refreshed = sess.execute(select(Model.__table__).where(Model.provider.in_(list(listings)))).all()
+    for row in refreshed:
+        cache.put_model(row)
+    return changed
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Boolean, String, Text, ForeignKey, Integer
+from sqlalchemy import Boolean, String, Text, ForeignKey, Index, Integer
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from typing import List, Optional
 
@@ -19,14 +19,20 @@ class Chat(Base):
     updatedAt: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     agent_config: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     active_leaf_message_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Last time the chat was restored from the archive (see db/archive.py)
+    accessedAt: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
+    # passive_deletes: let SQLite's ON DELETE CASCADE remove messages instead of
+    # loading every message into the session first
     messages: Mapped[List["Message"]] = relationship(
-        back_populates="chat", cascade="all, delete-orphan"
+        back_populates="chat", cascade="all, delete-orphan", passive_deletes=True
     )
 
 
 class Message(Base):
     __tablename__ = "messages"
+    # Children of a node in sibling order: tree skeleton, sibling and sequence lookups
+    __table_args__ = (Index("ix_messages_chat_parent_seq", "chatId", "parent_message_id", "sequence"),)
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     chatId: Mapped[str] = mapped_column(String, ForeignKey("chats.id", ondelete="CASCADE"))
@@ -38,6 +44,15 @@ class Message(Base):
     is_complete: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     sequence: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     model_used: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Leaf that was last active below this message, so switching back to this
+    # branch lands where the user left off (maintained by set_active_leaf)
+    last_leaf_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Tokens this message adds to a request, counted once when it is saved or
+    # completes (NULL until counted; see services.token_counter)
+    token_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # JSON provider-reported usage summed over the runs that wrote this reply,
+    # with cached vs uncached input tokens (see services.prompt_cache)
+    usage: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     chat: Mapped[Chat] = relationship(back_populates="messages")
 
@@ -67,3 +82,24 @@ class Model(Base):
     model_id: Mapped[str] = mapped_column(String, primary_key=True)
     parse_think_tags: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     extra: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Catalog: set while the provider's /models listing includes this model
+    display_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    fetched_at: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    catalog_position: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+
+class ConversationSummary(Base):
+    """Summary of a message-path prefix, shared by every branch that starts with that prefix."""
+    __tablename__ = "conversation_summaries"
+
+    # Hash chain over (id, content) of every message in the prefix, root first
+    prefix_hash: Mapped[str] = mapped_column(String, primary_key=True)
+    chatId: Mapped[str] = mapped_column(String, ForeignKey("chats.id", ondelete="CASCADE"), index=True)
+    # Last message covered, and how many messages / tokens the summary replaces
+    last_message_id: Mapped[str] = mapped_column(String, nullable=False)
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    covered_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    summary_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    model_used: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    createdAt: Mapped[str] = mapped_column(String, nullable=False)
@@ -2,9 +2,9 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
-from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from .cache import ProviderRecord, get_settings_cache
 from .models import ProviderSettings
 import json
 
@@ -20,17 +20,14 @@ def get_provider_settings(sess: Session, provider: str) -> Optional[Dict[str, An
     Returns:
         Provider settings dict or None if not found
     """
-    settings: Optional[ProviderSettings] = sess.get(ProviderSettings, provider)
-    if not settings:
-        return None
-    
-    return {
-        "provider": settings.provider,
-        "api_key": settings.api_key,
-        "base_url": settings.base_url,
-        "extra": settings.extra,  # raw JSON string (UI handles editing)
-        "enabled": settings.enabled,
-    }
+    record = get_provider_record(sess, provider)
+    # extra stays a raw JSON string (UI handles editing)
+    return record.as_dict() if record else None
+
+
+def get_provider_record(sess: Session, provider: str) -> Optional[ProviderRecord]:
+    """Get cached, parsed settings for a provider (extra already decoded)."""
+    return get_settings_cache().provider(sess, provider)
 
 
 def get_all_provider_settings(sess: Session) -> Dict[str, Dict[str, Any]]:
@@ -43,19 +40,7 @@ def get_all_provider_settings(sess: Session) -> Dict[str, Dict[str, Any]]:
     Returns:
         Dict mapping provider name to settings dict
     """
-    stmt = select(ProviderSettings)
-    rows = list(sess.scalars(stmt))
-    
-    result = {}
-    for row in rows:
-        result[row.provider] = {
-            "provider": row.provider,
-            "api_key": row.api_key,
-            "base_url": row.base_url,
-            "extra": row.extra,
-            "enabled": row.enabled,
-        }
-    return result
+    return {name: record.as_dict() for name, record in get_settings_cache().providers(sess).items()}
 
 
 def save_provider_settings(
@@ -116,3 +101,4 @@ def save_provider_settings(
         sess.add(settings)
     
     sess.commit()
+    get_settings_cache().put_provider(settings)
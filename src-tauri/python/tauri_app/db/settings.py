@@ -5,6 +5,7 @@ from typing import Any, Dict, List, Optional
 
 from sqlalchemy.orm import Session
 
+from .cache import get_settings_cache
 from .models import UserSettings
 
 
@@ -19,8 +20,7 @@ def get_user_setting(sess: Session, key: str) -> Optional[str]:
     Returns:
         Setting value or None if not found
     """
-    setting: Optional[UserSettings] = sess.get(UserSettings, key)
-    return setting.value if setting else None
+    return get_settings_cache().user_setting(sess, key)
 
 
 def set_user_setting(sess: Session, key: str, value: str) -> None:
@@ -41,6 +41,7 @@ def set_user_setting(sess: Session, key: str, value: str) -> None:
         sess.add(setting)
     
     sess.commit()
+    get_settings_cache().put_user_setting(key, value)
 
 
 def get_default_tool_ids(sess: Session) -> List[str]:
@@ -53,7 +54,10 @@ def get_default_tool_ids(sess: Session) -> List[str]:
     Returns:
         List of tool IDs
     """
-    value = get_user_setting(sess, "default_tool_ids")
+    return get_settings_cache().parsed_user_setting(sess, "default_tool_ids", _parse_tool_ids)
+
+
+def _parse_tool_ids(value: Optional[str]) -> List[str]:
     if not value:
         return []
     
@@ -86,7 +90,10 @@ def get_general_settings(sess: Session) -> Dict[str, Any]:
     Returns:
         Dict with all general settings, including auto_title and future settings
     """
-    value = get_user_setting(sess, "general_settings")
+    return get_settings_cache().parsed_user_setting(sess, "general_settings", _parse_general_settings)
+
+
+def _parse_general_settings(value: Optional[str]) -> Dict[str, Any]:
     if not value:
         return get_default_general_settings()
     
@@ -129,7 +136,45 @@ def get_default_general_settings() -> Dict[str, Any]:
             "model_mode": "current",  # "current" or "specific"
             "provider": "openai",
             "model_id": "gpt-4o-mini",
-        }
+        },
+        "archive": {
+            "enabled": True,
+            "after_days": 90,  # move chats untouched this long into archive.db
+        },
+        "compaction": {
+            "enabled": True,
+            "placeholder_grace_minutes": 60,  # empty unfinished replies older than this are dropped
+            "keep_siblings": 5,  # newest branches kept per fork (active path always kept)
+            "sibling_min_age_days": 7,
+        },
+        "backup": {
+            "enabled": True,
+            "interval_hours": 24,
+            "keep": 7,  # snapshots retained in backups/
+        },
+        "context": {
+            "strategy": "drop_oldest",  # "drop_oldest", "keep_last_n" or "none"
+            "keep_last": 20,  # messages kept by keep_last_n
+            "elide_tool_results": True,  # stub large tool results of older turns before dropping
+            "keep_tool_results": 2,  # most recent assistant turns whose tool results are never elided
+            "output_reserve": 4096,  # tokens left free for the reply
+            "drop_step": 8,  # drop_oldest cuts in multiples of this many messages (keeps prompt caches warm)
+        },
+        "auto_resume": {
+            "enabled": True,  # resume a reply after a dropped connection / overload / 429
+            "max_attempts": 3,
+            "base_delay_s": 1.0,  # doubled per attempt (jittered), capped at max_delay_s
+            "max_delay_s": 20.0,
+        },
+        "summaries": {
+            "enabled": True,  # condense older turns of long chats in the background
+            "threshold_tokens": 24000,  # path size at which summarizing starts
+            "keep_recent": 12,  # most recent messages never summarized
+            "chunk_messages": 20,  # summaries cover multiples of this many messages
+            "step_tokens": 16000,  # turns folded into the summary per model call
+            "provider": None,  # summarizer model (None: the chat's model)
+            "model_id": None,
+        },
     }
 
 
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .archive import chunks
+from .models import ConversationSummary
+
+_summaries = ConversationSummary.__table__
+
+
+def has_conversation_summaries(sess: Session, chat_id: str) -> bool:
+    """Whether any summary was produced for a chat (cheap check before hashing a path)."""
+    stmt = select(_summaries.c.prefix_hash).where(_summaries.c.chatId == chat_id).limit(1)
+    return sess.execute(stmt).first() is not None
+
+
+def get_conversation_summaries(sess: Session, prefix_hashes: List[str]) -> Dict[str, ConversationSummary]:
+    """Cached summaries for any of the given prefix hashes, keyed by hash."""
+    found: Dict[str, ConversationSummary] = {}
+    for batch in chunks(prefix_hashes):
+        stmt = select(ConversationSummary).where(ConversationSummary.prefix_hash.in_(batch))
+        found.update({row.prefix_hash: row for row in sess.scalars(stmt)})
+    return found
+
+
+def save_conversation_summary(
+    sess: Session,
+    *,
+    prefix_hash: str,
+    chat_id: str,
+    last_message_id: str,
+    message_count: int,
+    covered_tokens: int,
+    summary: str,
+    summary_tokens: int,
+    model_used: Optional[str] = None,
+) -> None:
+    """Store a prefix summary (a concurrent writer for the same prefix wins)."""
+    sess.execute(
+        insert(_summaries)
+        .values(
+            prefix_hash=prefix_hash,
+            chatId=chat_id,
+            last_message_id=last_message_id,
+            message_count=message_count,
+            covered_tokens=covered_tokens,
+            summary=summary,
+            summary_tokens=summary_tokens,
+            model_used=model_used,
+            createdAt=datetime.utcnow().isoformat(),
+        )
+        .on_conflict_do_nothing(index_elements=[_summaries.c.prefix_hash])
+    )
+    sess.commit()
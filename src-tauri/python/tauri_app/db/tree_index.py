@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from .models import Chat, Message
+
+_NONE = -1
+# Per node: six 8-byte array slots, a 36-char uuid str (~85 B), its list slot
+# and dict entry (~100 B). Used for the cache's memory budget.
+_NODE_BYTES = 6 * 8 + 85 + 8 + 100
+
+_messages = Message.__table__
+_NODES_STMT = (
+    select(_messages.c.id, _messages.c.parent_message_id, _messages.c.sequence, _messages.c.last_leaf_id)
+    .where(_messages.c.chatId == bindparam("chat_id"))
+    .order_by(_messages.c.parent_message_id, _messages.c.sequence)
+)
+_ACTIVE_LEAF_STMT = select(Chat.active_leaf_message_id).where(Chat.id == bindparam("chat_id"))
+
+
+class ChatTreeIndex:
+    """
+    Array-backed branch tree of one chat.
+
+    Node i is `ids[i]`; the tree is stored as parent / first-child / last-child /
+    next-sibling index arrays (-1 for none), so path, sibling and leaf queries
+    are plain integer walks. Children are linked in sequence order because new
+    siblings always get the next sequence number.
+    """
+
+    __slots__ = (
+        "ids", "pos", "parent", "sequence", "first_child", "last_child",
+        "next_sibling", "last_leaf", "roots", "active_leaf", "_active",
+    )
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.pos: Dict[str, int] = {}
+        self.parent = array("l")
+        self.sequence = array("l")
+        self.first_child = array("l")
+        self.last_child = array("l")
+        self.next_sibling = array("l")
+        self.last_leaf = array("l")
+        self.roots: List[int] = []
+        self.active_leaf: Optional[str] = None
+        self._active: Optional[frozenset] = None
+
+    @classmethod
+    def load(cls, sess: Session, chat_id: str) -> "ChatTreeIndex":
+        """Build the index from one indexed query (rows arrive grouped by parent, in sequence order)."""
+        index = cls()
+        rows = sess.execute(_NODES_STMT, {"chat_id": chat_id}).all()
+        for r in rows:
+            index._append(r.id, r.sequence)
+        for r in rows:
+            index._link(index.pos[r.id], index.pos.get(r.parent_message_id, _NONE))
+        for r in rows:
+            # Only branch points keep a remembered leaf (older rows may carry one elsewhere)
+            i = index.pos[r.id]
+            if r.last_leaf_id in index.pos and index._has_sibling(i):
+                index.last_leaf[i] = index.pos[r.last_leaf_id]
+        index.active_leaf = sess.execute(_ACTIVE_LEAF_STMT, {"chat_id": chat_id}).scalar()
+        return index
+
+    # Mutation
+
+    def _append(self, message_id: str, sequence: int) -> int:
+        i = len(self.ids)
+        self.ids.append(message_id)
+        self.pos[message_id] = i
+        self.sequence.append(sequence)
+        for column in (self.parent, self.first_child, self.last_child, self.next_sibling, self.last_leaf):
+            column.append(_NONE)
+        return i
+
+    def _link(self, i: int, parent: int) -> None:
+        self.parent[i] = parent
+        if parent == _NONE:
+            self.roots.append(i)
+        elif self.first_child[parent] == _NONE:
+            self.first_child[parent] = self.last_child[parent] = i
+        else:
+            self.next_sibling[self.last_child[parent]] = i
+            self.last_child[parent] = i
+
+    def add(self, message_id: str, parent_id: Optional[str], sequence: int) -> None:
+        if message_id in self.pos:
+            return
+        parent = self.pos.get(parent_id, _NONE) if parent_id else _NONE
+        siblings = self._children(parent)
+        if len(siblings) == 1:
+            # Mirror db.create_branch_message: the only child becomes a branch point
+            only_child = siblings[0]
+            active = self.pos.get(self.active_leaf, _NONE) if self.active_leaf else _NONE
+            self.last_leaf[only_child] = active if only_child in self._walk_up(active) else _NONE
+        self._link(self._append(message_id, sequence), parent)
+
+    def _has_sibling(self, i: int) -> bool:
+        parent = self.parent[i]
+        if parent == _NONE:
+            return len(self.roots) > 1
+        return self.first_child[parent] != self.last_child[parent]
+
+    def set_active_leaf(self, leaf_id: str) -> None:
+        """Mirror db.set_active_leaf: branch points on the path remember the leaf."""
+        self.active_leaf = leaf_id
+        self._active = None
+        leaf = self.pos.get(leaf_id, _NONE)
+        for i in self._walk_up(leaf):
+            if self._has_sibling(i):
+                self.last_leaf[i] = leaf
+
+    # Queries
+
+    def _walk_up(self, i: int) -> List[int]:
+        path = []
+        while i != _NONE:
+            path.append(i)
+            i = self.parent[i]
+        return path
+
+    def _children(self, parent: int) -> List[int]:
+        if parent == _NONE:
+            return list(self.roots)
+        out = []
+        i = self.first_child[parent]
+        while i != _NONE:
+            out.append(i)
+            i = self.next_sibling[i]
+        return out
+
+    def children(self, parent_id: Optional[str]) -> List[str]:
+        """Child ids of a message (roots for None), in sequence order."""
+        parent = self.pos.get(parent_id, _NONE) if parent_id else _NONE
+        return [self.ids[i] for i in self._children(parent)]
+
+    def branch_points(self, leaf_id: str) -> List[Tuple[str, Optional[str]]]:
+        """(id, remembered leaf id) of each message with siblings on the path to `leaf_id`."""
+        out = []
+        for i in self._walk_up(self.pos.get(leaf_id, _NONE)):
+            if self._has_sibling(i):
+                remembered = self.last_leaf[i]
+                out.append((self.ids[i], self.ids[remembered] if remembered != _NONE else None))
+        return out
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self.pos
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def path(self, leaf_id: str) -> List[str]:
+        """Message ids from the root down to `leaf_id`."""
+        return [self.ids[i] for i in reversed(self._walk_up(self.pos.get(leaf_id, _NONE)))]
+
+    def active_ids(self) -> frozenset:
+        if self._active is None:
+            self._active = frozenset(self.path(self.active_leaf)) if self.active_leaf else frozenset()
+        return self._active
+
+    def siblings(self, message_id: str) -> List[Tuple[str, int, bool]]:
+        """(id, sequence, is_active) for the message and its siblings, in sequence order."""
+        i = self.pos.get(message_id)
+        if i is None:
+            return []
+        active = self.active_ids()
+        return [(self.ids[j], self.sequence[j], self.ids[j] in active) for j in self._children(self.parent[i])]
+
+    def leaf_descendant(self, message_id: str) -> str:
+        """Follow first children down, jumping to the leaf remembered at a branch point."""
+        i = self.pos.get(message_id)
+        if i is None:
+            return message_id
+        while self.last_leaf[i] == _NONE and self.first_child[i] != _NONE:
+            i = self.first_child[i]
+        return self.ids[self.last_leaf[i] if self.last_leaf[i] != _NONE else i]
+
+    def nbytes(self) -> int:
+        """Approximate memory footprint, for the cache's budget."""
+        return len(self.ids) * _NODE_BYTES
+
+
+class TreeIndexCache:
+    """LRU of ChatTreeIndex per open chat, bounded by an approximate memory budget."""
+
+    def __init__(self, budget_bytes: int = 32 * 1024 * 1024) -> None:
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, ChatTreeIndex]" = OrderedDict()
+        self.budget_bytes = budget_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sess: Session, chat_id: str) -> ChatTreeIndex:
+        with self._lock:
+            index = self._entries.get(chat_id)
+            if index is not None:
+                self.hits += 1
+                self._entries.move_to_end(chat_id)
+                return index
+            self.misses += 1
+            index = ChatTreeIndex.load(sess, chat_id)
+            self._entries[chat_id] = index
+            self._evict()
+            return index
+
+    def on_insert(self, chat_id: str, message_id: str, parent_id: Optional[str], sequence: int) -> None:
+        with self._lock:
+            index = self._entries.get(chat_id)
+            if index is not None:
+                index.add(message_id, parent_id, sequence)
+
+    def on_active_leaf(self, chat_id: str, leaf_id: str) -> None:
+        with self._lock:
+            index = self._entries.get(chat_id)
+            if index is None:
+                return
+            if leaf_id in index:
+                index.set_active_leaf(leaf_id)
+            else:
+                # Written behind the index's back; reload on next use
+                self.evict(chat_id)
+
+    def evict(self, chat_id: str) -> None:
+        with self._lock:
+            self._entries.pop(chat_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def nbytes(self) -> int:
+        return sum(index.nbytes() for index in self._entries.values())
+
+    def _evict(self) -> None:
+        # Least recently used first; the chat just loaded is always kept
+        while len(self._entries) > 1 and self.nbytes() > self.budget_bytes:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.nbytes(),
+        }
+
+
+# Global singleton
+_tree_index_cache: Optional[TreeIndexCache] = None
+
+
+def get_tree_index_cache() -> TreeIndexCache:
+    """Get the global branch-tree index cache instance."""
+    global _tree_index_cache
+    if _tree_index_cache is None:
+        _tree_index_cache = TreeIndexCache()
+    return _tree_index_cache
@@ -49,6 +49,7 @@ class ChatData(_BaseModel):
     model: Optional[str] = None
     createdAt: Optional[str] = None
     updatedAt: Optional[str] = None
+    incognito: bool = False
 
 
 class AllChatsData(_BaseModel):
@@ -69,6 +70,8 @@ class CreateChatInput(_BaseModel):
     title: Optional[str] = None
     model: Optional[str] = None
     agentConfig: Optional[AgentConfig] = None
+    # Keep the chat in memory only; it is never written to disk
+    incognito: bool = False
 
 
 class UpdateChatInput(_BaseModel):
@@ -81,6 +84,20 @@ class ChatId(_BaseModel):
     id: str
 
 
+class DeleteChatsInput(_BaseModel):
+    ids: List[str]
+
+
+class GetChatInput(_BaseModel):
+    id: str
+    # Embed each active-path message's siblings (saves one get_message_siblings call per message)
+    includeSiblings: bool = False
+
+
+class ArchiveChatsInput(_BaseModel):
+    olderThanDays: Optional[int] = None
+
+
 class ChatStreamRequest(_BaseModel):
     messages: List[ChatMessage]
     modelId: str
@@ -98,6 +115,23 @@ class ChatEvent(_BaseModel):
     error: Optional[str] = None
     # For seeding existing content blocks on continuation
     blocks: Optional[List[Dict[str, Any]]] = None
+    # RunResuming: which automatic resume this is and when it starts
+    attempt: Optional[int] = None
+    retryInMs: Optional[int] = None
+    # ContextTrimmed: dropped/elided message ids and the token budget
+    # ContextSummarized: how many messages a cached summary replaced and their token counts
+    context: Optional[Dict[str, Any]] = None
+    # RunCompleted: the run's input tokens, split into cached and uncached
+    usage: Optional[Dict[str, int]] = None
+
+
+class BackupEvent(_BaseModel):
+    event: str  # "BackupProgress", "BackupCompleted", "BackupError"
+    database: Optional[str] = None  # "main" or "archive"
+    remaining: Optional[int] = None  # pages left in `database`
+    total: Optional[int] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
 
 
 class ToolApprovalResponse(_BaseModel):
@@ -117,6 +151,19 @@ class UpdateChatModelInput(_BaseModel):
     modelId: str
 
 
+class UpdateChatHedgeInput(_BaseModel):
+    chatId: str
+    # Fallback model; None clears the chat's hedge policy
+    provider: Optional[str] = None
+    modelId: Optional[str] = None
+    afterMs: int = 1500
+
+
+class PrewarmModelInput(_BaseModel):
+    provider: str
+    modelId: str
+
+
 class ToolInfo(_BaseModel):
     id: str
     name: Optional[str] = None
@@ -139,6 +186,13 @@ class AvailableModelsResponse(_BaseModel):
     models: List[ModelInfo]
 
 
+class ModelCatalogEvent(_BaseModel):
+    event: str  # "ProviderModels", "ProviderError", "CatalogComplete", "CatalogUpdated"
+    provider: Optional[str] = None
+    models: List[ModelInfo] = []
+    error: Optional[str] = None
+
+
 class ProviderConfig(_BaseModel):
     provider: str
     api_key: Optional[str] = None
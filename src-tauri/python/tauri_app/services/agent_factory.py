@@ -3,26 +3,200 @@ Agent Factory for creating Agno agent instances.
 
 Creates fresh agent instances per request as recommended by Agno docs.
 Manages agent configuration, model selection, and tool activation.
+
+The config-derived parts of an agent (tool instances, their hook metadata,
+name, description, instructions) are cached as immutable templates keyed by
+the chat's config version, so a request only attaches its per-run state:
+the pooled model, the channel, the assistant message id and the pre-hook.
+Set AGENT_TEMPLATE_CACHE=0 to build everything per request (for comparison).
+Streaming commands call `begin_agent_request` on entry, so first-token
+latency is reported split by whether the request's template came from cache.
 """
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from os import getenv
+from typing import Any, Dict, List, Optional, Tuple
 
 from pytauri import AppHandle
 
 from .. import db
-from .model_factory import get_model
+from .model_factory import get_pooled_model
 from .tool_registry import get_tool_registry
 from .hook_manager import get_hook_manager
+from .hedging import HedgePolicy, parse_hedge_policy
 
 from agno.agent import Agent
 
+AGENT_TEMPLATE_CACHE = getenv("AGENT_TEMPLATE_CACHE") != "0"
+
+
+@dataclass
+class _AgentRequest:
+    """Timing of one streaming command, from entry to its first token."""
+    started: float
+    cached: Optional[bool] = None  # whether the first agent's template came from cache
+    done: bool = False
+
+
+_agent_request: ContextVar[Optional[_AgentRequest]] = ContextVar("agent_request", default=None)
+
+
+@dataclass(frozen=True)
+class AgentTemplate:
+    """Config-derived, request-independent parts of a chat agent."""
+    provider: str
+    model_id: Optional[str]
+    name: str
+    description: str
+    instructions: Tuple[str, ...]
+    tool_ids: Tuple[str, ...]
+    tools: Tuple[Any, ...]
+
+
+def build_agent_template(config: Dict[str, Any]) -> AgentTemplate:
+    """
+    Instantiate tools and register their hook metadata for a config.
+
+    Args:
+        config: Chat agent configuration
+
+    Returns:
+        Immutable template shared by every request until the config changes
+    """
+    tool_ids = tuple(config.get("tool_ids", []) or [])
+
+    # Get tool instances
+    tool_registry = get_tool_registry()
+    tools = tool_registry.get_tools(list(tool_ids)) if tool_ids else []
+
+    # Set up hook manager with tool metadata
+    hook_manager = get_hook_manager()
+    for tool_id in tool_ids:
+        metadata = tool_registry._metadata.get(tool_id, {})
+        hook_manager.register_tool_metadata(
+            tool_id=tool_id,
+            requires_approval=metadata.get("requires_approval", False),
+            allow_edit=metadata.get("allow_edit", False),
+            renderer=metadata.get("renderer"),
+        )
+
+    return AgentTemplate(
+        provider=config.get("provider", "openai"),
+        model_id=config.get("model_id"),
+        name=config.get("name", "Assistant"),
+        description=config.get("description", "You are a helpful AI assistant."),
+        instructions=tuple(config.get("instructions", []) or []),
+        tool_ids=tool_ids,
+        tools=tuple(tools),
+    )
+
+
+class AgentTemplateCache:
+    """
+    Agent templates per chat, tagged with the config version they were built
+    from (see db.get_chat_agent_config_versioned), with build-time stats.
+
+    A config write bumps the version, so the next request rebuilds. Entries
+    beyond `max_entries` are dropped least recently used first.
+    """
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, AgentTemplate]]" = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (phase, "cached" / "uncached") -> [count, total seconds], where phase is
+        # "build" (create_agent_for_chat) or "ttft" (command entry to first token)
+        self._timings: Dict[Tuple[str, str], List[float]] = {
+            (phase, kind): [0, 0.0] for phase in ("build", "ttft") for kind in ("cached", "uncached")
+        }
+
+    def get(self, chat_id: str, version: int, config: Dict[str, Any]) -> Tuple[AgentTemplate, bool]:
+        """Template for a chat's config version, and whether it came from cache."""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                self._entries.move_to_end(chat_id)
+                return entry[1], True
+            self.misses += 1
+        template = build_agent_template(config)
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or entry[0] < version:
+                self._entries[chat_id] = (version, template)
+                self._entries.move_to_end(chat_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return template, False
+
+    def record(self, phase: str, cached: bool, seconds: float) -> None:
+        with self._lock:
+            timing = self._timings[(phase, "cached" if cached else "uncached")]
+            timing[0] += 1
+            timing[1] += seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            avg = {
+                key: round(total / count * 1000, 3) if count else None
+                for key, (count, total) in self._timings.items()
+            }
+            return {
+                "enabled": AGENT_TEMPLATE_CACHE,
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "buildCachedMs": avg[("build", "cached")],
+                "buildUncachedMs": avg[("build", "uncached")],
+                "ttftCachedMs": avg[("ttft", "cached")],
+                "ttftUncachedMs": avg[("ttft", "uncached")],
+            }
+
+
+# Global singleton
+_agent_template_cache: Optional[AgentTemplateCache] = None
+
+
+def get_agent_template_cache() -> AgentTemplateCache:
+    """Get the global agent template cache instance."""
+    global _agent_template_cache
+    if _agent_template_cache is None:
+        _agent_template_cache = AgentTemplateCache()
+    return _agent_template_cache
+
+
+def begin_agent_request() -> None:
+    """Mark a streaming command's entry; its first token is timed from here."""
+    _agent_request.set(_AgentRequest(time.perf_counter()))
+
+
+def record_first_token() -> None:
+    """Record the current request's entry-to-first-token time (once per request)."""
+    request = _agent_request.get()
+    if request is None or request.done or request.cached is None:
+        return
+    request.done = True
+    get_agent_template_cache().record("ttft", request.cached, time.perf_counter() - request.started)
+
+
 def create_agent_for_chat(
     chat_id: str,
     app_handle: AppHandle,
     history_messages: Optional[List[Dict[str, Any]]] = None,
     channel=None,
     assistant_msg_id: str = None,
+    model: Optional[Tuple[str, str]] = None,
 ) -> Any:
     """
     Create a fresh Agno agent instance for a chat session.
@@ -36,6 +210,7 @@ def create_agent_for_chat(
         history_messages: Optional list of previous messages to include as context
         channel: Optional channel for sending events (needed for approval gates)
         assistant_msg_id: Optional assistant message ID (needed for approval gates)
+        model: Optional (provider, model_id) overriding the chat's model (hedge fallback)
         
     Returns:
         Configured Agno Agent instance
@@ -43,43 +218,30 @@ def create_agent_for_chat(
     Raises:
         RuntimeError: If agent configuration is invalid or missing required keys
     """
+    started = time.perf_counter()
     
     # Load agent configuration from database
     with db.db_session(app_handle) as sess:
-        config = db.get_chat_agent_config(sess, chat_id)
+        config, version = db.get_chat_agent_config_versioned(sess, chat_id)
         if not config:
             # Use default config if not set
-            config = db.get_default_agent_config()
-            db.update_chat_agent_config(sess, chatId=chat_id, config=config)
-    
-    # Extract configuration
-    provider = config.get("provider", "openai")
-    model_id = config.get("model_id")
-    tool_ids = config.get("tool_ids", [])
-    instructions = config.get("instructions", [])
-    name = config.get("name", "Assistant")
-    description = config.get("description", "You are a helpful AI assistant.")
+            default = db.get_default_agent_config()
+            db.update_chat_agent_config(sess, chatId=chat_id, config=default)
+            config, version = db.get_chat_agent_config_versioned(sess, chat_id)
+            config = config or default
     
-    # Get model instance
-    model = get_model(provider, model_id, app_handle)
+    template_cache = get_agent_template_cache()
+    if AGENT_TEMPLATE_CACHE:
+        template, cached = template_cache.get(chat_id, version, config)
+    else:
+        template, cached = build_agent_template(config), False
     
-    # Get tool instances
-    tool_registry = get_tool_registry()
-    tools = tool_registry.get_tools(tool_ids) if tool_ids else []
-    
-    # Set up hook manager with tool metadata
-    hook_manager = get_hook_manager()
-    for tool_id in tool_ids:
-        metadata = tool_registry._metadata.get(tool_id, {})
-        hook_manager.register_tool_metadata(
-            tool_id=tool_id,
-            requires_approval=metadata.get("requires_approval", False),
-            allow_edit=metadata.get("allow_edit", False),
-            renderer=metadata.get("renderer"),
-        )
+    # Get model instance (shares the pooled provider client; released after the stream)
+    provider, model_id = model or (template.provider, template.model_id)
+    pooled_model = get_pooled_model(provider, model_id, app_handle)
     
     # Create pre-hook (handles all logic including approval and renderer metadata)
-    pre_hook = hook_manager.create_pre_hook(
+    pre_hook = get_hook_manager().create_pre_hook(
         channel=channel,
         assistant_msg_id=assistant_msg_id,
         app_handle=app_handle
@@ -89,20 +251,72 @@ def create_agent_for_chat(
     # NOTE: We do NOT use Agno's database or history management
     # All persistence is handled through our SQLAlchemy DB
     agent = Agent(
-        name=name,
-        model=model,
-        tools=tools if tools else None,
-        description=description,
-        instructions=instructions if instructions else None,
+        name=template.name,
+        model=pooled_model,
+        tools=list(template.tools) if template.tools else None,
+        description=template.description,
+        instructions=list(template.instructions) if template.instructions else None,
         markdown=True,  # Enable markdown formatting
         stream_intermediate_steps=True,
         tool_hooks=[pre_hook],  # Single hook that does everything!
         #debug_mode=True  # Temporary for debugging tool calls
     )
     
+    template_cache.record("build", cached, time.perf_counter() - started)
+    request = _agent_request.get()
+    if request is not None and request.cached is None:
+        # The first agent of a request decides its side of the TTFT split
+        request.cached = cached
+    return agent
+
+
+def inject_conversation_summary(agent: Any, summary: Optional[str]) -> Any:
+    """
+    Add a rolling summary of the earlier conversation to an agent's system message.
+
+    Args:
+        agent: Agent created by create_agent_for_chat
+        summary: Summary text standing in for the messages it covers (None: no-op)
+
+    Returns:
+        The same agent
+    """
+    if summary:
+        agent.additional_context = f"<conversation_summary>\n{summary}\n</conversation_summary>"
     return agent
 
 
+def get_hedge_policy(chat_id: str, app_handle: AppHandle) -> Optional[HedgePolicy]:
+    """Hedge policy from the chat's agent config, if one is set."""
+    with db.db_session(app_handle) as sess:
+        return parse_hedge_policy(db.get_chat_agent_config(sess, chat_id))
+
+
+def update_agent_hedge(
+    chat_id: str,
+    hedge: Optional[Dict[str, Any]],
+    app_handle: AppHandle,
+) -> None:
+    """
+    Set or clear the latency hedge policy for a chat session.
+    
+    Args:
+        chat_id: Chat identifier
+        hedge: Dict with provider, model_id and after_ms, or None to disable hedging
+        app_handle: Tauri app handle for database access
+    """
+    with db.db_session(app_handle) as sess:
+        config = db.get_chat_agent_config(sess, chat_id)
+        if not config:
+            config = db.get_default_agent_config()
+        
+        if hedge:
+            config["hedge"] = hedge
+        else:
+            config.pop("hedge", None)
+        db.update_chat_agent_config(sess, chatId=chat_id, config=config)
+
+
 def update_agent_tools(
     chat_id: str,
     tool_ids: List[str],
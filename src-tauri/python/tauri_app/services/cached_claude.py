@@ -0,0 +1,72 @@
+"""
+Claude with cache breakpoints on tools and history.
+
+agno's Claude can only mark the system prompt for caching, which for most
+chats is far below Anthropic's minimum cacheable length. The part that
+grows is the history, so this subclass adds two breakpoints (Anthropic
+allows four):
+
+- the last tool schema, which caches the system prompt and every tool
+- the user turn before the newest one. Everything up to it is unchanged
+  from the previous request, so each turn reads the prefix the turn
+  before wrote.
+
+The history breakpoint is set on a copy of that message before agno
+formats the request, so the run's own messages are left untouched. Imported
+through the provider registry, like agno's model classes.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from agno.models.anthropic import Claude
+
+
+@dataclass
+class CachedClaude(Claude):
+    cache_tools: bool = False
+    cache_history: bool = False
+
+    def _cache_control(self) -> Dict[str, str]:
+        # A 1h breakpoint may not follow a 5m one, so all share the system prompt's TTL
+        return {"type": "ephemeral", "ttl": "1h"} if self.extended_cache_time else {"type": "ephemeral"}
+
+    def _prepare_request_kwargs(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        request_kwargs = super()._prepare_request_kwargs(*args, **kwargs)
+        tools = request_kwargs.get("tools")
+        if self.cache_tools and tools:
+            tools[-1] = {**tools[-1], "cache_control": self._cache_control()}
+        return request_kwargs
+
+    def _with_history_breakpoint(self, messages: List[Any]) -> List[Any]:
+        """`messages` with the user turn before the newest one marked as a cache breakpoint."""
+        if not self.cache_history:
+            return messages
+        user_turns = [i for i, m in enumerate(messages) if m.role == "user"]
+        if len(user_turns) < 2:
+            return messages
+        i = user_turns[-2]
+        content = messages[i].content
+        if isinstance(content, str) and content:
+            blocks = [{"type": "text", "text": content}]
+        elif isinstance(content, list) and content and isinstance(content[-1], dict):
+            blocks = list(content)
+        else:
+            return messages
+        blocks[-1] = {**blocks[-1], "cache_control": self._cache_control()}
+        marked = list(messages)
+        marked[i] = messages[i].model_copy(update={"content": blocks})
+        return marked
+
+    def invoke(self, messages: List[Any], **kwargs: Any) -> Any:
+        return super().invoke(messages=self._with_history_breakpoint(messages), **kwargs)
+
+    def invoke_stream(self, messages: List[Any], **kwargs: Any) -> Any:
+        return super().invoke_stream(messages=self._with_history_breakpoint(messages), **kwargs)
+
+    def ainvoke(self, messages: List[Any], **kwargs: Any) -> Any:
+        return super().ainvoke(messages=self._with_history_breakpoint(messages), **kwargs)
+
+    def ainvoke_stream(self, messages: List[Any], **kwargs: Any) -> Any:
+        return super().ainvoke_stream(messages=self._with_history_breakpoint(messages), **kwargs)
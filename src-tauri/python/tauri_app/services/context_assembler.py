@@ -0,0 +1,234 @@
+"""
+Token-budgeted context assembly.
+
+Every stream (new message, continue, retry, edit) passes its message path
+through `assemble_context` before it is converted to agno messages, so the
+request fits the model's context window minus a reserve for the reply. The
+policy comes from the `context` general setting, optionally overridden by a
+chat's agent config:
+
+    "context": {"strategy": "drop_oldest", "keep_last": 20, "elide_tool_results": true,
+                "keep_tool_results": 2, "output_reserve": 4096, "drop_step": 8}
+
+Strategies: "drop_oldest" drops whole messages from the start until the
+rest fits, in multiples of `drop_step` messages so the first message sent
+stays the same over several turns (provider prompt caches only hit on an
+unchanged prefix); "keep_last_n" first keeps only the last `keep_last` messages and
+then drops further if needed; "none" sends everything. With
+`elide_tool_results`, large tool results outside the last
+`keep_tool_results` assistant turns are replaced by a stub before anything
+is dropped. The agent's instructions are always sent and are budgeted as
+fixed overhead.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .. import db
+from ..models.chat import ChatMessage
+from . import token_counter
+
+# Window assumed when a model's listing didn't report one
+DEFAULT_REMOTE_WINDOW = 128_000
+# Local runtimes usually run with a small context unless configured otherwise
+DEFAULT_LOCAL_WINDOW = 8_192
+_LOCAL_PROVIDERS = ("ollama", "lmstudio", "vllm")
+# Rough size of one tool's JSON schema in the request
+TOOL_SCHEMA_TOKENS = 150
+# Tool results shorter than this are never elided
+ELIDE_MIN_CHARS = 400
+STRATEGIES = ("drop_oldest", "keep_last_n", "none")
+
+
+@dataclass(frozen=True)
+class ContextPolicy:
+    strategy: str = "drop_oldest"
+    keep_last: int = 20
+    elide_tool_results: bool = True
+    keep_tool_results: int = 2
+    output_reserve: int = 4096
+    drop_step: int = 8
+
+
+@dataclass
+class AssembledContext:
+    messages: List[ChatMessage]
+    tokens: int
+    budget: int
+    window: int
+    dropped: List[str] = field(default_factory=list)
+    elided: List[str] = field(default_factory=list)
+
+    @property
+    def trimmed(self) -> bool:
+        return bool(self.dropped or self.elided)
+
+    def summary(self) -> Dict[str, Any]:
+        """Payload of the ContextTrimmed event."""
+        return {
+            "droppedMessageIds": self.dropped,
+            "elidedMessageIds": self.elided,
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "window": self.window,
+        }
+
+
+def get_context_policy(app_handle: Any, chat_id: Optional[str]) -> ContextPolicy:
+    """Context policy from general settings, with the chat's agent config overriding it."""
+    with db.db_session(app_handle) as sess:
+        settings: Dict[str, Any] = dict(db.get_general_settings(sess).get("context") or {})
+        if chat_id:
+            settings.update((db.get_chat_agent_config(sess, chat_id) or {}).get("context") or {})
+    defaults = ContextPolicy()
+    strategy = settings.get("strategy", defaults.strategy)
+    return ContextPolicy(
+        strategy=strategy if strategy in STRATEGIES else defaults.strategy,
+        keep_last=max(int(settings.get("keep_last", defaults.keep_last)), 1),
+        elide_tool_results=bool(settings.get("elide_tool_results", defaults.elide_tool_results)),
+        keep_tool_results=max(int(settings.get("keep_tool_results", defaults.keep_tool_results)), 0),
+        output_reserve=max(int(settings.get("output_reserve", defaults.output_reserve)), 0),
+        drop_step=max(int(settings.get("drop_step", defaults.drop_step)), 1),
+    )
+
+
+def model_window(app_handle: Any, provider: str, model_id: str) -> int:
+    """Context window from the model's settings (`contextWindow`), else a provider default."""
+    with db.db_session(app_handle) as sess:
+        record = db.get_model_record(sess, provider, model_id)
+    window = (record.extra if record else {}).get("contextWindow")
+    if isinstance(window, (int, float)) and window > 0:
+        return int(window)
+    return DEFAULT_LOCAL_WINDOW if provider in _LOCAL_PROVIDERS else DEFAULT_REMOTE_WINDOW
+
+
+def count_message_tokens(msg: ChatMessage, model_used: Optional[str] = None) -> int:
+    """Tokens a message contributes to the request (for messages without a cached count)."""
+    content = msg.content if isinstance(msg.content, str) else [b.model_dump(exclude_none=True) for b in msg.content]
+    return token_counter.count_message_tokens(msg.role, content, model_used)
+
+
+def agent_overhead_tokens(agent: Any) -> int:
+    """Tokens the agent adds to every request (instructions, conversation summary and tool schemas)."""
+    instructions = getattr(agent, "instructions", None) or []
+    if isinstance(instructions, str):
+        instructions = [instructions]
+    text = "\n".join(str(i) for i in instructions if not callable(i))
+    additional = getattr(agent, "additional_context", None)
+    if isinstance(additional, str):
+        text += "\n" + additional
+    return token_counter.count_text_tokens(text) + len(getattr(agent, "tools", None) or []) * TOOL_SCHEMA_TOKENS
+
+
+def _elide_tool_results(msg: ChatMessage) -> Optional[ChatMessage]:
+    """Copy of an assistant message with large tool results stubbed (None if nothing to elide)."""
+    if msg.role != "assistant" or isinstance(msg.content, str):
+        return None
+    blocks = []
+    changed = False
+    for block in msg.content:
+        result = block.toolResult
+        if block.type == "tool_call" and result and len(str(result)) >= ELIDE_MIN_CHARS:
+            stub = f"[{block.toolName or 'tool'} result elided: {len(str(result))} chars]"
+            block = block.model_copy(update={"toolResult": stub})
+            changed = True
+        blocks.append(block)
+    return msg.model_copy(update={"content": blocks}) if changed else None
+
+
+def assemble_context(
+    messages: List[ChatMessage],
+    window: int,
+    policy: ContextPolicy,
+    overhead_tokens: int = 0,
+    known_counts: Optional[Dict[str, int]] = None,
+    model_used: Optional[str] = None,
+) -> AssembledContext:
+    """
+    Fit a message path into a model's context window.
+
+    Args:
+        messages: Message path, oldest first (the last one is always kept)
+        window: Model context window in tokens
+        policy: Trimming policy
+        overhead_tokens: Tokens used by instructions and tool schemas
+        known_counts: Cached per-message token counts by message id
+        model_used: "provider:model_id" for counting messages without a cached count
+
+    Returns:
+        AssembledContext with the messages to send and what was dropped or elided
+    """
+    # The reply reserve never takes more than half the window
+    budget = max(window - min(policy.output_reserve, window // 2) - overhead_tokens, 0)
+    kept = list(messages)
+    dropped: List[str] = []
+    if policy.strategy == "keep_last_n" and len(kept) > policy.keep_last:
+        dropped = [m.id for m in kept[:-policy.keep_last]]
+        kept = kept[-policy.keep_last:]
+        while len(kept) > 1 and kept[0].role != "user":
+            dropped.append(kept.pop(0).id)
+
+    known_counts = known_counts or {}
+    counts = [known_counts.get(m.id) or count_message_tokens(m, model_used) for m in kept]
+    total = sum(counts)
+    elided: List[str] = []
+    if policy.strategy == "none" or total <= budget:
+        return AssembledContext(kept, total, budget, window, dropped, elided)
+
+    if policy.elide_tool_results:
+        assistant_turns = [i for i, m in enumerate(kept) if m.role == "assistant"]
+        protected = set(assistant_turns[-policy.keep_tool_results:]) if policy.keep_tool_results else set()
+        for i in assistant_turns:
+            if total <= budget:
+                break
+            if i in protected:
+                continue
+            slim = _elide_tool_results(kept[i])
+            if slim is not None:
+                kept[i] = slim
+                new_count = count_message_tokens(slim, model_used)
+                total += new_count - counts[i]
+                counts[i] = new_count
+                elided.append(slim.id)
+
+    # Drop from the front; the remainder must still start with a user turn
+    start, remaining = 0, total
+    while start < len(kept) - 1 and remaining > budget:
+        remaining -= counts[start]
+        start += 1
+    if policy.strategy == "drop_oldest" and start:
+        # Round up to a fixed step so the cut (and the cached prefix after it) holds across turns
+        start = min(-(-start // policy.drop_step) * policy.drop_step, len(kept) - 1)
+    while start < len(kept) - 1 and kept[start].role != "user":
+        start += 1
+    total -= sum(counts[:start])
+    dropped.extend(m.id for m in kept[:start])
+    kept = kept[start:]
+    elided = [i for i in elided if i not in dropped]
+    return AssembledContext(kept, total, budget, window, dropped, elided)
+
+
+def assemble_for_run(
+    app_handle: Any,
+    agent: Any,
+    messages: List[ChatMessage],
+    chat_id: Optional[str],
+    provider: Optional[str],
+    model_id: Optional[str],
+) -> AssembledContext:
+    """Assemble a chat's message path for one run of `agent` on provider/model_id."""
+    policy = get_context_policy(app_handle, chat_id)
+    window = model_window(app_handle, provider, model_id) if provider and model_id else DEFAULT_REMOTE_WINDOW
+    with db.db_session(app_handle) as sess:
+        known_counts = db.get_message_token_counts(sess, [m.id for m in messages])
+    model_used = f"{provider}:{model_id}" if provider and model_id else None
+    context = assemble_context(
+        messages, window, policy, agent_overhead_tokens(agent), known_counts=known_counts, model_used=model_used
+    )
+    if context.trimmed:
+        print(
+            f"[context] Dropped {len(context.dropped)} messages, elided {len(context.elided)} tool results "
+            f"({context.tokens}/{context.budget} tokens, window {window})"
+        )
+    return context
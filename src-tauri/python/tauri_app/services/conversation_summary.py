@@ -0,0 +1,298 @@
+"""
+Rolling conversation summaries keyed by message-path prefix.
+
+Once a chat's active path crosses `threshold_tokens`, its older turns are
+condensed in the background. Each summary covers a prefix of the path and
+is stored under a hash chain of that prefix's message ids and contents, so
+retries, edits and sibling branches that share the prefix find the same
+summary. Boundaries fall on multiples of `chunk_messages` (moved back to the
+nearest user turn), which keeps them stable as the chat grows; each new
+summary is built from the previous one plus the turns since, never from the
+whole history.
+
+When a stream starts, the longest cached prefix of its path is replaced by
+the summary, which the agent factory injects as additional context.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pytauri import AppHandle
+from agno.agent import Agent
+
+from .. import db
+from .rate_limiter import Priority, get_rate_limiter, provider_limits
+from .token_counter import count_message_tokens, count_text_tokens
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Given the existing summary (if any) and the next turns, write an updated summary that keeps "
+    "every fact, decision, requirement, open question, name, number and code identifier the "
+    "conversation may rely on later. Write in the third person, use terse bullet points grouped "
+    "by topic, and do not add commentary. Return only the summary."
+)
+# Tool results are clipped in the transcript the summarizer sees
+_TOOL_RESULT_CHARS = 500
+
+_running: Set[str] = set()
+_background: Set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class SummaryPolicy:
+    enabled: bool = True
+    threshold_tokens: int = 24_000
+    keep_recent: int = 12
+    chunk_messages: int = 20
+    step_tokens: int = 16_000
+    provider: Optional[str] = None
+    model_id: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class PrefixSummary:
+    """A cached summary applicable to the current path."""
+    text: str
+    message_ids: Tuple[str, ...]
+    covered_tokens: int
+    summary_tokens: int
+
+
+def get_summary_policy(app_handle: AppHandle) -> SummaryPolicy:
+    """Summary policy from the `summaries` general setting."""
+    with db.db_session(app_handle) as sess:
+        settings: Dict[str, Any] = db.get_general_settings(sess).get("summaries") or {}
+    defaults = SummaryPolicy()
+    return SummaryPolicy(
+        enabled=bool(settings.get("enabled", defaults.enabled)),
+        threshold_tokens=int(settings.get("threshold_tokens", defaults.threshold_tokens)),
+        keep_recent=max(int(settings.get("keep_recent", defaults.keep_recent)), 2),
+        chunk_messages=max(int(settings.get("chunk_messages", defaults.chunk_messages)), 2),
+        step_tokens=max(int(settings.get("step_tokens", defaults.step_tokens)), 1000),
+        provider=settings.get("provider") or None,
+        model_id=settings.get("model_id") or None,
+    )
+
+
+# Prefixes
+
+
+def prefix_hashes(rows: List[Any]) -> List[str]:
+    """hashes[i] identifies the prefix rows[:i + 1] (its ids and contents, in order)."""
+    hashes: List[str] = []
+    digest = ""
+    for row in rows:
+        content_hash = hashlib.sha1((row.content or "").encode("utf-8")).hexdigest()
+        digest = hashlib.sha1(f"{digest}\x00{row.id}\x00{content_hash}".encode("utf-8")).hexdigest()
+        hashes.append(digest)
+    return hashes
+
+
+def summary_boundaries(rows: List[Any], policy: SummaryPolicy) -> List[int]:
+    """
+    Prefix lengths a summary may cover, ascending.
+
+    Each is a multiple of chunk_messages moved back so the first unsummarized
+    message is a user turn; the last keep_recent messages and anything from the
+    first incomplete message on are never covered.
+    """
+    limit = len(rows) - policy.keep_recent
+    for i, row in enumerate(rows):
+        if not row.is_complete:
+            limit = min(limit, i)
+            break
+    boundaries: List[int] = []
+    for b in range(policy.chunk_messages, limit + 1, policy.chunk_messages):
+        while b > 0 and rows[b].role != "user":
+            b -= 1
+        if b > 0 and (not boundaries or b > boundaries[-1]):
+            boundaries.append(b)
+    return boundaries
+
+
+def _row_tokens(row: Any) -> int:
+    return row.token_count if row.token_count is not None else count_message_tokens(row.role, row.content)
+
+
+def _load_path(app_handle: AppHandle, leaf_id: str) -> List[Any]:
+    with db.db_session(app_handle) as sess:
+        return db.get_path_token_rows(sess, leaf_id)
+
+
+def find_summary(app_handle: AppHandle, chat_id: str, leaf_id: str) -> Optional[PrefixSummary]:
+    """
+    Longest cached summary covering a prefix of the path ending at `leaf_id`.
+
+    Args:
+        app_handle: Tauri app handle
+        chat_id: Chat the path belongs to
+        leaf_id: Last message of the path (the assistant message being streamed)
+
+    Returns:
+        PrefixSummary, or None if no prefix of this path has been summarized
+    """
+    with db.db_session(app_handle) as sess:
+        if not db.has_conversation_summaries(sess, chat_id):
+            return None
+        rows = db.get_path_token_rows(sess, leaf_id)
+        hashes = prefix_hashes(rows)
+        # Only prefixes followed by a user turn can be summary boundaries
+        candidates = [hashes[i] for i in range(len(rows) - 1) if rows[i + 1].role == "user"]
+        cached = db.get_conversation_summaries(sess, candidates)
+        if not cached:
+            return None
+        best = max(cached.values(), key=lambda s: s.message_count)
+        return PrefixSummary(
+            text=best.summary,
+            message_ids=tuple(row.id for row in rows[:best.message_count]),
+            covered_tokens=best.covered_tokens,
+            summary_tokens=best.summary_tokens,
+        )
+
+
+# Generation
+
+
+def _render_transcript(rows: List[Any]) -> str:
+    """Plain-text transcript of stored messages (reasoning and errors left out)."""
+    lines = []
+    for row in rows:
+        content: Any = row.content or ""
+        if isinstance(content, str) and content.strip().startswith("["):
+            try:
+                content = json.loads(content)
+            except ValueError:
+                pass
+        if isinstance(content, list):
+            parts = []
+            for block in content:
+                if not isinstance(block, dict):
+                    continue
+                if block.get("type") == "text" and block.get("content"):
+                    parts.append(block["content"])
+                elif block.get("type") == "tool_call":
+                    result = str(block.get("toolResult") or "")[:_TOOL_RESULT_CHARS]
+                    parts.append(f"[tool {block.get('toolName')}({json.dumps(block.get('toolArgs') or {})}) -> {result}]")
+            content = "\n".join(parts)
+        lines.append(f"{row.role.capitalize()}: {content}")
+    return "\n\n".join(lines)
+
+
+def _summary_model(app_handle: AppHandle, chat_id: str, policy: SummaryPolicy) -> Tuple[str, str]:
+    if policy.provider and policy.model_id:
+        return policy.provider, policy.model_id
+    with db.db_session(app_handle) as sess:
+        config = db.get_chat_agent_config(sess, chat_id) or db.get_default_agent_config()
+    return config.get("provider", "openai"), config.get("model_id", "gpt-4o-mini")
+
+
+async def _summarize(
+    app_handle: AppHandle,
+    provider: str,
+    model_id: str,
+    previous: Optional[str],
+    rows: List[Any],
+) -> str:
+    from .model_factory import get_model
+
+    agent = Agent(
+        model=get_model(provider, model_id, app_handle),
+        instructions=[SUMMARY_INSTRUCTIONS],
+        tools=[],
+        stream=False,
+    )
+    prompt = f"Existing summary:\n{previous}\n\n" if previous else ""
+    prompt += f"Next turns:\n{_render_transcript(rows)}"
+    limits = await asyncio.to_thread(provider_limits, app_handle, provider)
+    async with get_rate_limiter().slot(
+        provider, limits, Priority.BACKGROUND, tokens=count_text_tokens(prompt)
+    ) as lease:
+        response = await agent.arun(input=prompt)
+        metrics = getattr(response, "metrics", None)
+        lease.settle(getattr(metrics, "total_tokens", None))
+    text = str(getattr(response, "content", "") or "").strip()
+    if not text:
+        raise RuntimeError("summarizer returned no content")
+    return text
+
+
+async def update_summaries(app_handle: AppHandle, chat_id: str, leaf_id: str) -> int:
+    """
+    Summarize the path ending at `leaf_id` up to its last boundary, if it crossed the threshold.
+
+    Args:
+        app_handle: Tauri app handle
+        chat_id: Chat identifier
+        leaf_id: Last message of the path
+
+    Returns:
+        Number of summaries produced
+    """
+    policy = await asyncio.to_thread(get_summary_policy, app_handle)
+    if not policy.enabled or chat_id in _running:
+        return 0
+    _running.add(chat_id)
+    try:
+        rows = await asyncio.to_thread(_load_path, app_handle, leaf_id)
+        tokens = [_row_tokens(row) for row in rows]
+        boundaries = summary_boundaries(rows, policy)
+        if sum(tokens) < policy.threshold_tokens or not boundaries:
+            return 0
+
+        hashes = prefix_hashes(rows)
+        with db.db_session(app_handle) as sess:
+            found = db.get_conversation_summaries(sess, [hashes[b - 1] for b in boundaries])
+            cached = {prefix: row.summary for prefix, row in found.items()}
+        if hashes[boundaries[-1] - 1] in cached:
+            return 0
+
+        # Roll forward from the longest boundary already summarized
+        start, previous = 0, None
+        for b in boundaries:
+            if hashes[b - 1] in cached:
+                start, previous = b, cached[hashes[b - 1]]
+
+        provider, model_id = await asyncio.to_thread(_summary_model, app_handle, chat_id, policy)
+        created = 0
+        step_start = start
+        for b in (b for b in boundaries if b > start):
+            # Group chunks so catching up on a long chat takes a few calls, not one per chunk
+            if sum(tokens[step_start:b]) < policy.step_tokens and b != boundaries[-1]:
+                continue
+            previous = await _summarize(app_handle, provider, model_id, previous, rows[step_start:b])
+            with db.db_session(app_handle) as sess:
+                db.save_conversation_summary(
+                    sess,
+                    prefix_hash=hashes[b - 1],
+                    chat_id=chat_id,
+                    last_message_id=rows[b - 1].id,
+                    message_count=b,
+                    covered_tokens=sum(tokens[:b]),
+                    summary=previous,
+                    summary_tokens=count_text_tokens(previous, f"{provider}:{model_id}"),
+                    model_used=f"{provider}:{model_id}",
+                )
+            created += 1
+            step_start = b
+        print(f"[summary] Chat {chat_id}: summarized {boundaries[-1]} of {len(rows)} messages in {created} step(s)")
+        return created
+    finally:
+        _running.discard(chat_id)
+
+
+def summarize_in_background(app_handle: AppHandle, chat_id: str, leaf_id: str) -> None:
+    """Fire-and-forget update_summaries on the running loop (after a reply completes)."""
+
+    async def run() -> None:
+        try:
+            await update_summaries(app_handle, chat_id, leaf_id)
+        except Exception as e:
+            print(f"[summary] Failed to summarize chat {chat_id}: {e}")
+
+    task = asyncio.ensure_future(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
@@ -0,0 +1,237 @@
+"""
+Latency hedging for first tokens.
+
+A chat's agent config may carry a hedge policy:
+
+    "hedge": {"provider": "groq", "model_id": "llama-3.1-8b-instant", "after_ms": 1500}
+
+If the primary model hasn't produced its first token within `after_ms`, the
+same request is started on the fallback model. Whichever produces a first
+token first is streamed into the assistant message and the other run is
+cancelled. The fallback run takes its own provider's rate-limiter slot. Wins and first-token latencies are recorded so thresholds can be
+tuned from real p95s.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from agno.agent import Agent, RunEvent
+
+from .model_pool import get_model_pool
+
+# Events that carry the model's first output
+FIRST_TOKEN_EVENTS = (RunEvent.run_content, RunEvent.reasoning_step, RunEvent.tool_call_started)
+# Events after which a run produces nothing more
+_TERMINAL_EVENTS = (RunEvent.run_completed, RunEvent.run_error, RunEvent.run_cancelled)
+
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    provider: str
+    model_id: str
+    after_ms: int = 1500
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider}:{self.model_id}"
+
+
+def parse_hedge_policy(config: Optional[Dict[str, Any]]) -> Optional[HedgePolicy]:
+    """Hedge policy from a chat's agent config (None if absent or incomplete)."""
+    hedge = (config or {}).get("hedge")
+    if not isinstance(hedge, dict) or not hedge.get("provider") or not hedge.get("model_id"):
+        return None
+    return HedgePolicy(
+        provider=hedge["provider"],
+        model_id=hedge["model_id"],
+        after_ms=max(int(hedge.get("after_ms", 1500)), 0),
+    )
+
+
+class _Run:
+    """One agent run pumped into a queue, so two runs can be raced on their first token."""
+
+    def __init__(
+        self, label: str, agent: Agent, messages: List[Any], slot: Optional[AsyncContextManager[Any]] = None
+    ) -> None:
+        self.label = label
+        self.agent = agent
+        self.lease: Any = None  # from `slot`, held until the run ends
+        self.run_id: Optional[str] = None
+        self.got_token = False
+        self.first_output = asyncio.Event()  # first token, or the run ended without one
+        self.started = time.perf_counter()
+        self.first_token_s: Optional[float] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._pump(messages, slot))
+
+    async def _pump(self, messages: List[Any], slot: Optional[AsyncContextManager[Any]]) -> None:
+        try:
+            if slot is None:
+                await self._stream(messages)
+            else:
+                async with slot as lease:
+                    self.lease = lease
+                    await self._stream(messages)
+        except Exception as e:
+            self._queue.put_nowait(e)
+        finally:
+            self._queue.put_nowait(_DONE)
+            self.first_output.set()
+
+    async def _stream(self, messages: List[Any]) -> None:
+        async for chunk in self.agent.arun(input=messages, stream=True, stream_events=True):
+            if not self.run_id and getattr(chunk, "run_id", None):
+                self.run_id = chunk.run_id
+            if not self.got_token and chunk.event in FIRST_TOKEN_EVENTS:
+                self.got_token = True
+                self.first_token_s = time.perf_counter() - self.started
+                self.first_output.set()
+            elif chunk.event in _TERMINAL_EVENTS:
+                self.first_output.set()
+            self._queue.put_nowait(chunk)
+
+    async def chunks(self) -> AsyncIterator[Any]:
+        while True:
+            item = await self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def cancel(self) -> None:
+        if self.run_id:
+            try:
+                self.agent.cancel_run(self.run_id)
+            except Exception as e:
+                print(f"[hedge] Failed to cancel {self.label} run: {e}")
+        self._task.cancel()
+        get_model_pool().release(self.agent.model)
+
+
+class HedgeStats:
+    """Win counts per path and recent first-token latencies per path."""
+
+    def __init__(self, window: int = 500) -> None:
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.hedged = 0
+        self.wins: Dict[str, int] = {"primary": 0, "fallback": 0}
+        self._ttft: Dict[str, Deque[float]] = {
+            "primary": deque(maxlen=window),
+            "fallback": deque(maxlen=window),
+        }
+
+    def record(self, hedged: bool, winner: str, ttft: Dict[str, Optional[float]]) -> None:
+        with self._lock:
+            self.runs += 1
+            self.hedged += int(hedged)
+            self.wins[winner] += 1
+            for path, seconds in ttft.items():
+                if seconds is not None:
+                    self._ttft[path].append(seconds)
+
+    @staticmethod
+    def _percentile(samples: Deque[float], q: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "hedged": self.hedged,
+                "wins": dict(self.wins),
+                **{
+                    f"{path}TtftP{int(q * 100)}Ms": self._percentile(samples, q)
+                    for path, samples in self._ttft.items()
+                    for q in (0.5, 0.95)
+                },
+            }
+
+
+# Global singleton
+_hedge_stats: Optional[HedgeStats] = None
+
+
+def get_hedge_stats() -> HedgeStats:
+    """Get the global hedge statistics instance."""
+    global _hedge_stats
+    if _hedge_stats is None:
+        _hedge_stats = HedgeStats()
+    return _hedge_stats
+
+
+async def hedged_run(
+    primary: Agent,
+    messages: List[Any],
+    policy: HedgePolicy,
+    make_fallback: Callable[[], Agent],
+    fallback_slot: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+) -> Tuple[Agent, str, AsyncIterator[Any], Any]:
+    """
+    Start `primary`, and the fallback too if the primary is slow to its first token.
+
+    Args:
+        primary: Agent for the chat's configured model
+        messages: Agno input messages
+        policy: Hedge policy from the chat config
+        make_fallback: Builds the fallback agent (only called when hedging)
+        fallback_slot: Rate-limiter slot the fallback run waits for and holds while it runs
+
+    Returns:
+        (winning agent, "primary" or "fallback", its chunk stream, the fallback's
+        lease if it won, else None; the primary's slot is the caller's)
+    """
+    first = _Run("primary", primary, messages)
+    runs = [first]
+    try:
+        await asyncio.wait_for(first.first_output.wait(), policy.after_ms / 1000)
+    except asyncio.TimeoutError:
+        try:
+            slot = fallback_slot() if fallback_slot else None
+            runs.append(_Run("fallback", make_fallback(), messages, slot))
+            print(f"[hedge] No first token after {policy.after_ms}ms, also trying {policy.label}")
+        except Exception as e:
+            print(f"[hedge] Could not start fallback {policy.label}: {e}")
+
+    winner = await _first_token(runs)
+    for run in runs:
+        if run is not winner:
+            run.cancel()
+
+    get_hedge_stats().record(
+        hedged=len(runs) > 1,
+        winner=winner.label,
+        ttft={run.label: run.first_token_s for run in runs},
+    )
+    if len(runs) > 1:
+        print(f"[hedge] {winner.label} won")
+    return winner.agent, winner.label, winner.chunks(), winner.lease
+
+
+async def _first_token(runs: List[_Run]) -> _Run:
+    """First run to produce a token; a run that ends without one only wins if all do."""
+    pending = list(runs)
+    while pending:
+        waiters = {asyncio.ensure_future(run.first_output.wait()): run for run in pending}
+        done, not_done = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in not_done:
+            waiter.cancel()
+        finished = [waiters[w] for w in done]
+        # Prefer the primary on a tie
+        for run in sorted(finished, key=runs.index):
+            if run.got_token:
+                return run
+        pending = [run for run in pending if run not in finished]
+    return runs[0]
@@ -0,0 +1,163 @@
+"""
+Startup and import timing.
+
+Startup phases and on-demand provider SDK imports are always timed (both are
+cheap to measure). With IMPORT_TIMING=1 an import hook additionally records
+the self time of every module imported during startup, summed per top-level
+package, which is the per-import breakdown `python -X importtime` gives but
+available from inside the running app.
+"""
+from __future__ import annotations
+
+import importlib
+import importlib.abc
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from os import getenv
+from types import ModuleType
+from typing import Any, Dict, Iterator, List, Optional
+
+IMPORT_TIMING = getenv("IMPORT_TIMING") == "1"
+
+_lock = threading.Lock()
+_phases: Dict[str, float] = {}
+_lazy_imports: Dict[str, float] = {}
+# top-level package -> summed self time of its modules
+_package_self_s: Dict[str, float] = {}
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a named startup phase."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phases[name] = _phases.get(name, 0.0) + time.perf_counter() - started
+
+
+def timed_import(module_name: str) -> ModuleType:
+    """Import a module on demand, recording how long the first import took."""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - started
+    with _lock:
+        _lazy_imports[module_name] = elapsed
+    print(f"[startup] Imported {module_name} on first use in {elapsed * 1000:.0f}ms")
+    return module
+
+
+class _TimedLoader:
+    """Wraps a module's loader to time `exec_module`; everything else is delegated."""
+
+    def __init__(self, loader: Any, finder: "_ImportTimer") -> None:
+        self._loader = loader
+        self._finder = finder
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+    def create_module(self, spec: Any) -> Optional[ModuleType]:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        self._finder.enter()
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._finder.leave(module.__name__, time.perf_counter() - started)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path hook attributing import time to the module that spent it."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def _stack(self) -> List[float]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def enter(self) -> None:
+        # Time spent in nested imports is subtracted from the parent
+        self._stack().append(0.0)
+
+    def leave(self, name: str, elapsed: float) -> None:
+        stack = self._stack()
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        package = name.split(".", 1)[0]
+        with _lock:
+            _package_self_s[package] = _package_self_s.get(package, 0.0) + max(elapsed - children, 0.0)
+
+
+_timer: Optional[_ImportTimer] = None
+
+
+def install_import_timer() -> bool:
+    """Start per-package import timing if IMPORT_TIMING=1. Returns whether it is active."""
+    global _timer
+    if not IMPORT_TIMING or _timer is not None:
+        return _timer is not None
+    _timer = _ImportTimer()
+    sys.meta_path.insert(0, _timer)
+    return True
+
+
+def uninstall_import_timer() -> None:
+    """Stop the import hook (called once startup is over)."""
+    global _timer
+    if _timer is not None and _timer in sys.meta_path:
+        sys.meta_path.remove(_timer)
+    _timer = None
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def get_startup_report(top: int = 25) -> Dict[str, Any]:
+    """
+    Startup timing breakdown.
+
+    Returns:
+        Dict with `phases` (ms per startup phase), `lazyImports` (ms per module
+        imported on first use) and `packages` (the `top` slowest packages by
+        import self time; empty unless IMPORT_TIMING=1)
+    """
+    with _lock:
+        packages = sorted(_package_self_s.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        return {
+            "phases": {name: _ms(s) for name, s in _phases.items()},
+            "lazyImports": {name: _ms(s) for name, s in _lazy_imports.items()},
+            "packages": [{"package": name, "ms": _ms(s)} for name, s in packages],
+        }
+
+
+def print_startup_report() -> None:
+    report = get_startup_report(top=10)
+    phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in report["phases"].items())
+    print(f"[startup] {phases}")
+    if report["packages"]:
+        slowest = ", ".join(f"{p['package']} {p['ms']:.0f}ms" for p in report["packages"])
+        print(f"[startup] Slowest imports: {slowest}")
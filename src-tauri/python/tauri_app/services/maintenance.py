@@ -0,0 +1,116 @@
+"""
+Database maintenance jobs (archival, compaction, backups, ...) and their schedule.
+
+Each job reads its policy from general settings, so users can tune or
+disable it without a restart.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from pytauri import AppHandle
+
+from .. import db
+from ..db.backup import BackupProgress
+from .scheduler import get_scheduler
+from .token_counter import backfill_token_counts
+
+HOUR_S = 60 * 60
+DAY_S = 24 * HOUR_S
+
+
+def archive_cold_chats(app_handle: AppHandle, older_than_days: Optional[int] = None) -> int:
+    """
+    Move chats untouched for N days into archive.db, then vacuum the hot DB.
+
+    Args:
+        app_handle: Tauri app handle
+        older_than_days: Override the configured threshold (forces a run even if disabled)
+
+    Returns:
+        Number of chats archived
+    """
+    with db.db_session(app_handle) as sess:
+        policy = db.get_general_settings(sess).get("archive", {})
+        if older_than_days is None:
+            if not policy.get("enabled", True):
+                return 0
+            older_than_days = int(policy.get("after_days", 90))
+        archived = db.archive_cold_chats(sess, older_than_days=older_than_days)
+
+    if archived:
+        print(f"[maintenance] Archived {len(archived)} chats untouched for {older_than_days}+ days")
+        db.incremental_vacuum()
+    return len(archived)
+
+
+def compact_branches(app_handle: AppHandle, force: bool = False) -> Dict[str, int]:
+    """
+    Prune dead placeholders, surplus sibling branches and orphaned messages.
+
+    Args:
+        app_handle: Tauri app handle
+        force: Run even if compaction is disabled
+
+    Returns:
+        Per-category counts and total rows deleted (empty if skipped)
+    """
+    with db.db_session(app_handle) as sess:
+        policy = db.get_general_settings(sess).get("compaction", {})
+        if not force and not policy.get("enabled", True):
+            return {}
+        stats = db.compact_branches(
+            sess,
+            placeholder_grace_minutes=int(policy.get("placeholder_grace_minutes", 60)),
+            keep_siblings=int(policy.get("keep_siblings", 5)),
+            sibling_min_age_days=int(policy.get("sibling_min_age_days", 7)),
+        )
+
+    if stats.get("deleted"):
+        print(f"[maintenance] Compacted branches: {stats}")
+        db.incremental_vacuum()
+    return stats
+
+
+def snapshot_database(
+    app_handle: AppHandle,
+    force: bool = False,
+    progress: Optional[BackupProgress] = None,
+) -> Optional[Path]:
+    """
+    Take an online backup if the last one is older than the configured interval.
+
+    Args:
+        app_handle: Tauri app handle
+        force: Back up now regardless of the policy
+        progress: Optional callback receiving (schema, remaining, total) pages
+
+    Returns:
+        Path of the new snapshot, or None if no backup was due
+    """
+    with db.db_session(app_handle) as sess:
+        policy = db.get_general_settings(sess).get("backup", {})
+    if not force:
+        if not policy.get("enabled", True):
+            return None
+        last = db.last_backup_time(app_handle)
+        interval = timedelta(hours=float(policy.get("interval_hours", 24)))
+        if last and datetime.utcnow() - last < interval:
+            return None
+
+    snapshot = db.backup_database(app_handle, keep=int(policy.get("keep", 7)), progress=progress)
+    print(f"[maintenance] Backed up database to {snapshot}")
+    return snapshot
+
+
+def start_maintenance_jobs(app_handle: AppHandle) -> None:
+    """Register periodic maintenance jobs. Safe to call more than once."""
+    scheduler = get_scheduler()
+    scheduler.every("archive", DAY_S, lambda: archive_cold_chats(app_handle), initial_delay_s=60)
+    scheduler.every("compaction", DAY_S, lambda: compact_branches(app_handle), initial_delay_s=90)
+    # Counts messages saved before token counting existed (or by older code paths)
+    scheduler.every("token_counts", HOUR_S, lambda: backfill_token_counts(app_handle), initial_delay_s=30)
+    # Checked hourly so interval changes apply without a restart
+    scheduler.every("backup", HOUR_S, lambda: snapshot_database(app_handle), initial_delay_s=120)
@@ -0,0 +1,243 @@
+"""
+Model Catalog: persisted provider model listings with stale-while-revalidate.
+
+Discovered models live in the `models` table with a fetch timestamp, so the
+model selector reads them straight from the settings cache. Providers whose
+listing is older than their TTL are refreshed in the background, and
+subscribers are notified when a provider's catalog actually changes.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .. import db
+from .model_factory import DISCOVERY_TIMEOUT_S, fetch_with_deadline, to_model_infos
+
+# provider, models (ModelInfo dicts) -> None
+CatalogListener = Callable[[str, List[Dict[str, Any]]], None]
+
+# Local servers change as models are pulled; cloud listings rarely do
+_LOCAL_PROVIDERS = ("ollama", "lmstudio", "vllm")
+LOCAL_TTL_S = 5 * 60
+REMOTE_TTL_S = 6 * 60 * 60
+# Minimum gap between attempts for a provider whose fetch failed or came back empty
+RETRY_AFTER_S = 60
+
+
+def catalog_ttl(provider: str, config: Dict[str, Any]) -> float:
+    """TTL for a provider's listing; `catalogTtlMinutes` in provider extra overrides it."""
+    extra = config.get("extra") or {}
+    if isinstance(extra, str):
+        # Provider settings dicts carry extra as the raw JSON string
+        try:
+            extra = json.loads(extra)
+        except ValueError:
+            extra = {}
+    minutes = extra.get("catalogTtlMinutes") if isinstance(extra, dict) else None
+    # Only a positive number overrides; anything else falls back to the default
+    if isinstance(minutes, (int, float)) and not isinstance(minutes, bool) and 0 < minutes < math.inf:
+        return float(minutes) * 60
+    return LOCAL_TTL_S if provider in _LOCAL_PROVIDERS else REMOTE_TTL_S
+
+
+class ModelCatalog:
+    """Cached model catalog with background refresh and change notification."""
+
+    def __init__(self) -> None:
+        self._listeners: Dict[int, CatalogListener] = {}
+        self._listener_ids = itertools.count(1)
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # Network fill of an empty catalog, shared by every caller waiting on it
+        self._first_fill: Optional[asyncio.Future] = None
+        # provider -> monotonic time of the last fetch attempt
+        self._attempts: Dict[str, float] = {}
+        self.refreshes = 0
+        self.changes = 0
+
+    # Reads
+
+    def _load(self, app_handle: Any) -> tuple[Dict[str, Dict[str, Any]], Dict[str, List[db.ModelRecord]]]:
+        with db.db_session(app_handle) as sess:
+            providers = db.get_all_provider_settings(sess)
+            records = db.get_catalog_records(sess)
+        by_provider: Dict[str, List[db.ModelRecord]] = {}
+        for record in records:
+            by_provider.setdefault(record.provider, []).append(record)
+        return providers, by_provider
+
+    def _is_stale(self, provider: str, config: Dict[str, Any], records: List[db.ModelRecord]) -> bool:
+        attempted = self._attempts.get(provider)
+        if attempted is not None and time.monotonic() - attempted < RETRY_AFTER_S:
+            return False
+        if not records:
+            return True
+        fetched = max(r.fetched_at for r in records)
+        try:
+            age = datetime.utcnow() - datetime.fromisoformat(fetched)
+        except ValueError:
+            return True
+        return age > timedelta(seconds=catalog_ttl(provider, config))
+
+    async def get_models(self, app_handle: Any) -> List[Dict[str, Any]]:
+        """
+        Return the cached catalog immediately, refreshing stale providers in the background.
+
+        Args:
+            app_handle: Tauri app handle
+
+        Returns:
+            Model info dicts (provider, modelId, displayName, isDefault) in provider order
+        """
+        models, stale = self._collect(*await asyncio.to_thread(self._load, app_handle))
+        if stale and not models:
+            # Nothing cached yet (first run): wait for the network once; concurrent
+            # callers await the same fill rather than starting their own
+            if self._first_fill is None or self._first_fill.done():
+                self._first_fill = asyncio.ensure_future(self.refresh(app_handle, stale))
+            await asyncio.shield(self._first_fill)
+            models, stale = self._collect(*await asyncio.to_thread(self._load, app_handle))
+        if stale:
+            self.refresh_in_background(app_handle, stale)
+        if models:
+            models[0]["isDefault"] = True
+        return models
+
+    def _collect(
+        self, providers: Dict[str, Dict[str, Any]], by_provider: Dict[str, List[db.ModelRecord]]
+    ) -> tuple[List[Dict[str, Any]], List[str]]:
+        """Model infos of enabled providers, and the providers due for a refresh."""
+        models: List[Dict[str, Any]] = []
+        stale = []
+        for provider, config in providers.items():
+            if not config.get("enabled", True):
+                continue
+            records = by_provider.get(provider, [])
+            models.extend(_to_infos(provider, records))
+            if self._is_stale(provider, config, records):
+                stale.append(provider)
+        return models, stale
+
+    # Refresh
+
+    def refresh_in_background(self, app_handle: Any, providers: Optional[List[str]] = None) -> None:
+        """Schedule a refresh on the running loop (no-op for providers already refreshing)."""
+        task = asyncio.ensure_future(self.refresh(app_handle, providers))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def refresh(
+        self,
+        app_handle: Any,
+        providers: Optional[List[str]] = None,
+        on_provider: Optional[Callable[[str, List[Dict[str, Any]], Optional[str]], None]] = None,
+        timeout: float = DISCOVERY_TIMEOUT_S,
+    ) -> None:
+        """
+        Fetch providers concurrently and persist each listing as it arrives.
+
+        Args:
+            app_handle: Tauri app handle
+            providers: Providers to refresh (default: every enabled provider)
+            on_provider: Optional callback receiving (provider, models, error) per provider
+            timeout: Per-provider deadline in seconds
+        """
+        configs, _ = await asyncio.to_thread(self._load, app_handle)
+        targets = [
+            p for p, config in configs.items()
+            if config.get("enabled", True) and (providers is None or p in providers) and p not in self._refreshing
+        ]
+        if not targets:
+            return
+
+        self._refreshing.update(targets)
+        tasks = [
+            asyncio.ensure_future(fetch_with_deadline(p, configs[p], timeout))
+            for p in targets
+        ]
+        # Listings are streamed as they arrive but written in one transaction
+        listings: Dict[str, List[Dict[str, Any]]] = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                provider, provider_models, error = await next_done
+                self._attempts[provider] = time.monotonic()
+                self.refreshes += 1
+                # An empty answer (e.g. a local server with nothing pulled) keeps the old listing
+                if not error and provider_models:
+                    listings[provider] = provider_models
+                if on_provider:
+                    on_provider(provider, to_model_infos(provider, provider_models), error)
+        finally:
+            self._refreshing.difference_update(targets)
+            for task in tasks:
+                task.cancel()
+        if listings:
+            await asyncio.to_thread(self._store, app_handle, listings)
+
+    def _store(self, app_handle: Any, listings: Dict[str, List[Dict[str, Any]]]) -> None:
+        with db.db_session(app_handle) as sess:
+            changed = db.bulk_upsert_model_metadata(
+                sess,
+                listings,
+                fetched_at=datetime.utcnow().isoformat(),
+            )
+        for provider in changed:
+            self.changes += 1
+            self._notify(provider, to_model_infos(provider, listings[provider]))
+
+    def invalidate(self, app_handle: Any, provider: str) -> None:
+        """Provider settings changed: drop its retry backoff and refetch now."""
+        self._attempts.pop(provider, None)
+        self.refresh_in_background(app_handle, [provider])
+
+    # Subscriptions
+
+    def subscribe(self, listener: CatalogListener) -> int:
+        subscription_id = next(self._listener_ids)
+        self._listeners[subscription_id] = listener
+        return subscription_id
+
+    def unsubscribe(self, subscription_id: int) -> bool:
+        return self._listeners.pop(subscription_id, None) is not None
+
+    def _notify(self, provider: str, models: List[Dict[str, Any]]) -> None:
+        for subscription_id, listener in list(self._listeners.items()):
+            try:
+                listener(provider, models)
+            except Exception as e:
+                # Closed windows leave dead channels behind
+                print(f"[ModelCatalog] Dropping subscriber {subscription_id}: {e}")
+                self._listeners.pop(subscription_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "refreshes": self.refreshes,
+            "changes": self.changes,
+            "refreshing": len(self._refreshing),
+            "subscribers": len(self._listeners),
+        }
+
+
+def _to_infos(provider: str, records: List[db.ModelRecord]) -> List[Dict[str, Any]]:
+    return to_model_infos(
+        provider,
+        [{"id": r.model_id, "name": r.display_name or r.model_id} for r in records],
+    )
+
+
+# Global singleton
+_model_catalog: Optional[ModelCatalog] = None
+
+
+def get_model_catalog() -> ModelCatalog:
+    """Get the global model catalog instance."""
+    global _model_catalog
+    if _model_catalog is None:
+        _model_catalog = ModelCatalog()
+    return _model_catalog
@@ -5,20 +5,16 @@ Provides abstraction layer to instantiate models from different providers
 (OpenAI, Anthropic, Groq, Ollama, vLLM, LM Studio, OpenAI-compatible) dynamically based on configuration.
 """
 from __future__ import annotations
-import json
-from typing import Any, Dict, Optional
-import requests
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional
 
-from .. import db
+import httpx
 
-from agno.models.openai import OpenAIChat
-from agno.models.openai.like import OpenAILike
-from agno.models.anthropic import Claude
-from agno.models.groq import Groq
-from agno.models.ollama import Ollama
-from agno.models.vllm import VLLM
-from agno.models.google import Gemini
-from agno.models.lmstudio import LMStudio
+from .. import db
+from .model_pool import credential_hash, get_model_pool, make_key
+from .prompt_cache import anthropic_cache_kwargs
+from .provider_registry import get_provider_registry
+from .rate_limiter import Priority, RateLimits, get_rate_limiter
 
 
 def get_model(provider: str, model_id: str, app_handle: Any = None, **kwargs: Any) -> Any:
@@ -38,54 +34,74 @@ def get_model(provider: str, model_id: str, app_handle: Any = None, **kwargs: An
         ValueError: If provider is not supported
         RuntimeError: If required API keys are missing
     """
-    provider = provider.lower().strip()
-    
-    if provider == "openai":
-        return _get_openai_model(model_id, app_handle, **kwargs)
-    elif provider == "anthropic":
-        return _get_anthropic_model(model_id, app_handle, **kwargs)
-    elif provider == "groq":
-        return _get_groq_model(model_id, app_handle, **kwargs)
-    elif provider == "ollama":
-        return _get_ollama_model(model_id, app_handle, **kwargs)
-    elif provider == "vllm":
-        return _get_vllm_model(model_id, app_handle, **kwargs)
-    elif provider == "lmstudio":
-        return _get_lmstudio_model(model_id, app_handle, **kwargs)
-    elif provider in ("google", "gemini", "google_ai_studio"):
-        return _get_google_model(model_id, app_handle, **kwargs)
-    elif provider in ("openai_like", "openai-compatible", "openai_compatible"):
-        return _get_openai_like_model(model_id, app_handle, **kwargs)
-    else:
+    name = get_provider_registry().resolve(provider)
+    if name not in _BUILDERS:
         raise ValueError(
             f"Unsupported provider: {provider}. "
-            f"Supported providers: openai, anthropic, groq, ollama, vllm, lmstudio, google, openai_like"
+            f"Supported providers: {', '.join(_BUILDERS)}"
         )
+    return _BUILDERS[name](model_id, app_handle, **kwargs)
 
 
-def _get_api_key_for_provider(provider: str, app_handle: Any = None) -> tuple[str | None, str | None]:
+def _model_class(provider: str) -> Any:
+    """Provider's agno model class; its SDK is imported on first use."""
+    return get_provider_registry().model_class(provider)
+
+
+def get_pooled_model(provider: str, model_id: str, app_handle: Any = None, **kwargs: Any) -> Any:
     """
-    Get API key and base URL for a provider from database.
-    
+    Like get_model, but reuses the provider's SDK client across requests.
+
+    Models are pooled by (provider, model_id, credential hash, base_url, kwargs),
+    so changed credentials always get a fresh client. Pass the model to
+    `get_model_pool().release()` after the request so a client it created is
+    kept for the next one.
+
+    Args:
+        provider: Model provider name (same values as get_model)
+        model_id: Specific model identifier
+        app_handle: Optional Tauri app handle for database access to get API keys
+        **kwargs: Additional model configuration (part of the pool key)
+
     Returns:
-        Tuple of (api_key, base_url)
+        Per-request model instance sharing the pooled client
     """
+    canonical = get_provider_registry().resolve(provider) or provider.lower().strip()
+    record = _get_provider_record(canonical, app_handle)
+    parts = [record.api_key, record.extra_raw] if record else []
+    if canonical == "google" and app_handle:
+        # Gemini bakes the model's reasoning flag into the instance
+        with db.db_session(app_handle) as sess:
+            model = db.get_model_record(sess, "google", model_id)
+        parts.append(bool(model and model.reasoning.get("supports", False)))
+    key = make_key(canonical, model_id, credential_hash(*parts), record.base_url if record else None, kwargs)
+    return get_model_pool().acquire(key, lambda: get_model(provider, model_id, app_handle, **kwargs))
+
+
+def _get_provider_record(provider: str, app_handle: Any = None) -> Optional[db.ProviderRecord]:
+    """Get cached provider settings (no DB round trip once the cache is warm)."""
     if not app_handle:
-        return None, None
-    
-    api_key = None
-    base_url = None
+        return None
     
     try:
         with db.db_session(app_handle) as sess:
-            settings = db.get_provider_settings(sess, provider)
-            if settings:
-                api_key = settings.get("api_key")
-                base_url = settings.get("base_url")
+            return db.get_provider_record(sess, provider)
     except Exception as e:
         print(f"[ModelFactory] Warning: Failed to check DB for {provider} settings: {e}")
+        return None
+
+
+def _get_api_key_for_provider(provider: str, app_handle: Any = None) -> tuple[str | None, str | None]:
+    """
+    Get API key and base URL for a provider from database.
     
-    return api_key, base_url
+    Returns:
+        Tuple of (api_key, base_url)
+    """
+    record = _get_provider_record(provider, app_handle)
+    if not record:
+        return None, None
+    return record.api_key, record.base_url
 
 
 def _get_openai_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> Any:
@@ -97,7 +113,7 @@ def _get_openai_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> A
             "OpenAI API key not found. Please configure it in Settings."
         )
     
-    return OpenAIChat(
+    return _model_class("openai")(
         id=model_id,
         api_key=api_key,
         base_url=base_url,
@@ -106,18 +122,20 @@ def _get_openai_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> A
 
 
 def _get_anthropic_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> Any:
-    """Create Anthropic Claude model instance."""
-    api_key, _ = _get_api_key_for_provider("anthropic", app_handle)
+    """Create Anthropic Claude model instance (with prompt caching unless disabled)."""
+    record = _get_provider_record("anthropic", app_handle)
+    api_key = record.api_key if record else None
     
     if not api_key:
         raise RuntimeError(
             "Anthropic API key not found. Please configure it in Settings."
         )
     
-    return Claude(
+    cache_kwargs = anthropic_cache_kwargs(record.extra)
+    return _model_class("anthropic")(
         id=model_id,
         api_key=api_key,
-        **kwargs
+        **{**cache_kwargs, **kwargs}
     )
 
 
@@ -130,7 +148,7 @@ def _get_groq_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> Any
             "Groq API key not found. Please configure it in Settings."
         )
     
-    return Groq(
+    return _model_class("groq")(
         id=model_id,
         api_key=api_key,
         **kwargs
@@ -146,7 +164,7 @@ def _get_ollama_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> A
             "Ollama host not configured. Please configure it in Settings."
         )
     
-    return Ollama(
+    return _model_class("ollama")(
         id=model_id,
         host=host,
         **kwargs
@@ -162,7 +180,7 @@ def _get_vllm_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> Any
             "vLLM base URL not configured. Please configure it in Settings."
         )
 
-    return VLLM(
+    return _model_class("vllm")(
         id=model_id,
         api_key=api_key,
         base_url=base_url,
@@ -179,7 +197,7 @@ def _get_lmstudio_model(model_id: str, app_handle: Any = None, **kwargs: Any) ->
             "LM Studio base URL not configured. Please configure it in Settings."
         )
 
-    return LMStudio(
+    return _model_class("lmstudio")(
         id=model_id,
         api_key=api_key,
         base_url=base_url,
@@ -196,7 +214,7 @@ def _get_openai_like_model(model_id: str, app_handle: Any = None, **kwargs: Any)
             "Please configure it in Settings."
         )
 
-    return OpenAILike(
+    return _model_class("openai_like")(
         id=model_id,
         api_key=api_key,
         base_url=base_url,
@@ -206,25 +224,18 @@ def _get_openai_like_model(model_id: str, app_handle: Any = None, **kwargs: Any)
 
 def _get_google_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> Any:
     """Create Google Gemini model instance (Google AI Studio or Vertex AI)."""
-    # Pull config from DB only
-    api_key, _ = _get_api_key_for_provider("google", app_handle)
-    
-    # Load 'extra' from DB if present (JSON string)
-    extra_raw = None
+    # Pull config from DB only: provider settings, extras and reasoning flag in one session
+    record: Optional[db.ProviderRecord] = None
+    model: Optional[db.ModelRecord] = None
     try:
         with db.db_session(app_handle) as sess:
-            settings = db.get_provider_settings(sess, "google")
-            if settings:
-                extra_raw = settings.get("extra")
+            record = db.get_provider_record(sess, "google")
+            model = db.get_model_record(sess, "google", model_id)
     except Exception as e:
-        print(f"[ModelFactory] Warning: Failed to load google extras: {e}")
+        print(f"[ModelFactory] Warning: Failed to load google settings: {e}")
 
-    extra = {}
-    if isinstance(extra_raw, str) and extra_raw.strip():
-        try:
-            extra = json.loads(extra_raw)
-        except Exception:
-            extra = {}
+    api_key = record.api_key if record else None
+    extra = record.extra if record else {}
 
     use_vertex = bool(extra.get("vertexai", False))
     project_id = extra.get("project_id")
@@ -236,17 +247,9 @@ def _get_google_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> A
         )
 
     # Check if model supports reasoning
-    supports_reasoning = False
-    try:
-        with db.db_session(app_handle) as sess:
-            model = db.get_model_settings(sess, "google", model_id)
-            if model:
-                reasoning = db.get_reasoning_from_model(model)
-                supports_reasoning = reasoning.get("supports", False)
-    except Exception as e:
-        print(f"[ModelFactory] Warning: Failed to check reasoning support for {model_id}: {e}")
+    supports_reasoning = bool(model and model.reasoning.get("supports", False))
 
-    return Gemini(
+    return _model_class("google")(
         id=model_id,
         api_key=api_key,
         vertexai=use_vertex,
@@ -259,18 +262,50 @@ def _get_google_model(model_id: str, app_handle: Any = None, **kwargs: Any) -> A
 
 def list_supported_providers() -> list[str]:
     """Return list of supported provider names."""
-    return [
-        "openai",
-        "anthropic",
-        "groq",
-        "ollama",
-        "vllm",
-        "lmstudio",
-        "google",
-        "openai_like",
-    ]
+    return get_provider_registry().names()
+
+
+_BUILDERS = {
+    "openai": _get_openai_model,
+    "anthropic": _get_anthropic_model,
+    "groq": _get_groq_model,
+    "ollama": _get_ollama_model,
+    "vllm": _get_vllm_model,
+    "lmstudio": _get_lmstudio_model,
+    "google": _get_google_model,
+    "openai_like": _get_openai_like_model,
+}
+
+# Per-provider deadline for model discovery; a down local server costs at most this
+DISCOVERY_TIMEOUT_S = 5.0
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for provider model listings."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(DISCOVERY_TIMEOUT_S, connect=2.0),
+            limits=httpx.Limits(max_keepalive_connections=16),
+        )
+    return _http_client
+
+
+def _openai_capabilities(model: Dict[str, Any]) -> Dict[str, Any]:
+    """Capabilities some OpenAI-compatible listings include (Groq, vLLM, OpenRouter)."""
+    caps: Dict[str, Any] = {}
+    context = model.get("context_window") or model.get("max_model_len") or model.get("context_length")
+    if context:
+        caps["context_window"] = int(context)
+    params = model.get("supported_parameters")
+    if isinstance(params, list):
+        caps["supports_tools"] = "tools" in params
+    return caps
 
-def _fetch_openai_models(api_key: str, base_url: Optional[str] = None) -> list[Dict[str, str]]:
+
+async def _fetch_openai_models(api_key: str, base_url: Optional[str] = None) -> list[Dict[str, str]]:
     """Fetch available models from OpenAI API."""
     try:
         base = base_url or 'https://api.openai.com'
@@ -282,42 +317,42 @@ def _fetch_openai_models(api_key: str, base_url: Optional[str] = None) -> list[D
             url = f"{base}/v1/models"
         
         headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(url, headers=headers, timeout=5)
+        response = await _get_http_client().get(url, headers=headers)
         if response.status_code == 200:
             data = response.json()
             models = []
             for model in data.get("data", []):
                 model_id = model.get("id", "")
-                models.append({"id": model_id, "name": model_id})
+                models.append({"id": model_id, "name": model_id, **_openai_capabilities(model)})
             return models
     except Exception as e:
         print(f"[ModelFactory] Failed to fetch OpenAI models: {e}")
     return []
 
 
-def _fetch_groq_models(api_key: str) -> list[Dict[str, str]]:
+async def _fetch_groq_models(api_key: str) -> list[Dict[str, str]]:
     """Fetch available models from Groq API."""
     try:
         url = "https://api.groq.com/openai/v1/models"
         headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(url, headers=headers, timeout=5)
+        response = await _get_http_client().get(url, headers=headers)
         if response.status_code == 200:
             data = response.json()
             models = []
             for model in data.get("data", []):
                 model_id = model.get("id", "")
-                models.append({"id": model_id, "name": model_id})
+                models.append({"id": model_id, "name": model_id, **_openai_capabilities(model)})
             return models
     except Exception as e:
         print(f"[ModelFactory] Failed to fetch Groq models: {e}")
     return []
 
 
-def _fetch_ollama_models(host: str) -> list[Dict[str, str]]:
+async def _fetch_ollama_models(host: str) -> list[Dict[str, str]]:
     """Fetch available models from Ollama API."""
     try:
         url = f"{host}/api/tags"
-        response = requests.get(url, timeout=5)
+        response = await _get_http_client().get(url)
         if response.status_code == 200:
             data = response.json()
             models = []
@@ -333,7 +368,7 @@ def _fetch_ollama_models(host: str) -> list[Dict[str, str]]:
     return []
 
 
-def _fetch_anthropic_models(api_key: str) -> list[Dict[str, str]]:
+async def _fetch_anthropic_models(api_key: str) -> list[Dict[str, str]]:
     """Fetch available models from Anthropic API."""
     try:
         url = "https://api.anthropic.com/v1/models"
@@ -341,7 +376,7 @@ def _fetch_anthropic_models(api_key: str) -> list[Dict[str, str]]:
             "x-api-key": api_key,
             "anthropic-version": "2023-06-01"
         }
-        response = requests.get(url, headers=headers, timeout=5)
+        response = await _get_http_client().get(url, headers=headers)
         if response.status_code == 200:
             data = response.json()
             models = []
@@ -355,11 +390,106 @@ def _fetch_anthropic_models(api_key: str) -> list[Dict[str, str]]:
     return []
 
 
-def get_available_models(app_handle: Any = None) -> list[Dict[str, Any]]:
+async def _fetch_provider_models(provider: str, config: Dict[str, Any]) -> list[Dict[str, Any]]:
+    """Fetch one provider's model listing (empty if it isn't configured)."""
+    api_key = config.get("api_key")
+    base_url = config.get("base_url")
+
+    if provider == "openai":
+        return await _fetch_openai_models(api_key, base_url) if api_key else []
+
+    if provider == "anthropic":
+        return await _fetch_anthropic_models(api_key) if api_key else []
+
+    if provider == "groq":
+        return await _fetch_groq_models(api_key) if api_key else []
+
+    if provider == "ollama":
+        return await _fetch_ollama_models(base_url) if base_url else []
+
+    if provider in ("vllm", "lmstudio", "openai_like", "openai-compatible", "openai_compatible"):
+        # vLLM, LM Studio and generic servers expose OpenAI-compatible /v1/models
+        return await _fetch_openai_models(api_key or "", base_url) if base_url else []
+
+    if provider in ("google", "gemini", "google_ai_studio"):
+        return await _fetch_google_models(api_key) if api_key else []
+
+    return []
+
+
+async def _fetch_limited(provider: str, config: Dict[str, Any]) -> list[Dict[str, Any]]:
+    """Discovery is background work: it queues behind chat streams for the provider."""
+    limits = RateLimits.from_extra(config.get("extra"))
+    async with get_rate_limiter().slot(provider, limits, Priority.BACKGROUND):
+        return await _fetch_provider_models(provider, config)
+
+
+async def fetch_with_deadline(
+    provider: str,
+    config: Dict[str, Any],
+    timeout: float,
+) -> tuple[str, list[Dict[str, Any]], Optional[str]]:
+    """Returns (provider, models, error); a provider past its deadline yields an error."""
+    try:
+        models = await asyncio.wait_for(_fetch_limited(provider, config), timeout)
+        return provider, models, None
+    except asyncio.TimeoutError:
+        print(f"[ModelFactory] {provider} did not answer within {timeout:.0f}s")
+        return provider, [], "timeout"
+    except Exception as e:
+        print(f"[ModelFactory] Error fetching models for {provider}: {e}")
+        return provider, [], str(e)
+
+
+async def iter_available_models(
+    app_handle: Any = None,
+    timeout: float = DISCOVERY_TIMEOUT_S,
+) -> AsyncIterator[tuple[str, list[Dict[str, Any]], Optional[str]]]:
+    """
+    Fetch every enabled provider concurrently, yielding each as it responds.
+    
+    Args:
+        app_handle: Tauri app handle for database access
+        timeout: Per-provider deadline in seconds
+        
+    Yields:
+        (provider, models, error) tuples in completion order
+    """
+    if not app_handle:
+        return
+
+    all_providers = await asyncio.to_thread(_check_db_providers, app_handle)
+    tasks = [
+        asyncio.ensure_future(fetch_with_deadline(provider, config, timeout))
+        for provider, config in all_providers.items()
+        if config.get("enabled", True)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def to_model_infos(provider: str, provider_models: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
+    return [
+        {
+            "provider": provider,
+            "modelId": model_info["id"],
+            "displayName": model_info["name"],
+            "isDefault": False,
+        }
+        for model_info in provider_models
+    ]
+
+
+async def get_available_models(app_handle: Any = None) -> list[Dict[str, Any]]:
     """
     Get list of available models based on configured providers.
     
-    Dynamically fetches models from provider APIs.
+    Dynamically fetches models from provider APIs, all providers at once,
+    each bounded by DISCOVERY_TIMEOUT_S.
     
     Args:
         app_handle: Optional Tauri app handle for database access
@@ -367,105 +497,17 @@ def get_available_models(app_handle: Any = None) -> list[Dict[str, Any]]:
     Returns:
         List of model info dicts with provider, modelId, displayName, isDefault
     """
-    models: list[Dict[str, Any]] = []
-    default_provider = None
-    default_model = None
-    
-    if not app_handle:
-        return []
-    
-    all_providers = _check_db_providers(app_handle)
-    
-    # Fetch models dynamically for each configured provider
-    for provider, config in all_providers.items():
-        if not config.get("enabled", True):
-            continue
-        
-        provider_models = []
-        
-        try:
-            if provider == "openai":
-                api_key = config.get("api_key")
-                base_url = config.get("base_url")
-                if api_key:
-                    provider_models = _fetch_openai_models(api_key, base_url)
-            
-            elif provider == "anthropic":
-                api_key = config.get("api_key")
-                if api_key:
-                    provider_models = _fetch_anthropic_models(api_key)
-            
-            elif provider == "groq":
-                api_key = config.get("api_key")
-                if api_key:
-                    provider_models = _fetch_groq_models(api_key)
-            
-            elif provider == "ollama":
-                host = config.get("base_url")
-                if host:
-                    provider_models = _fetch_ollama_models(host)
-            
-            elif provider == "vllm":
-                # vLLM exposes OpenAI-compatible /v1/models
-                base_url = config.get("base_url")
-                if base_url:
-                    api_key = config.get("api_key")
-                    provider_models = _fetch_openai_models(api_key or "", base_url)
-            
-            elif provider == "lmstudio":
-                # LM Studio exposes OpenAI-compatible /v1/models
-                base_url = config.get("base_url")
-                if base_url:
-                    api_key = config.get("api_key")
-                    provider_models = _fetch_openai_models(api_key or "", base_url)
-
-            elif provider in ("openai_like", "openai-compatible", "openai_compatible"):
-                base_url = config.get("base_url")
-                api_key = config.get("api_key")
-                if base_url:
-                    provider_models = _fetch_openai_models(api_key or "", base_url)
-            
-            elif provider in ("google", "gemini", "google_ai_studio"):
-                api_key = config.get("api_key")
-                if api_key:
-                    provider_models = _fetch_google_models(api_key)
-                    
-                    # Store reasoning capability in DB for Google models
-                    for model_info in provider_models:
-                        supports_reasoning = model_info.get("supports_reasoning", False)
-                        if supports_reasoning:
-                            try:
-                                with db.db_session(app_handle) as sess:
-                                    db.upsert_model_settings(
-                                        sess,
-                                        provider="google",
-                                        model_id=model_info["id"],
-                                        reasoning={
-                                            "supports": supports_reasoning,
-                                            "isUserOverride": False,
-                                        },
-                                    )
-                            except Exception as e:
-                                print(f"[ModelFactory] Warning: Failed to save model metadata for {model_info['id']}: {e}")
-        
-        except Exception as e:
-            print(f"[ModelFactory] Error fetching models for {provider}: {e}")
-            continue
-        
-        # Add fetched models to list
-        for model_info in provider_models:
-            is_default = (default_provider is None and default_model is None)
-            if is_default:
-                default_provider = provider
-                default_model = model_info["id"]
-                
-            models.append({
-                "provider": provider,
-                "modelId": model_info["id"],
-                "displayName": model_info["name"],
-                "isDefault": is_default,
-            })
-    
+    by_provider: Dict[str, list[Dict[str, Any]]] = {}
+    order: list[str] = []
+    if app_handle:
+        # Keep the configured provider order so the default model is stable
+        order = list((await asyncio.to_thread(_check_db_providers, app_handle)).keys())
+    async for provider, provider_models, _ in iter_available_models(app_handle):
+        by_provider[provider] = to_model_infos(provider, provider_models)
+
+    models = [m for provider in order for m in by_provider.get(provider, [])]
+    if models:
+        models[0]["isDefault"] = True
     return models
 
 
@@ -480,12 +522,12 @@ def _check_db_providers(app_handle: Any) -> Dict[str, Dict[str, Any]]:
         return {}
 
 
-def _fetch_google_models(api_key: str) -> list[Dict[str, Any]]:
+async def _fetch_google_models(api_key: str) -> list[Dict[str, Any]]:
     """Fetch available models from Google AI Studio (Generative Language API)."""
     try:
-        # v1beta returns list of models; using query param for API key
-        url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-        response = requests.get(url, timeout=5)
+        # v1beta returns list of models; API key in a header keeps it out of URLs
+        url = "https://generativelanguage.googleapis.com/v1beta/models"
+        response = await _get_http_client().get(url, headers={"x-goog-api-key": api_key})
         if response.status_code == 200:
             data = response.json()
             models = []
@@ -500,6 +542,7 @@ def _fetch_google_models(api_key: str) -> list[Dict[str, Any]]:
                         "id": model_id,
                         "name": display,
                         "supports_reasoning": supports_thinking,
+                        "context_window": m.get("inputTokenLimit"),
                     })
 
             return models
@@ -0,0 +1,206 @@
+"""
+Model Pool for reusing provider clients across requests.
+
+Agno model instances lazily build their SDK client (and its HTTP connection
+pool) on first use, so a fresh model per request pays DNS, TCP and TLS setup
+before every first token. The pool keeps one prototype model per
+(provider, model_id, credential hash, base_url, kwargs) and hands out shallow
+copies: per-request model state stays isolated while the SDK clients, and
+their keep-alive connections, are shared.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Attributes agno models use to cache their SDK clients
+_CLIENT_ATTRS = ("client", "async_client", "http_client")
+
+DEFAULT_IDLE_TTL_S = 600.0
+
+PoolKey = Tuple[str, str, str, Optional[str], str]
+
+
+def credential_hash(*parts: Any) -> str:
+    """Stable short digest of credentials, so keys never hold raw API keys."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(
+    provider: str,
+    model_id: str,
+    credentials: str,
+    base_url: Optional[str],
+    kwargs: Dict[str, Any],
+) -> PoolKey:
+    return (provider, model_id, credentials, base_url, json.dumps(kwargs, sort_keys=True, default=str))
+
+
+def _has_client(model: Any) -> bool:
+    return any(getattr(model, attr, None) is not None for attr in _CLIENT_ATTRS)
+
+
+@dataclass
+class _Entry:
+    prototype: Any
+    last_used: float = field(default_factory=time.monotonic)
+    leases: int = 0
+
+
+@dataclass
+class _TtftStats:
+    count: int = 0
+    total_s: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_s += seconds
+
+    def avg_ms(self) -> Optional[float]:
+        return round(self.total_s / self.count * 1000, 1) if self.count else None
+
+
+class ModelPool:
+    """
+    Pool of model prototypes keyed by provider credentials.
+
+    Entries idle for longer than `idle_ttl_s` are dropped on the next acquire,
+    which closes their connections once the last copy is garbage collected.
+    """
+
+    def __init__(self, idle_ttl_s: float = DEFAULT_IDLE_TTL_S) -> None:
+        # Reentrant: a lease finalizer may run from GC while the lock is held
+        self._lock = threading.RLock()
+        self._entries: Dict[PoolKey, _Entry] = {}
+        # id(copy) -> (key, warm) for models currently handed out
+        self._leases: Dict[int, Tuple[PoolKey, bool]] = {}
+        self.idle_ttl_s = idle_ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._ttft = {True: _TtftStats(), False: _TtftStats()}
+
+    def acquire(self, key: PoolKey, factory: Callable[[], Any]) -> Any:
+        """
+        Get a per-request model for `key`, building the prototype on a miss.
+
+        Args:
+            key: Pool key from `make_key`
+            factory: Builds a new model instance
+
+        Returns:
+            Shallow copy of the pooled model (shares its SDK clients)
+        """
+        with self._lock:
+            self._sweep()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            # Build outside the lock; a racing miss simply keeps the first prototype
+            built = _Entry(prototype=factory())
+            with self._lock:
+                entry = self._entries.setdefault(key, built)
+
+        with self._lock:
+            entry.last_used = time.monotonic()
+            entry.leases += 1
+            model = copy.copy(entry.prototype)
+            self._leases[id(model)] = (key, _has_client(entry.prototype))
+        # A copy dropped without release (error before streaming) must not leak its lease
+        weakref.finalize(model, self._forget, id(model))
+        return model
+
+    def _forget(self, model_id: int) -> None:
+        with self._lock:
+            lease = self._leases.pop(model_id, None)
+            entry = self._entries.get(lease[0]) if lease else None
+            if entry is not None:
+                entry.leases -= 1
+
+    def release(self, model: Any) -> Optional[bool]:
+        """
+        Return a model after its request, keeping any clients it created.
+
+        Returns:
+            Whether the model started with a warm client (None if not pooled)
+        """
+        with self._lock:
+            lease = self._leases.pop(id(model), None)
+            if lease is None:
+                return None
+            key, warm = lease
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.leases -= 1
+                entry.last_used = time.monotonic()
+                for attr in _CLIENT_ATTRS:
+                    client = getattr(model, attr, None)
+                    if client is not None and getattr(entry.prototype, attr, None) is None:
+                        setattr(entry.prototype, attr, client)
+            return warm
+
+    def is_warm(self, model: Any) -> Optional[bool]:
+        lease = self._leases.get(id(model))
+        return lease[1] if lease else None
+
+    def record_ttft(self, warm: bool, seconds: float) -> None:
+        with self._lock:
+            self._ttft[bool(warm)].add(seconds)
+
+    def invalidate(self, provider: Optional[str] = None) -> int:
+        """Drop pooled models for one provider (or all). Returns the number removed."""
+        with self._lock:
+            doomed = [k for k in self._entries if provider is None or k[0] == provider]
+            for key in doomed:
+                del self._entries[key]
+            self.invalidations += len(doomed)
+            return len(doomed)
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl_s
+        for key in [k for k, e in self._entries.items() if e.leases <= 0 and e.last_used < cutoff]:
+            del self._entries[key]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            warm, cold = self._ttft[True], self._ttft[False]
+            saved = None
+            if warm.count and cold.count:
+                saved = round(cold.avg_ms() - warm.avg_ms(), 1)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "ttftWarmMs": warm.avg_ms(),
+                "ttftColdMs": cold.avg_ms(),
+                "warmRuns": warm.count,
+                "coldRuns": cold.count,
+                "ttftSavedMs": saved,
+            }
+
+
+# Global singleton
+_model_pool: Optional[ModelPool] = None
+
+
+def get_model_pool() -> ModelPool:
+    """Get the global model pool instance."""
+    global _model_pool
+    if _model_pool is None:
+        _model_pool = ModelPool()
+    return _model_pool
@@ -0,0 +1,128 @@
+"""
+Model pre-warming.
+
+Selecting a model only writes config; the first send then pays for client
+construction, DNS, TLS and, on local runtimes, loading the weights. Prewarming
+does that work at selection time through the model pool, so the first real
+request finds a built client with an open keep-alive connection.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .model_factory import get_pooled_model
+from .model_pool import get_model_pool
+from .rate_limiter import Priority, get_rate_limiter, provider_limits
+
+PREWARM_TIMEOUT_S = 10.0
+# Loading weights on a local runtime can take much longer than a handshake
+LOCAL_LOAD_TIMEOUT_S = 60.0
+# How long Ollama keeps a prewarmed model resident
+OLLAMA_KEEP_ALIVE = "10m"
+
+_in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+_background: Set[asyncio.Task] = set()
+
+
+async def _maybe_await(value: Any) -> Any:
+    return await value if inspect.isawaitable(value) else value
+
+
+def _client_for(model: Any) -> Any:
+    """Build (and cache on the model) its SDK client, preferring the async one."""
+    for getter in ("get_async_client", "get_client"):
+        fn = getattr(model, getter, None)
+        if fn is not None:
+            return fn()
+    return None
+
+
+async def _open_connection(client: Any) -> None:
+    """One cheap authenticated request, leaving a keep-alive connection in the client's pool."""
+    # google-genai keeps its async surface under `.aio`
+    surface = getattr(client, "aio", client)
+    models_api = getattr(surface, "models", None)
+    lister = getattr(models_api, "list", None) or getattr(surface, "list", None)
+    if lister is None:
+        return
+    await _maybe_await(lister())
+
+
+async def _load_local_model(provider: str, model: Any, client: Any) -> bool:
+    """Ask a local runtime to load the weights now. Returns whether a load was requested."""
+    if provider == "ollama" and hasattr(client, "generate"):
+        # An empty prompt only loads the model
+        await _maybe_await(client.generate(model=model.id, prompt="", keep_alive=OLLAMA_KEEP_ALIVE))
+        return True
+    if provider == "lmstudio":
+        # LM Studio loads models just in time on the first completion
+        await _maybe_await(client.chat.completions.create(
+            model=model.id,
+            messages=[{"role": "user", "content": "hi"}],
+            max_tokens=1,
+        ))
+        return True
+    return False
+
+
+async def _prewarm(provider: str, model_id: str, app_handle: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    pool = get_model_pool()
+    result: Dict[str, Any] = {"warm": False, "connected": False, "loaded": False}
+    model = None
+    try:
+        model = get_pooled_model(provider, model_id, app_handle)
+        result["warm"] = bool(pool.is_warm(model))
+        client = _client_for(model)
+        if client is not None:
+            limits = await asyncio.to_thread(provider_limits, app_handle, provider)
+            async with get_rate_limiter().slot(provider, limits, Priority.BACKGROUND):
+                await asyncio.wait_for(_open_connection(client), PREWARM_TIMEOUT_S)
+                result["connected"] = True
+                result["loaded"] = await asyncio.wait_for(
+                    _load_local_model(provider.lower(), model, client),
+                    LOCAL_LOAD_TIMEOUT_S,
+                )
+    except Exception as e:
+        # Prewarming is best effort; the real request reports real errors
+        result["error"] = str(e) or type(e).__name__
+    finally:
+        if model is not None:
+            pool.release(model)
+    result["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"[prewarm] {provider}:{model_id} {result}")
+    return result
+
+
+async def prewarm_model(provider: str, model_id: str, app_handle: Any) -> Dict[str, Any]:
+    """
+    Build the pooled client for a model, open its connection and, for local
+    runtimes, load the model. Concurrent calls for the same model share one run.
+
+    Args:
+        provider: Model provider name
+        model_id: Model identifier
+        app_handle: Tauri app handle for provider settings
+
+    Returns:
+        Dict with warm (client already pooled), connected, loaded, elapsedMs and error if any
+    """
+    key = (provider, model_id)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_prewarm(provider, model_id, app_handle))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def prewarm_in_background(provider: str, model_id: Optional[str], app_handle: Any) -> None:
+    """Fire-and-forget prewarm on the running loop (e.g. right after a model switch)."""
+    if not model_id:
+        return
+    task = asyncio.ensure_future(prewarm_model(provider, model_id, app_handle))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
@@ -0,0 +1,148 @@
+"""
+Provider prompt caching.
+
+Every turn resends the instructions, tool schemas and history, which only
+grow at the end. Providers can serve that unchanged prefix from cache:
+
+- Anthropic caches up to explicit breakpoints. Claude models (see
+  cached_claude) mark the system prompt, the last tool schema, and the user
+  turn before the newest one, so the growing history is read from cache on
+  each follow-up. The TTL is 5 minutes, or 1 hour with
+  `"promptCacheTtl": "1h"`. Set `"promptCaching": false` in the provider's
+  extra to turn this off.
+- OpenAI-compatible providers cache matching prefixes automatically and
+  report the cached share of the input.
+
+Either way, the cache only hits if the prefix is byte-identical from turn
+to turn. Messages are therefore serialized with sorted keys, and context
+trimming drops history in fixed steps (see context_assembler). Usage of
+each run is recorded on its message and aggregated per provider. Runs whose
+whole input is below the provider's minimum cacheable prefix are counted
+separately, since no breakpoint can make them hit.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Providers whose reported input_tokens exclude cache reads and writes
+_CACHE_EXCLUSIVE_PROVIDERS = ("anthropic",)
+# Shortest prompt a provider will cache (Claude Haiku models need 2048)
+_MIN_CACHEABLE_TOKENS = {"anthropic": 1024, "openai": 1024}
+
+
+def stable_json(value: Any) -> str:
+    """JSON with sorted keys, so the same data always serializes to the same bytes."""
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def anthropic_cache_kwargs(extra: Any) -> Dict[str, Any]:
+    """
+    Claude model arguments enabling prompt caching.
+
+    Args:
+        extra: Anthropic provider extra (dict or raw JSON string)
+
+    Returns:
+        Keyword arguments for agno's Claude model (empty if caching is disabled)
+    """
+    if isinstance(extra, str):
+        try:
+            extra = json.loads(extra)
+        except ValueError:
+            extra = {}
+    extra = extra if isinstance(extra, dict) else {}
+    if extra.get("promptCaching") is False:
+        return {}
+    return {
+        "cache_system_prompt": True,
+        "cache_tools": True,
+        "cache_history": True,
+        "extended_cache_time": extra.get("promptCacheTtl") == "1h",
+    }
+
+
+@dataclass(frozen=True)
+class CacheUsage:
+    """Input tokens of one run, split by how the provider's prompt cache served them."""
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def uncached_tokens(self) -> int:
+        return max(self.input_tokens - self.cached_tokens, 0)
+
+    @classmethod
+    def from_metrics(cls, metrics: Any, provider: Optional[str]) -> Optional["CacheUsage"]:
+        """Usage from a run's metrics (None if the provider reported none)."""
+        if metrics is None:
+            return None
+        input_tokens = getattr(metrics, "input_tokens", 0) or 0
+        cached = getattr(metrics, "cache_read_tokens", 0) or 0
+        written = getattr(metrics, "cache_write_tokens", 0) or 0
+        if provider in _CACHE_EXCLUSIVE_PROVIDERS:
+            # Normalize to "input includes cached" as OpenAI reports it
+            input_tokens += cached + written
+        if not input_tokens:
+            return None
+        return cls(input_tokens, cached, written, getattr(metrics, "output_tokens", 0) or 0)
+
+    def as_dict(self) -> Dict[str, int]:
+        """camelCase form stored on the message and sent with RunCompleted."""
+        return {
+            "inputTokens": self.input_tokens,
+            "cachedInputTokens": self.cached_tokens,
+            "uncachedInputTokens": self.uncached_tokens,
+            "cacheWriteTokens": self.cache_write_tokens,
+            "outputTokens": self.output_tokens,
+        }
+
+
+class PromptCacheStats:
+    """Per-provider totals of cached and uncached input tokens since startup."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def record(self, provider: str, usage: CacheUsage) -> None:
+        with self._lock:
+            totals = self._totals.setdefault(
+                provider,
+                {"runs": 0, "hits": 0, "tooShort": 0, "inputTokens": 0, "cachedInputTokens": 0, "cacheWriteTokens": 0},
+            )
+            totals["runs"] += 1
+            totals["hits"] += 1 if usage.cached_tokens else 0
+            # A miss on a prompt below the provider's minimum is expected, not a broken prefix
+            if not usage.cached_tokens and usage.input_tokens < _MIN_CACHEABLE_TOKENS.get(provider, 0):
+                totals["tooShort"] += 1
+            totals["inputTokens"] += usage.input_tokens
+            totals["cachedInputTokens"] += usage.cached_tokens
+            totals["cacheWriteTokens"] += usage.cache_write_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                provider: {
+                    **totals,
+                    "cachedRatio": round(totals["cachedInputTokens"] / totals["inputTokens"], 3)
+                    if totals["inputTokens"] else None,
+                }
+                for provider, totals in self._totals.items()
+            }
+
+
+# Global singleton
+_prompt_cache_stats: Optional[PromptCacheStats] = None
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """Get the global prompt cache stats instance."""
+    global _prompt_cache_stats
+    if _prompt_cache_stats is None:
+        _prompt_cache_stats = PromptCacheStats()
+    return _prompt_cache_stats
@@ -0,0 +1,106 @@
+"""
+Provider Registry for model providers.
+
+Maps provider names (and their aliases) to the agno model class that serves
+them. Each entry names its module instead of importing it, so a provider's
+SDK (openai, anthropic, groq, google-genai, ollama, ...) is only imported the
+first time a model from that provider is built.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .import_timing import timed_import
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """Where to find a provider's model class."""
+    name: str
+    module: str
+    class_name: str
+    aliases: Tuple[str, ...] = ()
+
+
+_DEFAULT_PROVIDERS = (
+    ProviderSpec("openai", "agno.models.openai", "OpenAIChat"),
+    # agno's Claude plus tool and history cache breakpoints (see cached_claude)
+    ProviderSpec("anthropic", f"{__package__}.cached_claude", "CachedClaude"),
+    ProviderSpec("groq", "agno.models.groq", "Groq"),
+    ProviderSpec("ollama", "agno.models.ollama", "Ollama"),
+    ProviderSpec("vllm", "agno.models.vllm", "VLLM"),
+    ProviderSpec("lmstudio", "agno.models.lmstudio", "LMStudio"),
+    ProviderSpec("google", "agno.models.google", "Gemini", aliases=("gemini", "google_ai_studio")),
+    ProviderSpec(
+        "openai_like",
+        "agno.models.openai.like",
+        "OpenAILike",
+        aliases=("openai-compatible", "openai_compatible"),
+    ),
+)
+
+
+class ProviderRegistry:
+    """Registry of provider specs with lazily imported model classes."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._specs: Dict[str, ProviderSpec] = {}
+        self._aliases: Dict[str, str] = {}
+        self._classes: Dict[str, Any] = {}
+        for spec in _DEFAULT_PROVIDERS:
+            self.register(spec)
+
+    def register(self, spec: ProviderSpec) -> None:
+        """Register (or replace) a provider."""
+        with self._lock:
+            self._specs[spec.name] = spec
+            self._classes.pop(spec.name, None)
+            for name in (spec.name, *spec.aliases):
+                self._aliases[name] = spec.name
+
+    def resolve(self, provider: str) -> Optional[str]:
+        """Canonical provider name for a name or alias (None if unknown)."""
+        return self._aliases.get(provider.lower().strip())
+
+    def model_class(self, provider: str) -> Any:
+        """
+        Get a provider's model class, importing its module on first use.
+
+        Raises:
+            ValueError: If provider is not registered
+        """
+        name = self.resolve(provider)
+        if name is None:
+            raise ValueError(
+                f"Unsupported provider: {provider}. "
+                f"Supported providers: {', '.join(self.names())}"
+            )
+        cls = self._classes.get(name)
+        if cls is None:
+            spec = self._specs[name]
+            cls = getattr(timed_import(spec.module), spec.class_name)
+            with self._lock:
+                self._classes[name] = cls
+        return cls
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def loaded(self) -> List[str]:
+        """Providers whose SDK has been imported."""
+        return list(self._classes)
+
+
+# Global singleton
+_provider_registry: Optional[ProviderRegistry] = None
+
+
+def get_provider_registry() -> ProviderRegistry:
+    """Get the global provider registry instance."""
+    global _provider_registry
+    if _provider_registry is None:
+        _provider_registry = ProviderRegistry()
+    return _provider_registry
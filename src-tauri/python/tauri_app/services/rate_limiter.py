@@ -0,0 +1,346 @@
+"""
+Client-side rate limiting per provider.
+
+Chat streams, title generation, prewarming and model discovery all call the
+same providers. Each provider gets one limiter that admits calls in priority
+order (interactive before background) under limits read from
+`provider_settings.extra`:
+
+    "rateLimits": {"requestsPerMinute": 50, "tokensPerMinute": 40000, "maxConcurrent": 4}
+
+Requests and tokens are token buckets; maxConcurrent caps calls in flight,
+with the last slot kept for interactive work. A 429 from the provider pauses
+admission for its Retry-After instead of letting every queued call fail into
+SDK retries. Queue waits are recorded per provider and priority.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from .. import db
+
+# Pause after a 429 that carries no Retry-After
+DEFAULT_BACKOFF_S = 5.0
+# Waits longer than this are logged
+LOG_WAIT_S = 0.5
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_concurrent: Optional[int] = None
+
+    @classmethod
+    def from_extra(cls, extra: Any) -> Optional["RateLimits"]:
+        """Limits from a provider's extra (dict or raw JSON string); None if not configured."""
+        if isinstance(extra, str):
+            try:
+                extra = json.loads(extra)
+            except ValueError:
+                return None
+        limits = extra.get("rateLimits") if isinstance(extra, dict) else None
+        if not isinstance(limits, dict):
+            return None
+
+        def positive(key: str) -> Optional[float]:
+            value = limits.get(key)
+            return float(value) if isinstance(value, (int, float)) and value > 0 else None
+
+        concurrent = positive("maxConcurrent")
+        parsed = cls(
+            requests_per_minute=positive("requestsPerMinute"),
+            tokens_per_minute=positive("tokensPerMinute"),
+            max_concurrent=int(concurrent) if concurrent else None,
+        )
+        return parsed if parsed != cls() else None
+
+
+def provider_limits(app_handle: Any, provider: str) -> Optional[RateLimits]:
+    """Configured limits for a provider (read through the settings cache)."""
+    with db.db_session(app_handle) as sess:
+        record = db.get_provider_record(sess, provider)
+    return RateLimits.from_extra(record.extra) if record else None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting before a call."""
+    return len(text) // 4 + 1
+
+
+def rate_limit_retry_after(error: Any) -> Optional[float]:
+    """
+    Seconds to back off if `error` is a provider 429, else None.
+
+    Args:
+        error: SDK exception, or the error carried by a RunError event
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    text = str(error).lower()
+    if status != 429 and "429" not in text and "rate limit" not in text:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return DEFAULT_BACKOFF_S
+
+
+class TokenBucket:
+    """Refills continuously up to one minute's allowance."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (a call larger than the bucket waits for a full one)."""
+        self._refill()
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Consume `amount`; may go negative, which later calls pay back. Negative amounts refund."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class Lease:
+    """An admitted call. Settle with the real token count once the provider reports usage."""
+
+    def __init__(self, limiter: Optional["ProviderLimiter"], priority: Priority, tokens: int, waited_s: float) -> None:
+        self._limiter = limiter
+        self.priority = priority
+        self.tokens = tokens
+        self.waited_s = waited_s
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        if self._limiter is not None and actual_tokens is not None:
+            self._limiter.settle(actual_tokens - self.tokens)
+            self.tokens = actual_tokens
+
+    def report_error(self, error: Any) -> None:
+        """Back the provider off if `error` is a rate-limit response."""
+        if self._limiter is not None:
+            self._limiter.on_error(error)
+
+
+class ProviderLimiter:
+    """Priority admission queue for one provider."""
+
+    def __init__(self, provider: str, limits: Optional[RateLimits]) -> None:
+        self.provider = provider
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._active: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.rate_limited = 0
+        self._waits: Dict[Priority, Deque[float]] = {p: deque(maxlen=500) for p in Priority}
+        self.configure(limits)
+
+    def configure(self, limits: Optional[RateLimits]) -> None:
+        self.limits = limits or RateLimits()
+        self._requests = TokenBucket(self.limits.requests_per_minute) if self.limits.requests_per_minute else None
+        self._tokens = TokenBucket(self.limits.tokens_per_minute) if self.limits.tokens_per_minute else None
+
+    # Admission
+
+    def _has_slot(self, priority: Priority) -> bool:
+        cap = self.limits.max_concurrent
+        if cap is None:
+            return True
+        active = sum(self._active.values())
+        if priority == Priority.BACKGROUND and cap > 1:
+            # Background work never takes the last slot
+            return active < cap and self._active[Priority.BACKGROUND] < cap - 1
+        return active < cap
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = max(self._paused_until - time.monotonic(), 0.0)
+        if self._requests:
+            wait = max(wait, self._requests.wait_time(1))
+        if self._tokens and tokens:
+            wait = max(wait, self._tokens.wait_time(tokens))
+        return wait
+
+    def _dispatch(self) -> None:
+        """Admit waiters from the head of the queue while limits allow."""
+        self._timer = None
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._has_slot(Priority(priority)):
+                return
+            wait = self._wait_time(tokens)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._admit(Priority(priority), tokens)
+            future.set_result(None)
+
+    def _admit(self, priority: Priority, tokens: int) -> None:
+        self._active[priority] += 1
+        self.admitted += 1
+        if self._requests:
+            self._requests.take(1)
+        if self._tokens and tokens:
+            self._tokens.take(tokens)
+
+    async def acquire(self, priority: Priority, tokens: int) -> float:
+        """Wait for admission. Returns seconds spent queued."""
+        started = time.monotonic()
+        if not self._waiters and self._has_slot(priority) and self._wait_time(tokens) <= 0:
+            self._admit(priority, tokens)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (int(priority), next(self._seq), tokens, future))
+            if self._timer is None:
+                self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release(priority)
+                raise
+        waited = time.monotonic() - started
+        self._waits[priority].append(waited)
+        return waited
+
+    def release(self, priority: Priority) -> None:
+        self._active[priority] = max(self._active[priority] - 1, 0)
+        self._reschedule()
+
+    def _reschedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._waiters:
+            self._dispatch()
+
+    # Feedback
+
+    def settle(self, token_delta: int) -> None:
+        if self._tokens and token_delta:
+            self._tokens.take(token_delta)
+
+    def on_error(self, error: Any) -> None:
+        retry_after = rate_limit_retry_after(error)
+        if retry_after is None:
+            return
+        self.rate_limited += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        print(f"[RateLimiter] {self.provider} returned 429, pausing {retry_after:.1f}s")
+
+    # Stats
+
+    @staticmethod
+    def _wait_percentiles(samples: Deque[float]) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {"p50Ms": None, "p95Ms": None, "maxMs": None}
+        ordered = sorted(samples)
+
+        def at(q: float) -> float:
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1)
+
+        return {"p50Ms": at(0.5), "p95Ms": at(0.95), "maxMs": round(ordered[-1] * 1000, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "active": sum(self._active.values()),
+            "queued": sum(1 for *_, f in self._waiters if not f.done()),
+            "rateLimited": self.rate_limited,
+            "waits": {p.name.lower(): self._wait_percentiles(self._waits[p]) for p in Priority},
+        }
+
+
+class RateLimiter:
+    """Per-provider limiters, reconfigured whenever a provider's limits change."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, ProviderLimiter] = {}
+
+    def for_provider(self, provider: str, limits: Optional[RateLimits]) -> ProviderLimiter:
+        with self._lock:
+            limiter = self._limiters.get(provider)
+            if limiter is None:
+                limiter = self._limiters[provider] = ProviderLimiter(provider, limits)
+            elif limiter.limits != (limits or RateLimits()):
+                limiter.configure(limits)
+            return limiter
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        provider: str,
+        limits: Optional[RateLimits],
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 0,
+    ) -> AsyncIterator[Lease]:
+        """
+        Hold a provider slot for the duration of one call.
+
+        Args:
+            provider: Provider name
+            limits: The provider's configured limits (None: no limits, 429 backoff only)
+            priority: INTERACTIVE for chat streams, BACKGROUND for everything else
+            tokens: Estimated tokens the call will use (see Lease.settle)
+
+        Yields:
+            Lease for settling token usage and reporting errors
+        """
+        limiter = self.for_provider(provider, limits)
+        waited = await limiter.acquire(priority, tokens)
+        if waited >= LOG_WAIT_S:
+            print(f"[RateLimiter] {provider} {priority.name.lower()} call queued {waited * 1000:.0f}ms")
+        lease = Lease(limiter, priority, tokens, waited)
+        try:
+            yield lease
+        except Exception as e:
+            lease.report_error(e)
+            raise
+        finally:
+            limiter.release(priority)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {provider: limiter.stats() for provider, limiter in self._limiters.items()}
+
+
+# Global singleton
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the global rate limiter instance."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,110 @@
+"""
+Automatic resume after transient provider errors.
+
+A stream that fails on a dropped connection, timeout, overload or 429 is
+resumed into the same assistant message with the continue semantics (the
+partial reply is sent back as context and new output is appended to the
+saved blocks) instead of ending on an error block. Anything else, such as
+bad credentials or an oversized context, still fails immediately.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from .. import db
+from .rate_limiter import rate_limit_retry_after
+
+# HTTP statuses worth retrying (529: Anthropic "overloaded")
+_TRANSIENT_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# SDK exception class names (openai, anthropic, groq, httpx, google-genai), matched
+# by name so no SDK has to be imported to classify its errors
+_TRANSIENT_TYPES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "RateLimitError",
+    "OverloadedError",
+    "ServiceUnavailableError",
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadError",
+    "ReadTimeout",
+    "WriteError",
+    "RemoteProtocolError",
+    "ServerError",
+}
+_TRANSIENT_MARKERS = (
+    "overloaded",
+    "connection reset",
+    "connection aborted",
+    "connection error",
+    "server disconnected",
+    "timed out",
+    "temporarily unavailable",
+    "bad gateway",
+    "service unavailable",
+    "gateway timeout",
+)
+
+
+class ResumableStreamError(Exception):
+    """Raised by the stream loop when a run failed transiently and may be resumed."""
+
+    def __init__(self, error: Any) -> None:
+        super().__init__(str(error))
+        self.error = error
+
+
+def is_transient_error(error: Any) -> bool:
+    """
+    Whether a failed run is worth resuming automatically.
+
+    Args:
+        error: Exception raised by the run, or the error carried by a RunError event
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, TimeoutError)):
+        return True
+    for cls in type(error).__mro__:
+        if cls.__name__ in _TRANSIENT_TYPES:
+            return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in _TRANSIENT_STATUSES
+    text = str(error).lower()
+    return any(marker in text for marker in _TRANSIENT_MARKERS) or rate_limit_retry_after(error) is not None
+
+
+@dataclass(frozen=True)
+class ResumePolicy:
+    enabled: bool = True
+    max_attempts: int = 3
+    base_delay_s: float = 1.0
+    max_delay_s: float = 20.0
+
+    def delay(self, attempt: int, error: Any) -> float:
+        """Backoff before resume `attempt` (1-based): a 429's Retry-After, else jittered exponential."""
+        retry_after = rate_limit_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay_s)
+        ceiling = min(self.base_delay_s * 2 ** (attempt - 1), self.max_delay_s)
+        return random.uniform(ceiling / 2, ceiling)
+
+    def allows(self, attempt: int) -> bool:
+        """Whether a failure on (0-based) `attempt` may still be resumed."""
+        return self.enabled and attempt < self.max_attempts
+
+
+def get_resume_policy(app_handle: Any) -> ResumePolicy:
+    """Resume policy from the `auto_resume` general setting."""
+    with db.db_session(app_handle) as sess:
+        settings: Dict[str, Any] = db.get_general_settings(sess).get("auto_resume") or {}
+    defaults = ResumePolicy()
+    return ResumePolicy(
+        enabled=bool(settings.get("enabled", defaults.enabled)),
+        max_attempts=max(int(settings.get("max_attempts", defaults.max_attempts)), 0),
+        base_delay_s=float(settings.get("base_delay_s", defaults.base_delay_s)),
+        max_delay_s=float(settings.get("max_delay_s", defaults.max_delay_s)),
+    )
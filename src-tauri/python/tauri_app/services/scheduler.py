@@ -0,0 +1,73 @@
+"""
+Background job scheduler for database maintenance.
+
+Jobs run on daemon threads at a fixed interval so they never block the
+event loop or delay app shutdown.
+"""
+from __future__ import annotations
+
+import threading
+import traceback
+from typing import Callable, Dict, Optional
+
+
+class JobScheduler:
+    """Runs named jobs periodically on daemon threads."""
+
+    def __init__(self) -> None:
+        self._threads: Dict[str, threading.Thread] = {}
+        self._stop = threading.Event()
+
+    def every(
+        self,
+        name: str,
+        interval_s: float,
+        job: Callable[[], object],
+        initial_delay_s: float = 0.0,
+    ) -> None:
+        """
+        Schedule `job` to run every `interval_s` seconds.
+
+        Re-registering an existing name is a no-op, so startup code can be called twice.
+        """
+        if name in self._threads:
+            return
+
+        def loop() -> None:
+            if self._stop.wait(initial_delay_s):
+                return
+            while True:
+                self._run(name, job)
+                if self._stop.wait(interval_s):
+                    return
+
+        thread = threading.Thread(target=loop, name=f"job:{name}", daemon=True)
+        self._threads[name] = thread
+        thread.start()
+
+    def run_once(self, name: str, job: Callable[[], object]) -> None:
+        """Run `job` a single time in the background."""
+        threading.Thread(target=self._run, args=(name, job), name=f"job:{name}", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @staticmethod
+    def _run(name: str, job: Callable[[], object]) -> None:
+        try:
+            job()
+        except Exception as e:
+            print(f"[scheduler] Job '{name}' failed: {e}")
+            traceback.print_exc()
+
+
+# Global singleton
+_scheduler: Optional[JobScheduler] = None
+
+
+def get_scheduler() -> JobScheduler:
+    """Get the global job scheduler instance."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler()
+    return _scheduler
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Optional
 from pytauri import AppHandle
 from agno.agent import Agent
 
 from .. import db
+from .rate_limiter import Priority, estimate_tokens, get_rate_limiter, provider_limits
 
 
-def generate_title_for_chat(chat_id: str, app_handle: AppHandle) -> Optional[str]:
+async def generate_title_for_chat(chat_id: str, app_handle: AppHandle) -> Optional[str]:
     """
     Generate a title for a chat based on its first user message.
     
@@ -73,8 +75,15 @@ def generate_title_for_chat(chat_id: str, app_handle: AppHandle) -> Optional[str
             stream=False,
         )
         
-        # Use empty input since prompt already contains the message
-        response = agent.run(input=[])
+        # Titles are background work: they queue behind chat streams on the same provider
+        limits = await asyncio.to_thread(provider_limits, app_handle, provider)
+        async with get_rate_limiter().slot(
+            provider, limits, Priority.BACKGROUND, tokens=estimate_tokens(prompt)
+        ) as lease:
+            # Use empty input since prompt already contains the message
+            response = await agent.arun(input=[])
+            metrics = getattr(response, "metrics", None)
+            lease.settle(getattr(metrics, "total_tokens", None))
         
         if not response or not response.messages:
             return None
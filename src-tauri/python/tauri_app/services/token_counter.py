@@ -0,0 +1,191 @@
+"""
+Offline token counting per model family.
+
+OpenAI models are counted exactly with tiktoken when it is installed and its
+encoding files are cached locally (`pip install tiktoken`; set
+TIKTOKEN_CACHE_DIR to ship them with the app). Everything else, or any
+model when tiktoken is unavailable, uses a per-family characters-per-token
+estimator. Counts are computed once per message and stored in
+`messages.token_count`, so budgeting a request is a sum over the path.
+"""
+from __future__ import annotations
+
+import json
+import math
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+from pytauri import AppHandle
+
+from .. import db
+
+# Per-message framing (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+BACKFILL_BATCH = 500
+
+# Average characters per token of ASCII text, measured on English prose and code
+_CHARS_PER_TOKEN = {
+    "openai": 4.0,
+    "anthropic": 3.5,
+    "google": 4.0,
+    "llama": 3.7,
+    "default": 3.8,
+}
+# Non-ASCII characters (CJK, accents, emoji) cost close to a token each
+_NON_ASCII_TOKENS = 0.8
+
+_OPENAI_O200K_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-4.5", "gpt-5", "o1", "o3", "o4", "chatgpt-4o")
+_OPENAI_CL100K_PREFIXES = ("gpt-4", "gpt-3.5", "text-embedding-3")
+
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def model_family(model_used: Optional[str]) -> str:
+    """Tokenizer family of a "provider:model_id" string."""
+    provider, _, model_id = (model_used or "").partition(":")
+    model_id = model_id.lower()
+    if provider == "anthropic" or model_id.startswith("claude"):
+        return "anthropic"
+    if provider in ("google", "gemini", "google_ai_studio") or model_id.startswith("gemini"):
+        return "google"
+    if model_id.startswith(_OPENAI_O200K_PREFIXES + _OPENAI_CL100K_PREFIXES) or provider == "openai":
+        return "openai"
+    if any(name in model_id for name in ("llama", "mistral", "mixtral", "qwen", "gemma", "phi", "deepseek")):
+        return "llama"
+    return "default"
+
+
+def _encoding_name(model_used: Optional[str]) -> Optional[str]:
+    model_id = (model_used or "").partition(":")[2].lower()
+    if model_id.startswith(_OPENAI_O200K_PREFIXES):
+        return "o200k_base"
+    if model_id.startswith(_OPENAI_CL100K_PREFIXES):
+        return "cl100k_base"
+    return None
+
+
+def _encoding(name: str) -> Any:
+    """tiktoken encoding, or None if tiktoken or its cached files are missing (never retried)."""
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                import tiktoken
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:
+                # Not installed, or the BPE file isn't cached and we're offline
+                print(f"[token_counter] tiktoken {name} unavailable, using estimator: {e}")
+                _encodings[name] = None
+        return _encodings[name]
+
+
+def estimate_text_tokens(text: str, family: str = "default") -> int:
+    """Calibrated estimate: ASCII by the family's chars/token, other characters near one token each."""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_chars = len(text) - non_ascii
+    return math.ceil(ascii_chars / _CHARS_PER_TOKEN[family] + non_ascii * _NON_ASCII_TOKENS)
+
+
+def count_text_tokens(text: str, model_used: Optional[str] = None) -> int:
+    """Tokens in `text` for the model family of `model_used`."""
+    if not text:
+        return 0
+    name = _encoding_name(model_used)
+    encoding = _encoding(name) if name else None
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_text_tokens(text, model_family(model_used))
+
+
+def _parse_content(content: Union[str, List[Dict[str, Any]], None]) -> Union[str, List[Dict[str, Any]]]:
+    if isinstance(content, str) and content.strip().startswith("["):
+        try:
+            parsed = json.loads(content)
+            if isinstance(parsed, list):
+                return parsed
+        except ValueError:
+            pass
+    return content or ""
+
+
+def count_message_tokens(
+    role: str,
+    content: Union[str, List[Dict[str, Any]], None],
+    model_used: Optional[str] = None,
+) -> int:
+    """
+    Tokens a message adds to a request, counting what convert_to_agno_messages sends.
+
+    Args:
+        role: "user" or "assistant"
+        content: Stored content (plain text or a JSON block list) or parsed blocks
+        model_used: "provider:model_id" whose tokenizer to use
+
+    Returns:
+        Token count including per-message framing
+    """
+    content = _parse_content(content)
+    if isinstance(content, str):
+        return count_text_tokens(content, model_used) + MESSAGE_OVERHEAD_TOKENS
+    if role == "user":
+        # User block lists are sent as their JSON
+        return count_text_tokens(json.dumps(content), model_used) + MESSAGE_OVERHEAD_TOKENS
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    for block in content:
+        if not isinstance(block, dict):
+            continue
+        if block.get("type") == "text":
+            tokens += count_text_tokens(block.get("content") or "", model_used)
+        elif block.get("type") == "tool_call":
+            tokens += count_text_tokens(json.dumps(block.get("toolArgs") or {}), model_used) + MESSAGE_OVERHEAD_TOKENS
+            if block.get("toolResult"):
+                tokens += count_text_tokens(str(block["toolResult"]), model_used) + MESSAGE_OVERHEAD_TOKENS
+        # Reasoning and error blocks are not sent back to the model
+    return tokens
+
+
+def store_message_token_count(app_handle: AppHandle, message_id: str) -> Optional[int]:
+    """Count a saved message and store the result. Returns the count (None if the message is gone)."""
+    with db.db_session(app_handle) as sess:
+        message = sess.get(db.Message, message_id)
+        if message is None:
+            return None
+        model_used = message.model_used
+        if message.role == "user" and message.chatId:
+            # User messages are counted for the model the chat is about to use
+            model_used = db.get_chat_model_used(sess, message.chatId)
+        count = count_message_tokens(message.role, message.content, model_used)
+        db.set_message_token_count(sess, message_id, count)
+        return count
+
+
+def backfill_token_counts(app_handle: AppHandle, max_batches: Optional[int] = None) -> int:
+    """
+    Count every complete message that has no token count yet, in batches.
+
+    Args:
+        app_handle: Tauri app handle
+        max_batches: Stop after this many batches (default: until done)
+
+    Returns:
+        Number of messages counted
+    """
+    counted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with db.db_session(app_handle) as sess:
+            rows = db.get_uncounted_messages(sess, limit=BACKFILL_BATCH)
+            if not rows:
+                break
+            counts = {
+                msg_id: count_message_tokens(role, content, model_used)
+                for msg_id, role, content, model_used in rows
+            }
+            db.bulk_set_token_counts(sess, counts)
+        counted += len(counts)
+        batches += 1
+    if counted:
+        print(f"[token_counter] Backfilled token counts for {counted} messages")
+    return counted